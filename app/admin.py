@@ -1,49 +1,203 @@
-from django.contrib import admin
-from app.models import CustomUser, Category, Product, Order, ProductInOrder, Cart, ProductInCart, Review
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models.functions import Now
+from django.utils.functional import cached_property
 
+from app import reservations
+from app.models import CustomUser, Category, Product, Order, ProductInOrder, Cart, ProductInCart, Review, \
+    StockReservation, SellerDailySales, ProductDailySales
 
-class ProductAdmin(admin.ModelAdmin):
-    list_display = ['name', 'price', 'category',  'seller']
-    search_fields = ['name', 'category__name',  'seller__username']
+# Unfiltered changelists of tables bigger than this show an estimated count instead of running COUNT(*)
+ESTIMATE_COUNTS_ABOVE = 10000
+
+
+def estimated_count(queryset):
+    """
+    The number of rows in the queryset's table according to the database, without reading the table. None when
+    the queryset is filtered or the database can't tell.
+    """
+    if queryset.query.where or queryset.query.distinct or queryset.query.is_sliced:
+        return None
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute("SELECT table_rows FROM information_schema.tables "
+                           "WHERE table_schema = DATABASE() AND table_name = %s", [table])
+        elif connection.vendor == 'sqlite':
+            return _sqlite_estimate(cursor, table)
+        else:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+def _sqlite_estimate(cursor, table):
+    # The row count of the last ANALYZE (or PRAGMA optimize), else the highest rowid, read from the end of the
+    # table's b-tree. That one counts the deleted rows too, it is only close for the tables rows are rarely deleted
+    # from
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+    row = None
+    if cursor.fetchone():
+        cursor.execute("SELECT CAST(stat AS INTEGER) FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+        row = cursor.fetchone()
+    if row is None:
+        cursor.execute(f"SELECT MAX(rowid) FROM {cursor.db.ops.quote_name(table)}")
+        row = cursor.fetchone()
+    return row[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is not None and estimate > ESTIMATE_COUNTS_ABOVE:
+            return estimate
+        return Paginator.count.func(self)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    # Neither the paginator nor the "N total" link count the whole table
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class CustomUserAdmin(LargeTableAdmin):
+    list_display = ['display_name', 'user', 'phone']
+    list_select_related = ['user']
+    search_fields = ['display_name', 'user__username']
+    autocomplete_fields = ['user']
+
+
+class ProductAdmin(LargeTableAdmin):
+    list_display = ['name', 'price', 'quantity', 'category', 'seller']
+    list_select_related = ['category', 'seller']
+    search_fields = ['name', 'category__name', 'seller__username']
     prepopulated_fields = {'slug': ('name',)}
-    list_filter = ['category',  'seller']
+    # Only the users that sell something are listed, not every user
+    list_filter = ['category', ('seller', admin.RelatedOnlyFieldListFilter)]
+    autocomplete_fields = ['category', 'seller']
 
     def has_delete_permission(self, request, obj=None):
         if request.user.is_superuser:
             return True
-        if obj and (request.user == obj.seller):
+        if obj and (request.user.id == obj.seller_id):
             return True
         return False
 
 
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ['name', 'slug']
+    search_fields = ['name']
     prepopulated_fields = {'slug': ('name',)}
 
 
-class ReviewAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableAdmin):
+    list_display = ['id', 'customer', 'status', 'total', 'created_at']
+    list_select_related = ['customer']
+    list_filter = ['status']
+    search_fields = ['=id', 'customer__username']
+    autocomplete_fields = ['customer']
+    actions = ['mark_processing', 'mark_delivered']
+
+    @admin.action(description="Mark the selected orders as processing")
+    def mark_processing(self, request, queryset):
+        self._set_status(request, queryset, 'Processing')
+
+    @admin.action(description="Mark the selected orders as delivered")
+    def mark_delivered(self, request, queryset):
+        self._set_status(request, queryset, 'Delivered')
+
+    def _set_status(self, request, queryset, status):
+        # A single UPDATE, however many orders are selected
+        updated = queryset.update(status=status, updated_at=Now())
+        self.message_user(request, f"{updated} orders marked as {status.lower()}.", messages.SUCCESS)
+
+
+class ProductInOrderAdmin(LargeTableAdmin):
+    list_display = ['order', 'product', 'quantity', 'unit_price']
+    list_select_related = ['order__customer', 'product']
+    search_fields = ['=order__id', 'product__name']
+    raw_id_fields = ['order', 'product']
+
+
+class CartAdmin(LargeTableAdmin):
+    list_display = ['id', 'customer', 'updated_at']
+    list_select_related = ['customer']
+    search_fields = ['customer__username']
+    autocomplete_fields = ['customer']
+
+
+class ProductInCartAdmin(admin.ModelAdmin):
+    # Counted, rows come and go with every cart so the highest rowid would be far off, and the table only holds
+    # the live carts
+    list_display = ['cart', 'product', 'quantity']
+    list_select_related = ['cart__customer', 'product']
+    search_fields = ['cart__customer__username', 'product__name']
+    raw_id_fields = ['cart', 'product']
+
+
+class ReviewAdmin(LargeTableAdmin):
     list_display = ['product', 'customer', 'rating', 'comment']
-    list_filter = ['product', 'customer']
-    search_fields = ['product__name', 'user__username']
+    list_select_related = ['product', 'customer']
+    list_filter = ['rating']
+    search_fields = ['product__name', 'customer__username']
+    autocomplete_fields = ['product', 'customer']
 
     def has_change_permission(self, request, obj=None):
-        if obj and (request.user == obj.customer.user):
+        if obj and (request.user.id == obj.customer_id):
             return True
         return False
 
     def has_delete_permission(self, request, obj=None):
         if request.user.is_superuser:
             return True
-        if obj and (request.user == obj.customer.user):
+        if obj and (request.user.id == obj.customer_id):
             return True
         return False
 
 
-admin.site.register(CustomUser)
+class StockReservationAdmin(admin.ModelAdmin):
+    # Counted, like the cart lines they hold the stock of
+    list_display = ['product', 'cart', 'quantity', 'expires_at']
+    list_select_related = ['product', 'cart__customer']
+    search_fields = ['product__name', 'cart__customer__username']
+    raw_id_fields = ['cart', 'product']
+    actions = ['release']
+
+    @admin.action(description="Release the selected reservations")
+    def release(self, request, queryset):
+        released = reservations.release(queryset)
+        self.message_user(request, f"{released} reservations released.", messages.SUCCESS)
+
+
+class SellerDailySalesAdmin(LargeTableAdmin):
+    list_display = ['day', 'seller', 'units', 'revenue', 'orders']
+    list_select_related = ['seller']
+    search_fields = ['seller__username']
+    date_hierarchy = 'day'
+    raw_id_fields = ['seller']
+
+
+class ProductDailySalesAdmin(LargeTableAdmin):
+    list_display = ['day', 'product', 'seller', 'units', 'revenue', 'orders']
+    list_select_related = ['product', 'seller']
+    search_fields = ['product__name', 'seller__username']
+    date_hierarchy = 'day'
+    raw_id_fields = ['product', 'seller']
+
+
+admin.site.register(CustomUser, CustomUserAdmin)
 admin.site.register(Category, CategoryAdmin)
 admin.site.register(Product, ProductAdmin)
-admin.site.register(Order)
-admin.site.register(ProductInOrder)
-admin.site.register(Cart)
-admin.site.register(ProductInCart)
+admin.site.register(Order, OrderAdmin)
+admin.site.register(ProductInOrder, ProductInOrderAdmin)
+admin.site.register(Cart, CartAdmin)
+admin.site.register(ProductInCart, ProductInCartAdmin)
 admin.site.register(Review, ReviewAdmin)
+admin.site.register(StockReservation, StockReservationAdmin)
+admin.site.register(SellerDailySales, SellerDailySalesAdmin)
+admin.site.register(ProductDailySales, ProductDailySalesAdmin)
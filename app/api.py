@@ -0,0 +1,266 @@
+"""
+Read-only JSON API over the catalog, for the mobile client and the partner feeds. Every response carries an ETag and
+a Last-Modified derived from the latest change to the rows it shows, so a client that already has the current version
+gets a 304 after one indexed lookup, without loading the rows.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Subquery
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import condition, require_safe
+
+from app import listing
+from app.databases import read_from_replica
+from app.models import Category, Product, Review
+
+MAX_PAGE_SIZE = 100
+REVIEW_ORDER = ('-created_at', '-id')
+
+# The fields a client can pick with ?fields=, with the columns each one loads and how it is read from the row
+PRODUCT_FIELDS = {
+    'id': ('id', lambda product: product.pk),
+    'name': ('name', lambda product: product.name),
+    'slug': ('slug', lambda product: product.slug),
+    'description': ('description', lambda product: product.description),
+    'price': ('price', lambda product: product.price),
+    'quantity': ('quantity', lambda product: product.quantity),
+    'sold': ('sold', lambda product: product.sold),
+    'average_rating': ('average_rating', lambda product: product.average_rating),
+    'rating_count': ('rating_count', lambda product: product.rating_count),
+    'image': ('image', lambda product: product.image.url if product.image else None),
+    'category': ('category__slug', lambda product: product.category.slug),
+    'seller': ('seller__username', lambda product: product.seller.username),
+    'created_at': ('created_at', lambda product: product.created_at),
+    'updated_at': ('updated_at', lambda product: product.updated_at),
+}
+CATEGORY_FIELDS = {
+    'id': ('id', lambda category: category.pk),
+    'name': ('name', lambda category: category.name),
+    'slug': ('slug', lambda category: category.slug),
+    'updated_at': ('updated_at', lambda category: category.updated_at),
+}
+REVIEW_FIELDS = {
+    'id': ('id', lambda review: review.pk),
+    'rating': ('rating', lambda review: review.rating),
+    'comment': ('comment', lambda review: review.comment),
+    'customer': ('customer__username', lambda review: review.customer.username),
+    'created_at': ('created_at', lambda review: review.created_at),
+    'updated_at': ('updated_at', lambda review: review.updated_at),
+}
+
+# The listing sort orders read these columns to build the next page cursor
+_SORT_COLUMNS = sorted({field.lstrip('-') for ordering in listing.SORT_ORDERS.values() for field in ordering})
+
+
+class _BadRequest(Exception):
+    pass
+
+
+def _conditional(version):
+    """
+    Answers with a 304 when the client already has the current response. `version(request, **kwargs)` returns when
+    the rows the response depends on last changed.
+    """
+    def current_version(request, **kwargs):
+        # Asked for by both validators, looked up once
+        if not hasattr(request, '_api_version'):
+            request._api_version = version(request, **kwargs)
+        return request._api_version
+
+    def etag(request, **kwargs):
+        last_modified = current_version(request, **kwargs)
+        if last_modified is None:
+            return None
+        # The query string picks the fields, page and filters, so it is part of the representation
+        key = f"{request.path}?{request.GET.urlencode()}:{last_modified.isoformat()}"
+        return hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+
+    def last_modified(request, **kwargs):
+        return current_version(request, **kwargs)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def _products_version(request):
+    # Over the whole table, so the latest product comes from the updated_at index whatever the filters. An edit of
+    # any product changes the version of every product list
+    latest_category = Category.objects.order_by('-updated_at').values('updated_at')[:1]
+    latest = (Product.objects.order_by('-updated_at')
+              .values_list('updated_at', Subquery(latest_category)).first())
+    return _latest([*(latest or ()), _last_deletion(Product), _last_deletion(Category)])
+
+
+def _product_version(request, pk):
+    return _latest(Product.objects.filter(pk=pk).values_list('updated_at', 'category__updated_at').first())
+
+
+def _categories_version(request):
+    latest = Category.objects.order_by('-updated_at').values_list('updated_at', flat=True).first()
+    return _latest([latest, _last_deletion(Category)])
+
+
+def _reviews_version(request, pk):
+    # Every saved or deleted review refreshes the rating aggregates, and with them the updated_at, of its product
+    return Product.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+
+
+@require_safe
+@read_from_replica
+@_conditional(_products_version)
+def products(request):
+    try:
+        fields, page_size = _fields(request, PRODUCT_FIELDS), _page_size(request)
+    except _BadRequest as error:
+        return JsonResponse({"error": str(error)}, status=400)
+
+    queryset = _only(_filtered_products(request), PRODUCT_FIELDS, fields, _SORT_COLUMNS)
+    page = listing.paginate_products(queryset, sort=request.GET.get('sort', listing.DEFAULT_SORT),
+                                     cursor=request.GET.get('cursor'), page_size=page_size)
+    return _page_response(request, page.products, page.next_cursor, PRODUCT_FIELDS, fields)
+
+
+@require_safe
+@read_from_replica
+@_conditional(_product_version)
+def product(request, pk):
+    try:
+        fields = _fields(request, PRODUCT_FIELDS)
+    except _BadRequest as error:
+        return JsonResponse({"error": str(error)}, status=400)
+
+    found = _only(Product.objects.filter(pk=pk), PRODUCT_FIELDS, fields).first()
+    if found is None:
+        raise Http404("No product matches the given query.")
+    return JsonResponse(_serialize(found, PRODUCT_FIELDS, fields))
+
+
+@require_safe
+@read_from_replica
+@_conditional(_categories_version)
+def categories(request):
+    try:
+        fields = _fields(request, CATEGORY_FIELDS)
+    except _BadRequest as error:
+        return JsonResponse({"error": str(error)}, status=400)
+
+    rows = _only(Category.objects.order_by('name', 'id'), CATEGORY_FIELDS, fields)
+    return JsonResponse({"results": [_serialize(category, CATEGORY_FIELDS, fields) for category in rows]})
+
+
+@require_safe
+@read_from_replica
+@_conditional(_reviews_version)
+def product_reviews(request, pk):
+    try:
+        fields, page_size = _fields(request, REVIEW_FIELDS), _page_size(request)
+    except _BadRequest as error:
+        return JsonResponse({"error": str(error)}, status=400)
+
+    queryset = _only(Review.objects.filter(product=pk).order_by(*REVIEW_ORDER), REVIEW_FIELDS, fields, ['created_at'])
+    cursor = request.GET.get('cursor')
+    position = _review_position(cursor) if cursor else None
+    if position is not None:
+        queryset = queryset.filter(listing.after(REVIEW_ORDER, position))
+    reviews = list(queryset[:page_size + 1])
+    if not reviews and position is None and not Product.objects.filter(pk=pk).exists():
+        raise Http404("No product matches the given query.")
+
+    next_cursor = None
+    if len(reviews) > page_size:
+        reviews = reviews[:page_size]
+        next_cursor = listing.encode_cursor('reviews', [_review_field(field).value_to_string(reviews[-1])
+                                                        for field in REVIEW_ORDER])
+    return _page_response(request, reviews, next_cursor, REVIEW_FIELDS, fields)
+
+
+def _latest(row):
+    return max((value for value in row or () if value is not None), default=None)
+
+
+def _last_deletion(model):
+    # Deleted rows leave no updated_at behind. When the cache lost the time, it restarts from now, which only costs
+    # the clients a full response
+    key = _deletion_key(model)
+    deleted_at = cache.get(key)
+    if deleted_at is None:
+        cache.add(key, time.time(), None)
+        deleted_at = cache.get(key)
+    return datetime.fromtimestamp(deleted_at, timezone.utc)
+
+
+def _deletion_key(model):
+    return f"api_last_deletion:{model._meta.label_lower}"
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+def record_deletion(sender, **kwargs):
+    transaction.on_commit(lambda: cache.set(_deletion_key(sender), time.time(), None))
+
+
+def _filtered_products(request):
+    products = Product.objects.all()
+    if request.GET.get('category'):
+        products = products.filter(category__slug=request.GET['category'])
+    return products
+
+
+def _fields(request, available):
+    if not request.GET.get('fields'):
+        return list(available)
+    fields = list(dict.fromkeys(field for field in request.GET['fields'].split(',') if field))
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise _BadRequest(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(available)}")
+    return fields
+
+
+def _page_size(request):
+    try:
+        page_size = int(request.GET.get('limit', listing.PAGE_SIZE))
+    except ValueError:
+        raise _BadRequest("limit must be a number") from None
+    if not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise _BadRequest(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return page_size
+
+
+def _only(queryset, available, fields, extra_columns=()):
+    columns = ['id', *extra_columns, *(available[field][0] for field in fields)]
+    related = {column.split('__')[0] for column in columns if '__' in column}
+    return queryset.select_related(*related).only(*columns)
+
+
+def _serialize(row, available, fields):
+    return {field: available[field][1](row) for field in fields}
+
+
+def _page_response(request, rows, next_cursor, available, fields):
+    next_url = None
+    if next_cursor is not None:
+        query = request.GET.copy()
+        query['cursor'] = next_cursor
+        next_url = f"{request.path}?{query.urlencode()}"
+    return JsonResponse({"results": [_serialize(row, available, fields) for row in rows], "next": next_url})
+
+
+def _review_position(cursor):
+    # Like the listing cursors, a malformed one restarts from the first page
+    values = listing.decode_cursor(cursor, 'reviews')
+    if values is None or len(values) != len(REVIEW_ORDER) or None in values:
+        return None
+    try:
+        return [_review_field(field).to_python(value) for field, value in zip(REVIEW_ORDER, values)]
+    except (ValidationError, TypeError, ValueError):
+        return None
+
+
+def _review_field(field):
+    return Review._meta.get_field(field.lstrip('-'))
@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate, post_save
 
 
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
+
+    def ready(self):
+        # Imported for the receivers and checks they register
+        from app import (api, bestsellers, card_cache, carts, checks, databases, images,  # noqa: F401
+                         page_cache, reviews, search, slug_cache)
+        from app.models import CustomUser, Product, Review, remember_saved_values
+        post_migrate.connect(search.ensure_search_triggers, sender=self)
+        post_save.connect(remember_saved_values, sender=CustomUser)
+        post_save.connect(remember_saved_values, sender=Product)
+        post_save.connect(remember_saved_values, sender=Review)
@@ -0,0 +1,67 @@
+"""
+Async versions of the read-only catalog views, routed instead of the ones in app.views when the project is served
+through dnick_eshop/asgi.py. Rows are loaded with the async ORM, templates are rendered in the thread that owns the
+request's database connection, since they can still reach the database (the logged in user, lazy relations).
+"""
+from asgiref.sync import sync_to_async
+from django.shortcuts import render
+
+from app import bestsellers, catalog, listing, search, slug_cache
+from app import reviews as product_reviews
+from app.databases import read_from_replica
+from app.models import Product
+from app.page_cache import cache_anonymous_page
+
+arender = sync_to_async(render)
+
+
+@read_from_replica
+async def index(request):
+    context = {"products": await bestsellers.abest_sellers()}
+    return await arender(request, 'index.html', context)
+
+
+@read_from_replica
+async def products(request):
+    search_term = request.GET.get('search_term')
+    if search_term:
+        # The full text search runs raw SQL, which has no async API
+        page = await sync_to_async(search.paginate_search)(request, search_term)
+    else:
+        page = await listing.apaginate_request(request, Product.objects.all())
+
+    return await arender(request, 'products.html', catalog.products_context(page, search_term))
+
+
+@read_from_replica
+@cache_anonymous_page('product_detail', 'slug')
+async def product_detail(request, slug):
+    context = {"product": await slug_cache.aget_product_or_404(catalog.detail_queryset(), slug)}
+    return await arender(request, 'product_detail.html', context)
+
+
+@read_from_replica
+@cache_anonymous_page('categories')
+async def categories(request):
+    context = {"categories": [category async for category in catalog.categories_queryset()]}
+    return await arender(request, 'categories.html', context)
+
+
+@read_from_replica
+@cache_anonymous_page('category_list', 'slug')
+async def category_list(request, slug):
+    category = await slug_cache.aget_category_or_404(slug)
+    page = await listing.apaginate_request(request, catalog.category_products(category))
+    best_sellers = await bestsellers.abest_sellers(category) if page.cursor is None else None
+    context = catalog.category_list_context(category, page, best_sellers)
+    return await arender(request, 'category_list.html', context)
+
+
+@read_from_replica
+@cache_anonymous_page('reviews', 'slug')
+async def reviews(request, slug):
+    product = await slug_cache.aget_product_or_404(Product.objects.all(), slug)
+    sort = catalog.review_sort(request)
+    page = await sync_to_async(catalog.reviews_paginator(product, sort).get_page)(request.GET.get('page'))
+    histogram = await sync_to_async(product_reviews.rating_histogram)(product)
+    return await arender(request, 'product_reviews.html', catalog.reviews_context(product, sort, page, histogram))
@@ -0,0 +1,296 @@
+import asyncio
+import random
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from time import perf_counter
+
+from asgiref.sync import ThreadSensitiveContext
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import AsyncClient, Client
+from django.urls import get_resolver
+
+from app import sales
+from app.instrumentation import QueryRecorder
+from app.models import Cart, Category, CustomUser, Order, Product, ProductInCart, ProductInOrder, Review
+
+PASSWORD = 'benchmark'
+BATCH_SIZE = 1000
+# The root URL configurations that serve the catalog pages from app.views and from app.async_views
+# Label: (urlconf, served through ASGI). The sync views under ASGI tell the cost of the ASGI handler itself apart
+# from the cost of the async views
+CATALOG_RUNS = {'WSGI': ('dnick_eshop.urls', False), 'ASGI, sync views': ('dnick_eshop.urls', True),
+                'ASGI': ('dnick_eshop.async_urls', True)}
+
+
+class Dataset:
+    def __init__(self, categories, sellers, buyers, products, admin):
+        self.categories = categories
+        self.sellers = sellers
+        self.buyers = buyers
+        self.products = products
+        self.admin = admin
+
+
+def seed(categories=10, products=2000, users=200, orders=2000, reviews=5000, cart_items=400, random_seed=0):
+    """
+    Fills the database with a synthetic shop. Sales, reviews and catalog sizes are Zipf-skewed like a real shop:
+    a few best sellers get most of the orders and reviews, a few sellers and categories hold most of the products.
+    """
+    rng = random.Random(random_seed)
+
+    category_rows = Category.objects.bulk_create(
+        [Category(name=f"Category {i}", slug=f"category-{i}") for i in range(categories)])
+
+    password = make_password(PASSWORD)
+    user_rows = User.objects.bulk_create(
+        [User(username=f"user{i}", password=password) for i in range(users)], batch_size=BATCH_SIZE)
+    # bulk_create skips the post_save signal that gives every user a cart
+    Cart.objects.bulk_create([Cart(customer=user) for user in user_rows], batch_size=BATCH_SIZE)
+    CustomUser.objects.bulk_create(
+        [CustomUser(user=user, address=f"Street {i}", phone=f"07{i:07}", display_name=user.username)
+         for i, user in enumerate(user_rows)], batch_size=BATCH_SIZE)
+    seller_count = max(1, users // 10)
+    sellers, buyers = user_rows[:seller_count], user_rows[seller_count:] or user_rows
+
+    product_sellers = rng.choices(sellers, _zipf(len(sellers)), k=products)
+    product_categories = rng.choices(category_rows, _zipf(len(category_rows)), k=products)
+    product_rows = Product.objects.bulk_create([
+        Product(name=f"Product {i}", slug=f"product-{i}", price=Decimal(rng.randint(500, 300000)) / 100,
+                quantity=rng.choice([0, 1, 5, 20, 100, 1000]), description=f"Synthetic product number {i}",
+                image='default.png', category=product_categories[i], seller=product_sellers[i])
+        for i in range(products)
+    ], batch_size=BATCH_SIZE)
+    popularity = _zipf(len(product_rows))
+
+    Review.objects.bulk_create([
+        Review(rating=rng.randint(1, 10), comment="Synthetic review", customer=customer, product=product)
+        for customer, product in zip(rng.choices(buyers, k=reviews), rng.choices(product_rows, popularity, k=reviews))
+    ], batch_size=BATCH_SIZE)
+    Product.objects.all().refresh_ratings()
+
+    order_rows = Order.objects.bulk_create(
+        [Order(customer=customer, status=rng.choice(['Pending', 'Processing', 'Delivered']))
+         for customer in rng.choices(buyers, _zipf(len(buyers)), k=orders)], batch_size=BATCH_SIZE)
+    lines = []
+    for order in order_rows:
+        for product in set(rng.choices(product_rows, popularity, k=rng.randint(1, 4))):
+            lines.append(ProductInOrder(order=order, product=product, quantity=rng.randint(1, 3),
+                                        unit_price=product.price))
+            product.sold += lines[-1].quantity
+            order.total += lines[-1].subtotal()
+    ProductInOrder.objects.bulk_create(lines, batch_size=BATCH_SIZE)
+    Order.objects.bulk_update(order_rows, ['total'], batch_size=BATCH_SIZE)
+    Product.objects.bulk_update(product_rows, ['sold'], batch_size=BATCH_SIZE)
+    sales.rebuild()
+
+    carts = {cart.customer_id: cart for cart in Cart.objects.filter(customer__in=buyers)}
+    in_cart = {(customer.pk, product.pk) for customer, product in
+               zip(rng.choices(buyers, k=cart_items), rng.choices(product_rows, popularity, k=cart_items))}
+    ProductInCart.objects.bulk_create(
+        [ProductInCart(cart=carts[customer_id], product_id=product_id, quantity=1)
+         for customer_id, product_id in in_cart], batch_size=BATCH_SIZE)
+
+    admin = User.objects.create_superuser('benchmark-admin', password=PASSWORD)
+    return Dataset(category_rows, sellers, buyers, product_rows, admin)
+
+
+def scenarios(dataset):
+    """
+    One request per URL name of the project. Each entry is (url name, client role, method, path, data, setup),
+    `setup` runs before every request, outside of the measurement.
+    """
+    product = dataset.products[0]
+    seller = product.seller
+    buyer = dataset.buyers[0]
+
+    def fill_cart():
+        cart = Cart.objects.filter(customer=buyer).last()
+        ProductInCart.objects.get_or_create(cart=cart, product=product)
+        Product.objects.filter(pk=product.pk, quantity__lt=10).update(quantity=1000)
+
+    return [
+        ('admin:index', 'admin', 'get', '/admin/', None, None),
+        ('index', 'anonymous', 'get', '/', None, None),
+        ('products', 'anonymous', 'get', '/products/', None, None),
+        ('products', 'buyer', 'get', '/products/?search_term=product+1', None, None),
+        ('product_detail', 'buyer', 'get', f'/products/{product.slug}', None, None),
+        ('categories', 'buyer', 'get', '/categories/', None, None),
+        ('category_list', 'buyer', 'get', f'/categories/{product.category.slug}', None, None),
+        ('seller_profile', 'buyer', 'get', f'/seller/{seller.username}', None, None),
+        ('seller_dashboard', 'seller', 'get', f'/seller/{seller.username}/dashboard', None, None),
+        ('reviews', 'buyer', 'get', f'/reviews/{product.slug}', None, None),
+        ('cart', 'buyer', 'get', '/cart/', None, fill_cart),
+        ('login', 'anonymous', 'get', '/login/', None, None),
+        ('logout', 'logout', 'get', '/logout/', None, None),
+        ('orders', 'buyer', 'get', '/orders/', None, None),
+        ('add_product_to_shop', 'seller', 'get', '/add_product/', None, None),
+        ('checkout', 'buyer', 'get', '/checkout/', None, fill_cart),
+        ('add_to_cart', 'buyer', 'post', '/add_to_cart', {'product_id': product.pk}, fill_cart),
+        ('add_review_to_product', 'buyer', 'post', '/add_review_to_product', {'product_id': product.pk}, None),
+        ('save_review', 'buyer', 'post', '/save_review',
+         {'product_id': product.pk, 'product_slug': product.slug, 'rating': 8, 'comment': 'Benchmark'}, None),
+        ('remove_from_cart', 'buyer', 'get', f'/remove_from_cart/{product.pk}/', None, fill_cart),
+        ('media', 'anonymous', 'get', '/media/default.png', None, None),
+        ('export_orders', 'admin', 'get', '/export/orders.csv', {'status': 'Delivered'}, None),
+        ('export_sales', 'seller', 'get', '/export/sales.csv', None, None),
+        ('export_products', 'seller', 'get', '/export/products.json', None, None),
+        ('api_products', 'anonymous', 'get', '/api/products/', {'fields': 'id,name,price,category'}, None),
+        ('api_product', 'anonymous', 'get', f'/api/products/{product.pk}/', None, None),
+        ('api_product_reviews', 'anonymous', 'get', f'/api/products/{product.pk}/reviews/', None, None),
+        ('api_categories', 'anonymous', 'get', '/api/categories/', None, None),
+        ('page_cache_stats', 'admin', 'get', '/page-cache/stats/', None, None),
+        ('sql_stats', 'admin', 'get', '/sql-stats/', None, None),
+    ]
+
+
+def unbenchmarked_routes(planned):
+    covered = {name for name, *_ in planned}
+    return sorted(name for name in _route_names(get_resolver()) if name not in covered)
+
+
+def run(dataset, iterations=20):
+    """
+    Requests every scenario `iterations` times after one warm-up request and returns its p50/p95 latency
+    (in milliseconds) and the highest query and row counts seen.
+    """
+    clients = {
+        'anonymous': Client(),
+        'buyer': _logged_in(dataset.buyers[0]),
+        'seller': _logged_in(dataset.products[0].seller),
+        'admin': _logged_in(dataset.admin),
+    }
+    results = []
+    for name, role, method, path, data, setup in scenarios(dataset):
+        latencies, queries, rows = [], [], []
+        for iteration in range(iterations + 1):
+            client = _logged_in(dataset.buyers[1]) if role == 'logout' else clients[role]
+            if setup:
+                setup()
+            with QueryRecorder(count_rows=True) as recorder:
+                start = perf_counter()
+                response = getattr(client, method)(path, data, HTTP_REFERER='/')
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = perf_counter() - start
+            _check(response)
+            if iteration:
+                latencies.append(elapsed * 1000)
+                queries.append(recorder.count)
+                rows.append(recorder.rows)
+        results.append({
+            'name': name, 'role': role, 'path': path,
+            'p50_ms': _percentile(latencies, 0.5), 'p95_ms': _percentile(latencies, 0.95),
+            'queries': max(queries), 'rows': max(rows),
+        })
+    return results
+
+
+def clear_caches():
+    # The pages, the product cards and the counters all start cold
+    for cache in caches.all():
+        cache.clear()
+
+
+def catalog_paths(dataset):
+    # The pages that have an async version in app.async_views
+    product = dataset.products[0]
+    return ['/', '/products/', '/products/?search_term=product+1', f'/products/{product.slug}', '/categories/',
+            f'/categories/{product.category.slug}', f'/reviews/{product.slug}']
+
+
+def throughput(paths, users, concurrency, total, use_async):
+    """
+    Requests the paths round robin, `total` requests from `concurrency` simultaneous clients logged in as `users`:
+    threads with the WSGI test client, or tasks with the ASGI one, each request in its own thread sensitive
+    context like under an ASGI server. Returns the requests per second and the p50/p95 latency in milliseconds.
+    """
+    per_client = [list(range(i, total, concurrency)) for i in range(concurrency)]
+    clients = [(AsyncClient if use_async else Client)() for _ in range(concurrency)]
+    for client, user in zip(clients, users * concurrency):
+        client.force_login(user)
+
+    def requests(client, numbers):
+        latencies = []
+        for number in numbers:
+            start = perf_counter()
+            _check(client.get(paths[number % len(paths)]))
+            latencies.append((perf_counter() - start) * 1000)
+        return latencies
+
+    async def arequests(client, numbers):
+        latencies = []
+        for number in numbers:
+            start = perf_counter()
+            async with ThreadSensitiveContext():
+                _check(await client.get(paths[number % len(paths)]))
+            latencies.append((perf_counter() - start) * 1000)
+        return latencies
+
+    async def run_tasks():
+        return await asyncio.gather(*[arequests(client, numbers) for client, numbers in zip(clients, per_client)])
+
+    start = perf_counter()
+    if use_async:
+        results = asyncio.run(run_tasks())
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(requests, clients, per_client))
+    elapsed = perf_counter() - start
+    latencies = [latency for latencies in results for latency in latencies]
+    return {'requests_per_second': total / elapsed,
+            'p50_ms': _percentile(latencies, 0.5), 'p95_ms': _percentile(latencies, 0.95)}
+
+
+def check_thresholds(results, thresholds, latency_tolerance=1.0):
+    # Thresholds are keyed by url name and client role, e.g. "products:anonymous". A "note" next to a limit says
+    # which queries it allows for. Latencies depend on the machine, the bundled budgets are about ten times the
+    # p95 measured on a development machine, so only a view that became an order of magnitude slower fails the run. The
+    # latency limits are multiplied by latency_tolerance, 0 skips them
+    failures = []
+    for result in results:
+        limits = thresholds.get(f"{result['name']}:{result['role']}", {})
+        for metric in ['queries', 'rows', 'p50_ms', 'p95_ms']:
+            limit = limits.get(f"max_{metric}")
+            latency = metric.endswith('_ms')
+            if limit is None or (latency and not latency_tolerance):
+                continue
+            if latency:
+                limit *= latency_tolerance
+            if result[metric] > limit:
+                failures.append(f"{result['name']} ({result['role']}): {metric} {result[metric]:.1f} > {limit:g}")
+    return failures
+
+
+def _check(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request['PATH_INFO']} answered {response.status_code}")
+
+
+def _logged_in(user):
+    client = Client()
+    client.force_login(user)
+    return client
+
+
+def _zipf(size):
+    return [1 / rank for rank in range(1, size + 1)]
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, round(fraction * (len(values) - 1)))]
+
+
+def _route_names(resolver, namespace=''):
+    for pattern in resolver.url_patterns:
+        if hasattr(pattern, 'url_patterns'):
+            # Only the admin index is benchmarked out of the admin site
+            if pattern.namespace == 'admin':
+                yield 'admin:index'
+            else:
+                prefix = f"{namespace}{pattern.namespace}:" if pattern.namespace else namespace
+                yield from _route_names(pattern, prefix)
+        elif pattern.name:
+            yield namespace + pattern.name
@@ -0,0 +1,64 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from app.databases import primary_reads
+from app.models import Product
+from app.sales import sold_changed
+
+
+def best_sellers(category=None):
+    category_id = category.pk if category else None
+    product_ids = cache.get(_cache_key(category_id))
+    if product_ids is None:
+        product_ids = refresh(category_id)
+    return _in_order(Product.objects.filter(pk__in=product_ids), product_ids)
+
+
+async def abest_sellers(category=None):
+    category_id = category.pk if category else None
+    product_ids = await cache.aget(_cache_key(category_id))
+    if product_ids is None:
+        product_ids = await sync_to_async(refresh)(category_id)
+    return _in_order([product async for product in Product.objects.filter(pk__in=product_ids)], product_ids)
+
+
+def refresh(category_id=None):
+    products = Product.objects.order_by('-sold', '-id')
+    if category_id is not None:
+        products = products.filter(category_id=category_id)
+    with primary_reads():
+        product_ids = list(products.values_list('pk', flat=True)[:settings.BEST_SELLERS_COUNT])
+    cache.set(_cache_key(category_id), product_ids, settings.BEST_SELLERS_TIMEOUT)
+    return product_ids
+
+
+def _in_order(products, product_ids):
+    # Only the ranking is cached, the rows are read by primary key on every request so their stock, price and
+    # rating are never stale
+    position = {product_id: index for index, product_id in enumerate(product_ids)}
+    return sorted(products, key=lambda product: position[product.pk])
+
+
+def _cache_key(category_id):
+    return f"best_sellers:{category_id or 'all'}"
+
+
+@receiver(sold_changed)
+def refresh_after_sales(sender, product_ids, **kwargs):
+    # Only applying the sales moves the ranking, so rebuild the affected lists right away instead of letting
+    # every homepage request race to rebuild them after an expiry
+    refresh()
+    category_ids = Product.objects.filter(pk__in=product_ids).values_list('category_id', flat=True).distinct()
+    for category_id in category_ids:
+        refresh(category_id)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def forget_edited_product(sender, instance, **kwargs):
+    # The list of the category the product was moved out of too
+    category_ids = {instance.category_id, getattr(instance, '_loaded_category_id', None)} - {None}
+    cache.delete_many([_cache_key(None), *(_cache_key(category_id) for category_id in category_ids)])
@@ -0,0 +1,75 @@
+"""
+Rendered product cards, cached in CACHES['cards'] per product version and viewer. A card only changes with its
+product row, whose updated_at moves on every save, review, sale and reservation, and with who looks at it, so a
+listing looks all of its cards up in one get_many and only renders the ones that changed.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.functions import Now
+from django.dispatch import receiver
+from django.middleware.csrf import get_token
+from django.utils.safestring import mark_safe
+
+from app import images
+from app.models import Product
+from app.page_cache import CSRF_PLACEHOLDER, CSRF_TOKEN_RE
+
+TEMPLATE = 'includes/product.html'
+
+cache = caches['cards']
+
+
+def render_cards(context, products):
+    """
+    Renders TEMPLATE for each product with the surrounding template context, like an {% include %} in a loop.
+    """
+    template = context.template.engine.get_template(TEMPLATE)
+    request = context.get('request')
+    if request is None:
+        return mark_safe(''.join(_render(template, context, product) for product in products))
+
+    entries = [(_card_key(product, _viewer(request.user, product)), product) for product in products]
+    cached = cache.get_many([key for key, product in entries])
+    fresh = {}
+    cards = []
+    for key, product in entries:
+        if key in cached:
+            cards.append(_fill_csrf_token(request, cached[key]))
+            continue
+        card = _render(template, context, product)
+        # The stored card keeps a placeholder instead of this visitor's CSRF token
+        fresh[key] = CSRF_TOKEN_RE.sub(rb'\g<1>' + CSRF_PLACEHOLDER + rb'"', card.encode())
+        cards.append(card)
+    if fresh:
+        cache.set_many(fresh, settings.PRODUCT_CARD_TIMEOUT)
+    return mark_safe(''.join(cards))
+
+
+def _render(template, context, product):
+    with context.push(product=product):
+        return template.render(context)
+
+
+def _viewer(user, product):
+    # The only differences between the cards of a product are in the button under them
+    if user.is_superuser:
+        return 'superuser'
+    if user.id == product.seller_id:
+        return 'seller'
+    return 'shopper'
+
+
+def _card_key(product, viewer):
+    return f"product_card:{product.pk}:{product.updated_at.timestamp():.6f}:{viewer}"
+
+
+def _fill_csrf_token(request, card):
+    if CSRF_PLACEHOLDER in card:
+        card = card.replace(CSRF_PLACEHOLDER, get_token(request).encode())
+    return card.decode()
+
+
+@receiver(images.derivatives_created)
+def refresh_image_cards(sender, name, **kwargs):
+    # The cards switch from the original upload to the responsive <picture> of its derivatives
+    Product.objects.filter(image=name).update(updated_at=Now())
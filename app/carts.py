@@ -0,0 +1,122 @@
+from decimal import Decimal
+
+from django.contrib.auth.signals import user_logged_in
+from django.db import IntegrityError, transaction
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, IntegerField, Sum, Value, When, Window
+from django.dispatch import receiver
+
+from app import reservations
+from app.models import Cart, Product, ProductInCart, StockReservation
+
+# Anonymous visitors keep their cart in the session as {product id: quantity}, until they log in
+SESSION_KEY = 'cart'
+CENT = Decimal('0.01')
+
+_money = DecimalField(max_digits=12, decimal_places=2)
+_line_total = ExpressionWrapper(F('quantity') * F('product__price'), output_field=_money)
+
+
+def load_cart(request):
+    """
+    Returns the cart lines, with their products, and the cart total. A user's cart is loaded in one query,
+    which also computes the line subtotals and the total, a session cart with one query for its products.
+    """
+    if not request.user.is_authenticated:
+        return _session_lines(request)
+
+    lines = list(ProductInCart.objects.filter(cart__customer=request.user)
+                 .select_related('product')
+                 .annotate(line_total=_line_total, cart_total=Window(Sum(_line_total), output_field=_money))
+                 .order_by('pk'))
+    # SQLite returns computed decimals unscaled, e.g. 42 for 42.00
+    return lines, (lines[0].cart_total if lines else Decimal(0)).quantize(CENT)
+
+
+def add(request, product, quantity=1):
+    """
+    Adds the product to the cart, returns False when not enough stock is left. The stock is reserved for the lines
+    of a user's cart, a session cart only reserves it at checkout.
+    """
+    if not request.user.is_authenticated:
+        cart = request.session.get(SESSION_KEY, {})
+        cart[str(product.pk)] = cart.get(str(product.pk), 0) + quantity
+        request.session[SESSION_KEY] = cart
+        return True
+
+    cart = _user_cart(request.user)
+    try:
+        with transaction.atomic():
+            return _add_line(cart, product, quantity)
+    except IntegrityError:
+        # A concurrent request added the same product first
+        with transaction.atomic():
+            return _add_line(cart, product, quantity)
+
+
+def remove(request, product_id):
+    if not request.user.is_authenticated:
+        cart = request.session.get(SESSION_KEY, {})
+        if cart.pop(str(product_id), None) is not None:
+            request.session[SESSION_KEY] = cart
+        return
+    with transaction.atomic():
+        reservations.release(StockReservation.objects.filter(cart__customer=request.user, product_id=product_id))
+        ProductInCart.objects.filter(cart__customer=request.user, product_id=product_id).delete()
+
+
+def session_line_count(request):
+    return len(request.session.get(SESSION_KEY, {}))
+
+
+def has_session_cart(request):
+    return bool(request.session.get(SESSION_KEY))
+
+
+@receiver(user_logged_in)
+def merge_session_cart(sender, request, user, **kwargs):
+    """
+    Moves the lines an anonymous visitor added into their cart once they log in, in a fixed number of queries.
+    """
+    session_cart = request.session.pop(SESSION_KEY, None) if request is not None else None
+    if not session_cart:
+        return
+    quantities = {int(product_id): quantity for product_id, quantity in session_cart.items()}
+    # Products deleted since they were added, or sold by the user, are dropped
+    product_ids = set(Product.objects.filter(pk__in=quantities).exclude(seller=user).values_list('pk', flat=True))
+    quantities = {product_id: quantity for product_id, quantity in quantities.items() if product_id in product_ids}
+    if not quantities:
+        return
+
+    with transaction.atomic():
+        cart = _user_cart(user)
+        existing = set(cart.products_in_cart.filter(product__in=quantities).values_list('product_id', flat=True))
+        if existing:
+            added = Case(*[When(product_id=product_id, then=Value(quantities[product_id]))
+                           for product_id in existing], output_field=IntegerField())
+            cart.products_in_cart.filter(product__in=existing).update(quantity=F('quantity') + added)
+        ProductInCart.objects.bulk_create([
+            ProductInCart(cart=cart, product_id=product_id, quantity=quantity)
+            for product_id, quantity in quantities.items() if product_id not in existing
+        ])
+
+
+def _session_lines(request):
+    quantities = {int(product_id): quantity for product_id, quantity in request.session.get(SESSION_KEY, {}).items()}
+    products = Product.objects.in_bulk(quantities)
+    lines = [ProductInCart(product=products[product_id], quantity=quantity)
+             for product_id, quantity in quantities.items() if product_id in products]
+    return lines, sum((line.subtotal() for line in lines), Decimal(0)).quantize(CENT)
+
+
+def _user_cart(user):
+    cart = Cart.objects.filter(customer=user).order_by('pk').first()
+    return cart or Cart.objects.create(customer=user)
+
+
+def _add_line(cart, product, quantity):
+    # One UPDATE when the product is already in the cart, otherwise an INSERT
+    if not reservations.reserve(cart, product.pk, quantity):
+        return False
+    if not cart.products_in_cart.filter(product=product).update(quantity=F('quantity') + quantity):
+        ProductInCart.objects.create(cart=cart, product=product, quantity=quantity)
+    return True
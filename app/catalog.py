@@ -0,0 +1,46 @@
+"""
+The queries and template contexts of the read-only catalog pages, shared by their views in app.views and their async
+versions in app.async_views, which only differ in how they run them.
+"""
+from django.core.paginator import Paginator
+from django.db.models import Count, Q
+from django.utils.http import urlencode
+
+from app import reviews as product_reviews
+from app.models import Category, Product
+
+
+def detail_queryset():
+    return Product.objects.select_related('seller')
+
+
+def categories_queryset():
+    in_stock = Q(product__quantity__gt=0)
+    return Category.objects.annotate(product_count=Count('product'),
+                                     in_stock_count=Count('product', filter=in_stock)).order_by('name')
+
+
+def category_products(category):
+    return Product.objects.filter(category=category)
+
+
+def products_context(page, search_term):
+    return {"products": page.products, "page": page, "search_term": search_term}
+
+
+def category_list_context(category, page, best_sellers):
+    return {"products": page.products, "page": page, "category": category, "best_sellers": best_sellers}
+
+
+def review_sort(request):
+    return request.GET.get('sort', product_reviews.DEFAULT_SORT)
+
+
+def reviews_paginator(product, sort):
+    return Paginator(product_reviews.sorted_reviews(product, sort), product_reviews.REVIEWS_PER_PAGE)
+
+
+def reviews_context(product, sort, page, histogram):
+    return {"product": product, "reviews": page, "page": page, "sort": sort,
+            "sort_choices": product_reviews.SORT_CHOICES, "page_query": urlencode({"sort": sort}),
+            "histogram": histogram}
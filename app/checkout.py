@@ -0,0 +1,82 @@
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Now
+from django.dispatch import Signal
+
+from app import reservations, sales
+from app.models import Cart, Order, Product, ProductInCart, ProductInOrder, StockReservation
+
+# Sent after the order is committed, with the ids of the products whose stock changed
+order_placed = Signal()
+
+
+class OutOfStock(Exception):
+    def __init__(self, products):
+        self.products = products
+        super().__init__("Not enough stock left for: " + ", ".join(str(product) for product in products))
+
+
+class _StockConflict(Exception):
+    def __init__(self, quantities):
+        self.quantities = quantities
+
+
+def place_order(user):
+    try:
+        return _place_order(user)
+    except _StockConflict as conflict:
+        # Look the shortages up only after the partial stock update was rolled back
+        raise OutOfStock(_short_products(conflict.quantities)) from None
+
+
+def _place_order(user):
+    with transaction.atomic():
+        # Written before anything is read. SQLite waits up to busy_timeout for the write lock of a transaction that
+        # hasn't read yet, but one that read first fails with "database is locked" as soon as another checkout
+        # committed. Elsewhere it locks the cart row, so concurrent checkouts of one user run one after the other
+        Cart.objects.filter(customer=user).update(updated_at=Now())
+        lines = list(ProductInCart.objects.filter(cart__customer=user).select_related('product'))
+        if not lines:
+            return None
+
+        quantities = {}
+        prices = {}
+        for line in lines:
+            quantities[line.product_id] = quantities.get(line.product_id, 0) + line.quantity
+            prices[line.product_id] = line.product.price
+
+        # The reserved stock was already taken when the products were added, only what the reservations don't cover
+        # (session carts merged on login, holds that expired and were released) is taken now, and held stock the
+        # cart no longer needs is given back. That happens in a single UPDATE that only matches the rows with enough
+        # stock left, so concurrent checkouts can never oversell, and a fully reserved cart doesn't write the
+        # products at all. Their sold counts are added later from the sales rollups, see sales.apply_sold()
+        reserved = reservations.consume(StockReservation.objects.filter(cart__customer=user))
+        missing = {product_id: quantities.get(product_id, 0) - reserved.get(product_id, 0)
+                   for product_id in quantities.keys() | reserved.keys()}
+        missing = {product_id: quantity for product_id, quantity in missing.items() if quantity}
+        if missing:
+            in_stock = Q()
+            for product_id, quantity in missing.items():
+                in_stock |= Q(pk=product_id, quantity__gte=quantity) if quantity > 0 else Q(pk=product_id)
+            updated = Product.objects.filter(in_stock).update(
+                quantity=F('quantity') - reservations.by_product(missing), updated_at=Now())
+            if updated != len(missing):
+                raise _StockConflict({product_id: quantity for product_id, quantity in missing.items() if quantity > 0})
+
+        order = Order.objects.create(customer=user,
+                                     total=sum(prices[product_id] * quantity
+                                               for product_id, quantity in quantities.items()))
+        order_lines = ProductInOrder.objects.bulk_create([
+            ProductInOrder(order=order, product_id=product_id, quantity=quantity, unit_price=prices[product_id])
+            for product_id, quantity in quantities.items()
+        ])
+        sales.record_order(order, order_lines, {line.product_id: line.product.seller_id for line in lines})
+        ProductInCart.objects.filter(pk__in=[line.pk for line in lines]).delete()
+
+        transaction.on_commit(lambda: order_placed.send(sender=Order, order=order, product_ids=list(missing)))
+    return order
+
+
+def _short_products(quantities):
+    return [product for product in Product.objects.filter(pk__in=quantities)
+            if product.quantity < quantities[product.pk]]
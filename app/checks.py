@@ -0,0 +1,36 @@
+"""
+System checks of the deployment settings the caches depend on.
+
+The page cache, the best sellers and the slug caches' version counters are invalidated through CACHES['default']. A
+per-process backend only invalidates them in the worker that made the change, the others keep serving stale pages,
+categories and slugs.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+SHARED_CACHE_HINT = "Use a shared backend such as Memcached or Redis for CACHES['default']."
+
+
+def _local_default_cache():
+    return settings.CACHES['default']['BACKEND'] in LOCAL_CACHES
+
+
+@register(Tags.caches)
+def check_workers_share_the_cache(app_configs, **kwargs):
+    if settings.WEB_WORKERS > 1 and _local_default_cache():
+        return [Error(f"WEB_WORKERS is {settings.WEB_WORKERS}, but CACHES['default'] is local to each process.",
+                      hint=SHARED_CACHE_HINT, id='app.E001')]
+    return []
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    # WEB_WORKERS is only a hint, the server may still be started with more workers
+    if _local_default_cache():
+        return [Warning("CACHES['default'] is local to each process, any further worker process serves stale pages.",
+                        hint=SHARED_CACHE_HINT, id='app.W001')]
+    return []
@@ -0,0 +1,53 @@
+import time
+
+from django.contrib.auth.models import User
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.functional import SimpleLazyObject
+
+from app import carts, images
+from app.models import CustomUser, ProductInCart
+
+SESSION_KEY = 'navbar'
+# The avatar can change outside of the user's session (e.g. through the admin), so reload it every now and then
+MAX_AGE = 5 * 60
+
+
+def navbar(request):
+    return {"navbar": SimpleLazyObject(lambda: _load_navbar(request))}
+
+
+def forget_navbar(request):
+    # Called by every view that changes what the header shows, the next page reloads it in one query
+    request.session.pop(SESSION_KEY, None)
+
+
+def _load_navbar(request):
+    if not request.user.is_authenticated:
+        # Read from the session cart, which costs no query
+        return {'cart_count': carts.session_line_count(request)}
+    cached = request.session.get(SESSION_KEY)
+    if cached and cached['expires'] > time.time():
+        return cached
+
+    cart_count = (ProductInCart.objects.filter(cart__customer=OuterRef('pk')).order_by()
+                  .values('cart__customer').annotate(count=Count('id')).values('count'))
+    count, image = (User.objects.filter(pk=request.user.pk)
+                    .annotate(cart_count=Coalesce(Subquery(cart_count), 0))
+                    .values_list('cart_count', 'profile__image').get())
+    navbar = {
+        'cart_count': count,
+        'avatar_url': _avatar_url(image),
+        'expires': time.time() + MAX_AGE,
+    }
+    request.session[SESSION_KEY] = navbar
+    return navbar
+
+
+def _avatar_url(image):
+    if not image:
+        return ''
+    storage = CustomUser._meta.get_field('image').storage
+    if images.has_derivatives(image, storage):
+        return storage.url(images.derivative_name(image, images.WIDTHS[0], 'webp'))
+    return storage.url(image)
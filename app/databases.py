@@ -0,0 +1,138 @@
+import contextlib
+import contextvars
+import functools
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.decorators import sync_and_async_middleware
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+PIN_COOKIE = 'primary_until'
+# Sessions are written on login and read on every page, a lagging replica would log users out
+PRIMARY_ONLY_APPS = {'sessions'}
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+_request_writes = contextvars.ContextVar('request_writes', default=None)
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends the reads of the views decorated with `read_from_replica` to the replica, when one is configured, and
+    everything else (writes, carts, checkout, the admin) to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            return REPLICA
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        writes = _request_writes.get()
+        if writes is not None and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            writes.add(model._meta.label)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica is a copy of the primary, rows from both can be related
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its tables from the primary, see the sync_replica command
+        return db == PRIMARY
+
+
+def read_from_replica(view):
+    """
+    Lets the view read from the replica, unless the visitor wrote something in the last REPLICA_PIN_SECONDS,
+    so they always see their own changes.
+    """
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            token = _replica_reads.set(_may_use_replica(request))
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = _replica_reads.set(_may_use_replica(request))
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+    return wrapper
+
+
+@contextlib.contextmanager
+def primary_reads():
+    """
+    Sends the reads inside the block to the primary, in a view decorated with `read_from_replica` too. For the
+    reads that fill a cache: it is invalidated when the primary commits, before the replica has synced, so rows
+    read from the replica would be cached again under the new version.
+    """
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@sync_and_async_middleware
+def pin_primary_after_writes(get_response):
+    """
+    Once a request wrote to the database (a checkout, a review, a cart change, even through GET), the visitor's
+    reads stay on the primary for REPLICA_PIN_SECONDS, until the replica has caught up.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = _request_writes.set(set())
+            try:
+                response = await get_response(request)
+                _pin(response, _request_writes.get())
+            finally:
+                _request_writes.reset(token)
+            return response
+    else:
+        def middleware(request):
+            token = _request_writes.set(set())
+            try:
+                response = get_response(request)
+                _pin(response, _request_writes.get())
+            finally:
+                _request_writes.reset(token)
+            return response
+    return middleware
+
+
+def _pin(response, writes):
+    if writes and REPLICA in settings.DATABASES:
+        response.set_cookie(PIN_COOKIE, str(int(time.time()) + settings.REPLICA_PIN_SECONDS),
+                            max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax')
+
+
+def _may_use_replica(request):
+    if REPLICA not in settings.DATABASES:
+        return False
+    try:
+        return int(request.COOKIES.get(PIN_COOKIE, 0)) < time.time()
+    except ValueError:
+        return True
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+        if connection.alias == REPLICA:
+            # Only sync_replica writes to the replica, through its own connection
+            cursor.execute("PRAGMA query_only = ON")
@@ -0,0 +1,140 @@
+import csv
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpResponseBadRequest, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.views.decorators.http import require_safe
+
+from app.models import Order, Product, ProductInOrder
+
+CHUNK_SIZE = 2000
+FORMATS = {
+    'csv': 'text/csv',
+    'json': 'application/json',
+}
+STATUSES = [status for status, label in Order._meta.get_field('status').choices]
+
+ORDER_COLUMNS = ['order_id', 'created_at', 'status', 'customer', 'total']
+SALES_COLUMNS = ['order_id', 'created_at', 'status', 'customer', 'product_id', 'product', 'seller', 'quantity',
+                 'unit_price', 'subtotal']
+PRODUCT_COLUMNS = ['product_id', 'name', 'slug', 'category', 'seller', 'price', 'quantity', 'sold',
+                   'average_rating', 'rating_count', 'created_at']
+
+
+class _Echo:
+    # The csv writer only needs write(), which hands each formatted line back instead of buffering it
+    def write(self, value):
+        return value
+
+
+class _BadFilter(Exception):
+    pass
+
+
+@require_safe
+@login_required(login_url='login')
+def export_orders(request, file_format):
+    """
+    One row per order, staff only since an order can hold the products of several sellers.
+    Accepts the `from`, `to` (YYYY-MM-DD, inclusive) and `status` filters.
+    """
+    if not request.user.is_staff:
+        raise PermissionDenied
+    try:
+        orders = _filters(Order.objects.select_related('customer').only(
+            'created_at', 'status', 'total', 'customer__username'), request.GET, 'created_at')
+    except _BadFilter as error:
+        return HttpResponseBadRequest(str(error))
+    rows = ([order.id, order.created_at, order.status, order.customer.username, order.total]
+            for order in orders.order_by('id').iterator(chunk_size=CHUNK_SIZE))
+    return _stream('orders', file_format, ORDER_COLUMNS, rows)
+
+
+@require_safe
+@login_required(login_url='login')
+def export_sales(request, file_format):
+    """
+    One row per sold product line. Sellers get the lines of their own products, staff get every line.
+    Accepts the `from`, `to` (YYYY-MM-DD, inclusive) and `status` filters of the orders.
+    """
+    lines = ProductInOrder.objects.select_related('order__customer', 'product__seller').only(
+        'quantity', 'unit_price', 'order__created_at', 'order__status', 'order__customer__username',
+        'product__name', 'product__seller__username')
+    if not request.user.is_staff:
+        lines = lines.filter(product__seller=request.user)
+    try:
+        lines = _filters(lines, request.GET, 'order__created_at', status_field='order__status')
+    except _BadFilter as error:
+        return HttpResponseBadRequest(str(error))
+    rows = ([line.order_id, line.order.created_at, line.order.status, line.order.customer.username,
+             line.product_id, line.product.name, line.product.seller.username, line.quantity, line.unit_price,
+             line.subtotal()]
+            for line in lines.order_by('id').iterator(chunk_size=CHUNK_SIZE))
+    return _stream('sales', file_format, SALES_COLUMNS, rows)
+
+
+@require_safe
+@login_required(login_url='login')
+def export_products(request, file_format):
+    """
+    The catalog of the seller, or the whole catalog for staff. Accepts the `from` and `to` (YYYY-MM-DD, inclusive)
+    filters on the date the products were added.
+    """
+    products = Product.objects.select_related('category', 'seller').only(
+        'name', 'slug', 'price', 'quantity', 'sold', 'average_rating', 'rating_count', 'created_at',
+        'category__name', 'seller__username')
+    if not request.user.is_staff:
+        products = products.filter(seller=request.user)
+    try:
+        products = _filters(products, request.GET, 'created_at', status_field=None)
+    except _BadFilter as error:
+        return HttpResponseBadRequest(str(error))
+    rows = ([product.id, product.name, product.slug, product.category.name, product.seller.username, product.price,
+             product.quantity, product.sold, product.average_rating, product.rating_count, product.created_at]
+            for product in products.order_by('id').iterator(chunk_size=CHUNK_SIZE))
+    return _stream('products', file_format, PRODUCT_COLUMNS, rows)
+
+
+def _filters(queryset, params, date_field, status_field='status'):
+    # Dates become a half-open datetime range, so the created_at indexes stay usable
+    for param, lookup, days in [('from', 'gte', 0), ('to', 'lt', 1)]:
+        if params.get(param):
+            date = parse_date(params[param]) if len(params[param]) == 10 else None
+            if date is None:
+                raise _BadFilter(f"{param} must be a YYYY-MM-DD date")
+            start = timezone.make_aware(datetime.combine(date + timedelta(days=days), time.min))
+            queryset = queryset.filter(**{f"{date_field}__{lookup}": start})
+    if status_field and params.get('status'):
+        if params['status'] not in STATUSES:
+            raise _BadFilter(f"status must be one of {', '.join(STATUSES)}")
+        queryset = queryset.filter(**{status_field: params['status']})
+    return queryset
+
+
+def _stream(name, file_format, columns, rows):
+    if file_format not in FORMATS:
+        raise Http404("Unknown export format")
+    content = _csv_lines(columns, rows) if file_format == 'csv' else _json_array(columns, rows)
+    response = StreamingHttpResponse(content, content_type=FORMATS[file_format])
+    response['Content-Disposition'] = f'attachment; filename="{name}-{timezone.now():%Y%m%d}.{file_format}"'
+    return response
+
+
+def _csv_lines(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _json_array(columns, rows):
+    encoder = DjangoJSONEncoder()
+    separator = '[\n'
+    for row in rows:
+        yield separator + encoder.encode(dict(zip(columns, row)))
+        separator = ',\n'
+    yield '[]\n' if separator == '[\n' else '\n]\n'
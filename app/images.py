@@ -0,0 +1,123 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models.signals import post_save
+from django.dispatch import Signal, receiver
+from PIL import Image, ImageOps
+
+from app.models import CustomUser, Product
+
+logger = logging.getLogger(__name__)
+
+# Product cards are 13rem wide, cart rows 150px and avatars 40px, the larger widths cover high density screens
+WIDTHS = (160, 320, 640)
+FORMATS = {
+    'webp': 'WEBP',
+    'jpg': 'JPEG',
+}
+DERIVATIVES_DIR = 'derivatives'
+QUALITY = 80
+
+# Sent with the name of the original once all of its derivatives exist
+derivatives_created = Signal()
+
+# Its threads only start with the first submitted image
+_executor = ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS or 1, thread_name_prefix='image-derivatives')
+
+
+def derivative_name(name, width, extension):
+    return f"{DERIVATIVES_DIR}/{PurePosixPath(name).with_suffix('')}-{width}w.{extension}"
+
+
+def derivative_names(name):
+    return [derivative_name(name, width, extension) for width in WIDTHS for extension in FORMATS]
+
+
+def has_derivatives(name, storage=default_storage):
+    # The smallest JPEG is written last, so its presence means the whole set is ready
+    return storage.exists(derivative_name(name, WIDTHS[0], 'jpg'))
+
+
+def generate_derivatives(name, force=False, storage=default_storage):
+    missing = [target for target in derivative_names(name) if force or not storage.exists(target)]
+    if not missing:
+        return 0
+
+    with storage.open(name) as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original.load()
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+
+    created = 0
+    # Largest first and JPEG last, so has_derivatives() only turns true once every file exists
+    for width in reversed(WIDTHS):
+        resized = original.copy()
+        # Never upscales, small originals are only re-encoded
+        resized.thumbnail((width, original.height), Image.LANCZOS)
+        for extension, image_format in FORMATS.items():
+            target = derivative_name(name, width, extension)
+            if target not in missing:
+                continue
+            image = resized if image_format == 'WEBP' else _flatten(resized)
+            buffer = BytesIO()
+            image.save(buffer, image_format, quality=QUALITY)
+            storage.delete(target)
+            storage.save(target, ContentFile(buffer.getvalue()))
+            created += 1
+    derivatives_created.send(sender=None, name=name)
+    return created
+
+
+def schedule_derivatives(name):
+    # Uploads return right away, the derivatives are generated by the worker pool once the row is committed
+    if not name:
+        return
+    if settings.IMAGE_WORKERS:
+        transaction.on_commit(lambda: _executor.submit(_generate_in_background, name))
+    else:
+        transaction.on_commit(lambda: _generate(name))
+
+
+def run_in_worker(function, *args):
+    """
+    Calls function on a pool thread and closes the database connections it opened there, e.g. for the
+    derivatives_created receivers, since no request_finished ever closes them.
+    """
+    try:
+        return function(*args)
+    finally:
+        connections.close_all()
+
+
+def _generate_in_background(name):
+    run_in_worker(_generate, name)
+
+
+def _generate(name):
+    try:
+        generate_derivatives(name)
+    except Exception:
+        logger.exception("Could not generate the derivatives of %s", name)
+
+
+def _flatten(image):
+    if image.mode == 'RGB':
+        return image
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=CustomUser)
+def create_image_derivatives(sender, instance, **kwargs):
+    # Only for a new or replaced image, the stock, price and profile edits keep the derivatives they have
+    if instance.image.name != getattr(instance, '_loaded_image', None):
+        schedule_derivatives(instance.image.name)
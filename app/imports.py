@@ -0,0 +1,211 @@
+import csv
+import hashlib
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path, PurePosixPath
+from time import perf_counter
+from urllib.parse import urlparse
+from urllib.request import urlopen
+
+from django import forms
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils.text import slugify
+from PIL import Image
+
+from app import images, page_cache
+from app.forms import ProductForm
+from app.models import Category, Product, unique_slug
+
+BATCH_SIZE = 500
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+FETCH_TIMEOUT = 10
+FORMATS = ('csv', 'jsonl')
+# Slug prefixes looked up per query, each is a LIKE term of the WHERE clause
+SLUG_PREFIXES_PER_QUERY = 100
+
+
+class ProductImportForm(ProductForm):
+    """
+    ProductForm rules for one imported row. The category is given by its slug and looked up in a mapping
+    loaded once per import, the image is fetched and checked separately by the worker pool.
+    """
+    category = forms.CharField()
+
+    class Meta(ProductForm.Meta):
+        exclude = ProductForm.Meta.exclude + ['image']
+
+    def __init__(self, *args, categories, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.categories = categories
+
+    def clean_category(self):
+        try:
+            return self.categories[self.cleaned_data['category']]
+        except KeyError:
+            raise forms.ValidationError("Unknown category")
+
+    def _get_validation_exclusions(self):
+        # The category comes from the mapping, model validation would query it again for every row
+        exclude = super()._get_validation_exclusions()
+        exclude.add('category')
+        return exclude
+
+
+class ImportReport:
+    def __init__(self, on_error=None):
+        self.rows = 0
+        self.created = 0
+        self.errors = 0
+        self.started = perf_counter()
+        self.on_error = on_error
+
+    def error(self, row_number, message):
+        # Errors are handed over as they happen instead of being kept, a bad file can have millions of them
+        self.errors += 1
+        if self.on_error:
+            self.on_error(row_number, message)
+
+    @property
+    def rows_per_second(self):
+        return self.rows / max(perf_counter() - self.started, 1e-9)
+
+
+class MalformedRow:
+    # Yielded by read_rows() for a line that isn't a row, import_products() reports it like an invalid row
+    def __init__(self, message):
+        self.message = message
+
+
+def read_rows(file, file_format):
+    """
+    Yields the rows of a CSV file (with a header line) or of a JSON Lines file (one object per line)
+    one at a time, so the input is never loaded whole. A line that isn't a JSON object is yielded as a
+    MalformedRow.
+    """
+    if file_format == 'csv':
+        yield from csv.DictReader(file)
+    elif file_format == 'jsonl':
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as error:
+                yield MalformedRow(f"Invalid JSON: {error.msg}")
+                continue
+            yield row if isinstance(row, dict) else MalformedRow("Not a JSON object")
+    else:
+        raise ValueError(f"Unknown import format {file_format!r}")
+
+
+def import_products(rows, seller, image_root='.', batch_size=BATCH_SIZE, workers=4, on_batch=None, on_error=None):
+    """
+    Validates and inserts the rows as products of `seller`, `batch_size` rows per `bulk_create`, while a pool of
+    `workers` threads fetches the images (URLs or paths relative to `image_root`), stores them and generates their
+    derivatives. Rows with invalid fields or an unusable image are skipped and passed to `on_error`.
+    """
+    report = ImportReport(on_error)
+    categories = {category.slug: category for category in Category.objects.all()}
+    # The same picture is often shared by a whole product line, it is fetched once per batch (and stored once, under
+    # its content hash). Only the batch's futures are kept, a huge import would hold one per distinct image
+    stored_images = {}
+    touched_categories = set()
+
+    numbered = enumerate(rows, start=1)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='product-import') as executor:
+        while batch := list(islice(numbered, batch_size)):
+            report.rows += len(batch)
+            pending = []
+            for row_number, row in batch:
+                if isinstance(row, MalformedRow):
+                    report.error(row_number, row.message)
+                    continue
+                form = ProductImportForm(row, categories=categories)
+                if not form.is_valid():
+                    report.error(row_number, _form_errors(form))
+                    continue
+                source = (row.get('image') or '').strip()
+                if not source:
+                    report.error(row_number, "image: This field is required.")
+                    continue
+                if source not in stored_images:
+                    stored_images[source] = executor.submit(images.run_in_worker, store_image, source, image_root)
+                pending.append((row_number, form.save(commit=False), stored_images[source]))
+
+            taken = _taken_slugs(seller, [product.name for row_number, product, stored in pending])
+            products = []
+            for row_number, product, stored in pending:
+                try:
+                    product.image = stored.result()
+                except Exception as error:
+                    report.error(row_number, f"image: {error}")
+                    continue
+                product.seller = seller
+                product.slug = unique_slug(product.name, taken)
+                products.append(product)
+                touched_categories.add(product.category.slug)
+
+            with transaction.atomic():
+                Product.objects.bulk_create(products)
+            stored_images.clear()
+            report.created += len(products)
+            if on_batch:
+                on_batch(report)
+
+    # bulk_create sends no signals, the cached catalog pages are dropped once at the end
+    if report.created:
+        page_cache.invalidate('categories')
+        page_cache.invalidate('seller_profile', seller.username)
+        for slug in touched_categories:
+            page_cache.invalidate('category_list', slug)
+    return report
+
+
+def store_image(source, image_root='.'):
+    """
+    Fetches an image from a URL or a local path, checks it is a picture Pillow can read, saves it under the
+    product upload directory and generates its derivatives. Returns the stored name.
+    """
+    if urlparse(source).scheme in ('http', 'https'):
+        with urlopen(source, timeout=FETCH_TIMEOUT) as response:
+            content = response.read(MAX_IMAGE_BYTES + 1)
+    else:
+        with open(Path(image_root) / source, 'rb') as file:
+            content = file.read(MAX_IMAGE_BYTES + 1)
+    if len(content) > MAX_IMAGE_BYTES:
+        raise ValueError(f"larger than {MAX_IMAGE_BYTES // (1024 * 1024)} MB")
+
+    try:
+        with Image.open(io.BytesIO(content)) as image:
+            image.verify()
+    except Exception:
+        raise ValueError("not a valid image")
+
+    # Named after the content, so importing the same catalog again reuses the stored files
+    extension = PurePosixPath(urlparse(source).path).suffix.lower() or '.jpg'
+    name = f"{Product.image.field.upload_to}{hashlib.md5(content, usedforsecurity=False).hexdigest()}{extension}"
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(content))
+    images.generate_derivatives(name)
+    return name
+
+
+def _taken_slugs(seller, names):
+    # Only the seller's slugs the names can collide with, e.g. "windows-10" and "windows-10-2" for "Windows 10"
+    prefixes = sorted({slugify(name) for name in names})
+    taken = set()
+    for start in range(0, len(prefixes), SLUG_PREFIXES_PER_QUERY):
+        collisions = Q()
+        for prefix in prefixes[start:start + SLUG_PREFIXES_PER_QUERY]:
+            collisions |= Q(slug__startswith=prefix)
+        taken.update(seller.products.filter(collisions).values_list('slug', flat=True))
+    return taken
+
+
+def _form_errors(form):
+    return "; ".join(f"{field}: {' '.join(messages)}" for field, messages in form.errors.items())
@@ -0,0 +1,220 @@
+import json
+import logging
+import random
+import re
+import threading
+from collections import Counter
+from contextlib import ExitStack
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connections
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+# Longest SQL kept in the logs and stats
+SQL_PREVIEW_LENGTH = 300
+# Repeated statements kept per view by view_stats(), the most repeated ones
+REPEATED_STATEMENTS_KEPT = 50
+# IN lists of placeholders, whose length varies with the parameters
+IN_LIST_RE = re.compile(r'\bIN \((?:%s|\?)(?:, ?(?:%s|\?))*\)')
+
+
+class QueryRecorder:
+    """
+    Records the queries run on every database connection of the current thread, using execute wrappers,
+    so it also works with DEBUG off:
+
+        with QueryRecorder() as recorder:
+            ...
+        recorder.count, recorder.duration, recorder.duplicates
+
+    `count_rows` additionally counts the rows fetched from the cursors, which costs a little per row.
+    """
+
+    def __init__(self, count_rows=False):
+        self.count_rows = count_rows
+        self.count = 0
+        self.duration = 0.0
+        self.rows = 0
+        self.statements = Counter()
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.count_rows and not isinstance(context['cursor'].cursor, _RowCountingCursor):
+            context['cursor'].cursor = _RowCountingCursor(context['cursor'].cursor, self)
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += perf_counter() - start
+            self.count += 1
+            self.statements[IN_LIST_RE.sub('IN (...)', sql)] += 1
+
+    @property
+    def duplicates(self):
+        # The same SQL run more than once, usually an N+1 pattern (the parameters and the length of the IN lists
+        # are ignored)
+        return {sql: count for sql, count in self.statements.items() if count > 1}
+
+
+class _RowCountingCursor:
+    def __init__(self, cursor, recorder):
+        self._cursor = cursor
+        self._recorder = recorder
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._recorder.rows += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._recorder.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._recorder.rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._recorder.rows += 1
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Records the queries of a sample of the requests (SQL_INSTRUMENTATION_SAMPLE_RATE). For each sampled request
+    it logs one JSON line to the `app.instrumentation` logger, with a warning when a statement ran
+    SQL_DUPLICATE_THRESHOLD times or more, adds the numbers to the per-view totals of `view_stats()` and, for the
+    staff or with DEBUG on, a Server-Timing header. Queries run while a streaming response is consumed are not
+    counted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.SQL_INSTRUMENTATION_SAMPLE_RATE:
+            return self.get_response(request)
+
+        start = perf_counter()
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        self._report(request, response, recorder, perf_counter() - start, _shows_timing(request))
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= settings.SQL_INSTRUMENTATION_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        # The async ORM runs its queries in the request's sync thread, the wrappers go on that thread's connections
+        start = perf_counter()
+        recorder = QueryRecorder()
+        await sync_to_async(recorder.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recorder.__exit__)(None, None, None)
+        # Loading the user touches the database
+        shows_timing = await sync_to_async(_shows_timing)(request)
+        self._report(request, response, recorder, perf_counter() - start, shows_timing)
+        return response
+
+    def _report(self, request, response, recorder, elapsed, shows_timing):
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        duplicates = recorder.duplicates
+        _aggregate(view_name, recorder, elapsed, duplicates)
+
+        if settings.SQL_SERVER_TIMING and shows_timing:
+            response['Server-Timing'] = (f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries, '
+                                         f'{sum(duplicates.values()) - len(duplicates)} repeated"')
+        repeated = {sql: count for sql, count in duplicates.items() if count >= settings.SQL_DUPLICATE_THRESHOLD}
+        record = {
+            'view': view_name,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_ms': round(recorder.duration * 1000, 2),
+            'total_ms': round(elapsed * 1000, 2),
+            'repeated': [{'sql': sql[:SQL_PREVIEW_LENGTH], 'count': count} for sql, count in repeated.items()],
+        }
+        logger.log(logging.WARNING if repeated else logging.INFO, json.dumps(record))
+
+
+def _shows_timing(request):
+    # The query counts tell visitors more about the site than they need to know
+    if settings.DEBUG:
+        return True
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_staff
+
+
+_view_totals = {}
+_view_totals_lock = threading.Lock()
+
+
+def _aggregate(view_name, recorder, elapsed, duplicates):
+    with _view_totals_lock:
+        totals = _view_totals.setdefault(view_name, {
+            'requests': 0, 'queries': 0, 'max_queries': 0, 'db_ms': 0.0, 'total_ms': 0.0, 'repeated': Counter(),
+        })
+        totals['requests'] += 1
+        totals['queries'] += recorder.count
+        totals['max_queries'] = max(totals['max_queries'], recorder.count)
+        totals['db_ms'] += recorder.duration * 1000
+        totals['total_ms'] += elapsed * 1000
+        for sql, count in duplicates.items():
+            totals['repeated'][sql[:SQL_PREVIEW_LENGTH]] += count
+        if len(totals['repeated']) > 2 * REPEATED_STATEMENTS_KEPT:
+            totals['repeated'] = Counter(dict(totals['repeated'].most_common(REPEATED_STATEMENTS_KEPT)))
+
+
+def view_stats():
+    """
+    Per-view totals of the sampled requests since this process started, with the statements each view
+    repeated most often.
+    """
+    with _view_totals_lock:
+        return {
+            view_name: {
+                'requests': totals['requests'],
+                'avg_queries': totals['queries'] / totals['requests'],
+                'max_queries': totals['max_queries'],
+                'avg_db_ms': totals['db_ms'] / totals['requests'],
+                'avg_total_ms': totals['total_ms'] / totals['requests'],
+                'repeated': [{'sql': sql, 'count': count} for sql, count in totals['repeated'].most_common(5)],
+            }
+            for view_name, totals in _view_totals.items()
+        }
+
+
+@staff_member_required
+def stats_view(request):
+    return JsonResponse(view_stats())
@@ -0,0 +1,142 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import QueryDict
+
+from app.models import Product
+
+PAGE_SIZE = 24
+
+# Every ordering ends with the primary key, so the position of a row in a listing is always unique
+SORT_ORDERS = {
+    'newest': ('-created_at', '-id'),
+    'best_selling': ('-sold', '-id'),
+    'price_low': ('price', 'id'),
+    'price_high': ('-price', '-id'),
+}
+SORT_CHOICES = [
+    ('newest', 'Newest'),
+    ('best_selling', 'Best selling'),
+    ('price_low', 'Price: low to high'),
+    ('price_high', 'Price: high to low'),
+]
+DEFAULT_SORT = 'newest'
+
+
+class ListingPage:
+    sort_choices = SORT_CHOICES
+
+    def __init__(self, products, sort, cursor, next_cursor, query):
+        self.products = products
+        self.sort = sort
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.query = query if query is not None else QueryDict()
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def next_query(self):
+        query = self.query.copy()
+        query['cursor'] = self.next_cursor
+        return query.urlencode()
+
+    @property
+    def first_query(self):
+        query = self.query.copy()
+        query.pop('cursor', None)
+        return query.urlencode()
+
+
+def encode_cursor(sort, values):
+    payload = json.dumps({'sort': sort, 'values': values}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    # A malformed cursor, or one issued for another sort order, simply restarts the listing
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if payload['sort'] != sort or not isinstance(payload['values'], list):
+            return None
+        return payload['values']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        return None
+
+
+def paginate_products(queryset, sort=DEFAULT_SORT, cursor=None, page_size=PAGE_SIZE, query=None):
+    sort, cursor, queryset = _page_queryset(queryset, sort, cursor)
+    # Fetch one extra row to find out whether there is a next page
+    products = list(queryset[:page_size + 1])
+    return _listing_page(products, sort, cursor, page_size, query)
+
+
+async def apaginate_products(queryset, sort=DEFAULT_SORT, cursor=None, page_size=PAGE_SIZE, query=None):
+    sort, cursor, queryset = _page_queryset(queryset, sort, cursor)
+    products = [product async for product in queryset[:page_size + 1]]
+    return _listing_page(products, sort, cursor, page_size, query)
+
+
+def paginate_request(request, queryset, page_size=PAGE_SIZE):
+    return paginate_products(queryset, page_size=page_size, **_request_options(request))
+
+
+async def apaginate_request(request, queryset, page_size=PAGE_SIZE):
+    return await apaginate_products(queryset, page_size=page_size, **_request_options(request))
+
+
+def after(ordering, values):
+    # Rows that come after the given position: (a > x) OR (a = x AND b > y) OR ...
+    condition = Q()
+    for i, field in enumerate(ordering):
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        clause = Q(**{f"{field.lstrip('-')}__{lookup}": values[i]})
+        for previous_field, previous_value in zip(ordering[:i], values[:i]):
+            clause &= Q(**{previous_field.lstrip('-'): previous_value})
+        condition |= clause
+    return condition
+
+
+def _request_options(request):
+    return {'sort': request.GET.get('sort', DEFAULT_SORT), 'cursor': request.GET.get('cursor'), 'query': request.GET}
+
+
+def _page_queryset(queryset, sort, cursor):
+    if sort not in SORT_ORDERS:
+        sort = DEFAULT_SORT
+    ordering = SORT_ORDERS[sort]
+    queryset = queryset.order_by(*ordering)
+
+    position = _cursor_position(cursor, sort) if cursor else None
+    if position is None:
+        return sort, None, queryset
+    return sort, cursor, queryset.filter(after(ordering, position))
+
+
+def _listing_page(products, sort, cursor, page_size, query):
+    next_cursor = None
+    if len(products) > page_size:
+        products = products[:page_size]
+        next_cursor = encode_cursor(sort, [_sort_field(field).value_to_string(products[-1])
+                                           for field in SORT_ORDERS[sort]])
+    return ListingPage(products, sort, cursor, next_cursor, query)
+
+
+def _sort_field(field):
+    return Product._meta.get_field(field.lstrip('-'))
+
+
+def _cursor_position(cursor, sort):
+    values = decode_cursor(cursor, sort)
+    if values is None or len(values) != len(SORT_ORDERS[sort]) or None in values:
+        return None
+    try:
+        return [_sort_field(field).to_python(value) for field, value in zip(SORT_ORDERS[sort], values)]
+    except (ValidationError, TypeError, ValueError):
+        # Crafted cursors can hold any JSON, e.g. an object where a date is expected
+        return None
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app import sales
+
+
+class Command(BaseCommand):
+    help = "Add the units sold since the last run to the sold counts of the products, in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Product rollups applied per transaction")
+        parser.add_argument('--every', type=float, help="Keep applying, every this many seconds")
+
+    def handle(self, *args, **options):
+        while True:
+            applied = sales.apply_sold(options['batch_size'])
+            self.stdout.write(f"Added {applied} units to the sold counts")
+            if not options['every']:
+                break
+            time.sleep(options['every'])
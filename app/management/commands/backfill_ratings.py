@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from app.models import Product
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored rating aggregates of every product from its reviews"
+
+    def handle(self, *args, **options):
+        updated = Product.objects.all().refresh_ratings()
+        self.stdout.write(self.style.SUCCESS(f"Refreshed ratings of {updated} products"))
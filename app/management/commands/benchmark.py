@@ -0,0 +1,68 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (override_settings, setup_databases, setup_test_environment,
+                               teardown_databases, teardown_test_environment)
+
+from app import benchmark
+
+DEFAULT_THRESHOLDS = Path(__file__).resolve().parents[2] / 'benchmark_thresholds.json'
+
+
+class Command(BaseCommand):
+    help = ("Seed a synthetic shop in a throwaway test database, request every URL of the project and report "
+            "the p50/p95 latency, query count and rows fetched per view")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--orders', type=int, default=2000)
+        parser.add_argument('--reviews', type=int, default=5000)
+        parser.add_argument('--cart-items', type=int, default=400)
+        parser.add_argument('--seed', type=int, default=0, help="Random seed of the synthetic dataset")
+        parser.add_argument('--thresholds', default=str(DEFAULT_THRESHOLDS),
+                            help="JSON file of the limits a run must stay within")
+        parser.add_argument('--no-thresholds', action='store_true', help="Only report, never fail the run")
+        parser.add_argument('--latency-tolerance', type=float, default=1.0,
+                            help="Multiplies the latency limits, for slower machines. 0 only checks the query counts")
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            # The run records its own queries, the sampling middleware would only add log lines
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver'], SQL_INSTRUMENTATION_SAMPLE_RATE=0):
+                benchmark.clear_caches()
+                dataset = benchmark.seed(
+                    categories=options['categories'], products=options['products'], users=options['users'],
+                    orders=options['orders'], reviews=options['reviews'], cart_items=options['cart_items'],
+                    random_seed=options['seed'])
+                results = benchmark.run(dataset, iterations=options['iterations'])
+                missing = benchmark.unbenchmarked_routes(benchmark.scenarios(dataset))
+        finally:
+            benchmark.clear_caches()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            self._report(results)
+        for name in missing:
+            self.stderr.write(self.style.WARNING(f"No benchmark scenario for the {name} URL"))
+
+        if not options['no_thresholds']:
+            with open(options['thresholds']) as file:
+                failures = benchmark.check_thresholds(results, json.load(file), options['latency_tolerance'])
+            if failures:
+                raise CommandError("Benchmark thresholds exceeded:\n" + "\n".join(failures))
+
+    def _report(self, results):
+        self.stdout.write(f"{'view':<24}{'client':<11}{'p50 ms':>9}{'p95 ms':>9}{'queries':>9}{'rows':>8}")
+        for result in results:
+            self.stdout.write(f"{result['name']:<24}{result['role']:<11}{result['p50_ms']:>9.1f}"
+                              f"{result['p95_ms']:>9.1f}{result['queries']:>9}{result['rows']:>8}")
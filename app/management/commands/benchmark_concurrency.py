@@ -0,0 +1,64 @@
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test.utils import (override_settings, setup_databases, setup_test_environment,
+                               teardown_databases, teardown_test_environment)
+
+from app import benchmark
+
+
+class Command(BaseCommand):
+    help = ("Seed a synthetic shop in a throwaway test database and compare the throughput of the catalog pages "
+            "under concurrent load, through the WSGI views, the same views served by ASGI and the async views "
+            "served by ASGI, with the database connections each opened")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=16, help="Simultaneous clients")
+        parser.add_argument('--requests', type=int, default=800, help="Requests per run")
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0, help="Random seed of the synthetic dataset")
+
+    def handle(self, *args, **options):
+        # In a file, not the default in-memory test database: its shared cache locks whole tables, so concurrent
+        # clients fail with "database table is locked" instead of waiting for busy_timeout, which WAL (set by
+        # the migrations) and the SQLITE_PRAGMAS of the connections give them
+        directory = tempfile.TemporaryDirectory()
+        connections['default'].settings_dict['TEST']['NAME'] = os.path.join(directory.name, 'benchmark.sqlite3')
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            # Logged in clients, so the views run instead of the anonymous page cache
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver'], SQL_INSTRUMENTATION_SAMPLE_RATE=0):
+                dataset = benchmark.seed(products=options['products'], random_seed=options['seed'])
+                paths = benchmark.catalog_paths(dataset)
+                results = {}
+                for label, (urlconf, use_async) in benchmark.CATALOG_RUNS.items():
+                    benchmark.clear_caches()
+                    opened = []
+
+                    def count(sender, connection, **kwargs):
+                        opened.append(connection.alias)
+
+                    connection_created.connect(count)
+                    try:
+                        with override_settings(ROOT_URLCONF=urlconf):
+                            results[label] = benchmark.throughput(paths, dataset.buyers, options['concurrency'],
+                                                                  options['requests'], use_async=use_async)
+                    finally:
+                        connection_created.disconnect(count)
+                    results[label]['connections'] = len(opened)
+        finally:
+            benchmark.clear_caches()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+            directory.cleanup()
+
+        self.stdout.write(f"{options['requests']} requests over {len(paths)} catalog pages, "
+                          f"{options['concurrency']} concurrent clients")
+        self.stdout.write(f"{'path':<18}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'db connections':>16}")
+        for label, result in results.items():
+            self.stdout.write(f"{label:<18}{result['requests_per_second']:>9.1f}{result['p50_ms']:>9.1f}"
+                              f"{result['p95_ms']:>9.1f}{result['connections']:>16}")
@@ -0,0 +1,45 @@
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from app import imports
+
+
+class Command(BaseCommand):
+    help = ("Import the products of a seller from a CSV or JSON Lines file with the name, price, quantity, "
+            "description, category (slug) and image (URL or file path) of every product")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--seller', required=True, help="Username of the seller the products belong to")
+        parser.add_argument('--format', choices=imports.FORMATS,
+                            help="Input format, guessed from the file extension by default")
+        parser.add_argument('--image-root', default='.', help="Directory the image paths are relative to")
+        parser.add_argument('--batch-size', type=int, default=imports.BATCH_SIZE)
+        parser.add_argument('--workers', type=int, default=4, help="Threads fetching and resizing images")
+
+    def handle(self, *args, **options):
+        try:
+            seller = User.objects.get(username=options['seller'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['seller']}")
+        file_format = options['format'] or Path(options['path']).suffix.lstrip('.').lower()
+        if file_format not in imports.FORMATS:
+            raise CommandError("Pass --format, the format can't be guessed from the file extension")
+
+        with open(options['path'], newline='', encoding='utf-8') as file:
+            report = imports.import_products(
+                imports.read_rows(file, file_format), seller, image_root=options['image_root'],
+                batch_size=options['batch_size'], workers=options['workers'],
+                on_batch=self._progress, on_error=self._error)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report.created} of {report.rows} rows ({report.rows_per_second:.0f} rows/s), "
+            f"{report.errors} rejected"))
+
+    def _progress(self, report):
+        self.stdout.write(f"{report.rows} rows read, {report.created} imported, {report.rows_per_second:.0f} rows/s")
+
+    def _error(self, row_number, message):
+        self.stderr.write(f"Row {row_number}: {message}")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from app import sales
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily seller and product sales rollups from the order history"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Only rebuild the days from this date on (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = parse_date(options['since'])
+            except ValueError:
+                pass
+            if since is None:
+                raise CommandError("--since must be a date, YYYY-MM-DD")
+        written = sales.rebuild(since)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} seller days of sales"))
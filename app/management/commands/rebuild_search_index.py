@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text product search index from the products table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        if not search.fts_available(options['database']):
+            raise CommandError("The database has no full-text search index, searches use the LIKE fallback")
+        search.rebuild_search_index(options['database'])
+        self.stdout.write(self.style.SUCCESS("Rebuilt the product search index"))
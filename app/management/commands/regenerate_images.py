@@ -0,0 +1,39 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+
+from django.core.management.base import BaseCommand
+
+from app import images
+from app.models import CustomUser, Product
+
+
+class Command(BaseCommand):
+    help = "Generate the resized WebP/JPEG derivatives of every product image and avatar"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Regenerate derivatives that already exist")
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        names = (name for name in chain(
+            Product.objects.order_by().values_list('image', flat=True).distinct().iterator(),
+            CustomUser.objects.order_by().values_list('image', flat=True).distinct().iterator(),
+        ) if name)
+        processed = created = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            # Submit one batch at a time, so memory stays flat however many images there are
+            while batch := list(islice(names, options['batch_size'])):
+                futures = {executor.submit(images.run_in_worker, images.generate_derivatives, name,
+                                           options['force']): name
+                           for name in batch}
+                for future, name in futures.items():
+                    processed += 1
+                    try:
+                        created += future.result()
+                    except Exception as error:
+                        failed += 1
+                        self.stderr.write(f"{name}: {error}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {processed} images, wrote {created} derivatives, {failed} failed"))
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app import reservations
+
+
+class Command(BaseCommand):
+    help = "Give the stock held by expired cart reservations back to the products, in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Reservations released per transaction")
+        parser.add_argument('--every', type=float, help="Keep sweeping, every this many seconds")
+
+    def handle(self, *args, **options):
+        while True:
+            released = reservations.release_expired(options['batch_size'])
+            self.stdout.write(f"Released {released} expired reservations")
+            if not options['every']:
+                break
+            time.sleep(options['every'])
@@ -0,0 +1,38 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from app.databases import PRIMARY, REPLICA
+
+
+class Command(BaseCommand):
+    help = ("Copy the primary SQLite database into the replica with SQLite's online backup, "
+            "which doesn't block the writers of the primary")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=float, help="Keep syncing, every this many seconds")
+        parser.add_argument('--pages', type=int, default=1024,
+                            help="Pages copied per step, the primary is unlocked between steps")
+
+    def handle(self, *args, **options):
+        if REPLICA not in connections.settings:
+            raise CommandError("No replica database is configured, set DJANGO_REPLICA_DB")
+        primary, replica = connections[PRIMARY].settings_dict, connections[REPLICA].settings_dict
+        if primary['ENGINE'] != 'django.db.backends.sqlite3' or replica['ENGINE'] != primary['ENGINE']:
+            raise CommandError("sync_replica only copies SQLite databases")
+
+        while True:
+            start = time.perf_counter()
+            source = sqlite3.connect(primary['NAME'])
+            target = sqlite3.connect(replica['NAME'])
+            try:
+                source.backup(target, pages=options['pages'])
+            finally:
+                target.close()
+                source.close()
+            self.stdout.write(f"Replica synced in {(time.perf_counter() - start) * 1000:.0f} ms")
+            if not options['every']:
+                break
+            time.sleep(options['every'])
@@ -0,0 +1,150 @@
+import hashlib
+import mimetypes
+import os
+import re
+import stat as stat_module
+from functools import lru_cache
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+VERSION_PARAM = 'v'
+# Versioned URLs change whenever the file does, so browsers and proxies may keep them forever
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class VersionedMediaStorage(FileSystemStorage):
+    """
+    Appends a hash of the file content to media URLs (`/media/uploaded/i5.jpg?v=1a2b3c4d5e6f`), which lets
+    `serve` mark them as immutable.
+    """
+
+    def url(self, name):
+        url = super().url(name)
+        try:
+            file_stat = os.stat(self.path(name))
+        except (OSError, SuspiciousFileOperation):
+            return url
+        return f"{url}?{VERSION_PARAM}={file_version(self.path(name), file_stat)}"
+
+
+def file_version(path, file_stat):
+    return _content_hash(path, file_stat.st_mtime_ns, file_stat.st_size)
+
+
+@lru_cache(maxsize=4096)
+def _content_hash(path, mtime_ns, size):
+    # Keyed by modification time and size, so a file is only read again after it changed
+    digest = hashlib.md5(usedforsecurity=False)
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+@require_safe
+def serve(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        file_stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404("Media file not found")
+    if not stat_module.S_ISREG(file_stat.st_mode):
+        raise Http404("Media file not found")
+
+    version = file_version(full_path, file_stat)
+    etag = f'"{version}"'
+    last_modified = int(file_stat.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        offload = settings.MEDIA_OFFLOAD
+        if offload:
+            response = _offloaded_response(offload, path, full_path)
+        else:
+            response = _file_response(request, full_path, file_stat.st_size, etag)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = (IMMUTABLE_CACHE_CONTROL if request.GET.get(VERSION_PARAM) == version
+                                 else REVALIDATE_CACHE_CONTROL)
+    return response
+
+
+def _offloaded_response(offload, path, full_path):
+    # The front proxy streams the file (and answers range requests), the worker is free right away
+    response = HttpResponse(content_type=mimetypes.guess_type(full_path)[0] or 'application/octet-stream')
+    if offload == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = settings.MEDIA_OFFLOAD_PREFIX + quote(path)
+    elif offload == 'x-sendfile':
+        response['X-Sendfile'] = full_path
+    else:
+        raise ValueError(f"Unknown MEDIA_OFFLOAD mode {offload!r}")
+    return response
+
+
+def _file_response(request, full_path, size, etag):
+    byte_range = _requested_range(request, size, etag)
+    if byte_range is None:
+        response = FileResponse(open(full_path, 'rb'))
+        response['Accept-Ranges'] = 'bytes'
+        return response
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f"bytes */{size}"
+        return response
+
+    start, end = byte_range
+    response = StreamingHttpResponse(_read_range(full_path, start, end - start + 1), status=206,
+                                     content_type=mimetypes.guess_type(full_path)[0] or 'application/octet-stream')
+    response['Content-Range'] = f"bytes {start}-{end}/{size}"
+    response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def _requested_range(request, size, etag):
+    """
+    Returns the (start, end) byte positions of a single range request, None to send the whole file
+    (no Range header, a stale If-Range or several ranges) and False when the range can't be satisfied.
+    """
+    header = request.META.get('HTTP_RANGE', '').replace(' ', '')
+    if not header or request.META.get('HTTP_IF_RANGE', etag) != etag:
+        return None
+    match = _RANGE_RE.match(header)
+    if not match:
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    elif last:
+        # "bytes=-500" asks for the last 500 bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+    else:
+        return None
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+def _read_range(full_path, start, length):
+    with open(full_path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
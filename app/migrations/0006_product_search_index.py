@@ -0,0 +1,57 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+# The SQL as of this migration, app.search may change after it
+CREATE_TABLE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS app_product_fts USING fts5("
+    "name, description, content='app_product', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+)
+CREATE_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS app_product_fts_insert AFTER INSERT ON app_product BEGIN
+        INSERT INTO app_product_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS app_product_fts_delete AFTER DELETE ON app_product BEGIN
+        INSERT INTO app_product_fts(app_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS app_product_fts_update AFTER UPDATE OF name, description ON app_product BEGIN
+        INSERT INTO app_product_fts(app_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO app_product_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+]
+REBUILD = "INSERT INTO app_product_fts(app_product_fts) VALUES ('rebuild')"
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(CREATE_TABLE)
+            for statement in CREATE_TRIGGERS:
+                cursor.execute(statement)
+            cursor.execute(REBUILD)
+    except OperationalError:
+        # SQLite built without FTS5, searches keep using the LIKE fallback
+        pass
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for suffix in ['insert', 'delete', 'update']:
+            cursor.execute(f"DROP TRIGGER IF EXISTS app_product_fts_{suffix}")
+        cursor.execute("DROP TABLE IF EXISTS app_product_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_product_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2 on 2026-10-17 01:36
+
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_prices(apps, schema_editor):
+    # Past orders never stored their prices, the current product price is the best approximation
+    Product = apps.get_model('app', 'Product')
+    Order = apps.get_model('app', 'Order')
+    ProductInOrder = apps.get_model('app', 'ProductInOrder')
+    ProductInOrder.objects.update(
+        unit_price=Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('price')[:1]))
+    lines = (ProductInOrder.objects.filter(order=OuterRef('pk')).order_by().values('order')
+             .annotate(total=Sum(F('unit_price') * F('quantity'))).values('total'))
+    Order.objects.update(total=Coalesce(Subquery(lines), 0, output_field=DecimalField()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='productinorder',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', '-created_at', '-id'], name='order_customer_history_idx'),
+        ),
+        migrations.RunPython(backfill_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2 on 2026-10-17 01:51
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_lines(apps, schema_editor):
+    # The same product could be added to a cart twice, keep the first line with the summed quantity
+    ProductInCart = apps.get_model('app', 'ProductInCart')
+    duplicates = (ProductInCart.objects.values('cart', 'product').order_by()
+                  .annotate(lines=Count('id'), first=Min('id'), quantity=Sum('quantity')).filter(lines__gt=1))
+    for duplicate in duplicates:
+        ProductInCart.objects.filter(pk=duplicate['first']).update(quantity=duplicate['quantity'])
+        ProductInCart.objects.filter(cart=duplicate['cart'], product=duplicate['product']).exclude(
+            pk=duplicate['first']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_review_product_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='productincart',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='unique_cart_product'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2 on 2026-10-17 02:43
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_applied(apps, schema_editor):
+    # Checkout added these units to Product.sold itself
+    ProductDailySales = apps.get_model('app', 'ProductDailySales')
+    ProductDailySales.objects.update(applied_units=F('units'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_category_updated_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productdailysales',
+            name='applied_units',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(mark_applied, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='productdailysales',
+            index=models.Index(condition=models.Q(('units__gt', models.F('applied_units'))), fields=['product'], name='product_sales_unapplied_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def set_journal_mode(mode):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA journal_mode = {mode}")
+    return operation
+
+
+class Migration(migrations.Migration):
+    # The journal mode is stored in the database file, so WAL is set once here instead of on every connection,
+    # which rewrote the file even for commands that only read it. It can't be changed inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('app', '0015_productdailysales_applied_units'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_journal_mode('WAL'), set_journal_mode('DELETE')),
+    ]
@@ -1,11 +1,20 @@
+from decimal import Decimal
+
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models import Avg, Count, DecimalField, ExpressionWrapper, F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Now
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils.text import slugify
 
 
+def image_name(value):
+    # Loaded, the image field holds the file name, once accessed or saved a FieldFile
+    return getattr(value, 'name', value)
+
+
 class CustomUser(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='profile')
     address = models.CharField(max_length=255)
@@ -13,6 +22,16 @@ class CustomUser(models.Model):
     display_name = models.CharField(max_length=255)
     image = models.ImageField(upload_to='uploaded/', default='default.png')
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_loaded_values()
+        return instance
+
+    def remember_loaded_values(self):
+        # Remember the loaded image, so only a new one gets its derivatives generated
+        self._loaded_image = image_name(self.__dict__.get('image'))
+
     def __str__(self):
         return f"{self.display_name} ({self.user})"
 
@@ -20,14 +39,41 @@ class CustomUser(models.Model):
 class Category(models.Model):
     name = models.CharField(max_length=255)
     slug = models.SlugField(default="", blank=True, unique=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = 'Categories'
+        indexes = [
+            models.Index(fields=['updated_at'], name='category_updated_idx'),
+        ]
 
     def __str__(self):
         return str(self.name)
 
 
+def unique_slug(name, taken):
+    # The slug of the name, with a "-2", "-3"... suffix when the seller already uses it
+    base = slugify(name)
+    slug, suffix = base, 2
+    while slug in taken:
+        slug, suffix = f"{base}-{suffix}", suffix + 1
+    taken.add(slug)
+    return slug
+
+
+class ProductQuerySet(models.QuerySet):
+    def refresh_ratings(self):
+        # Recompute the stored rating aggregates of every product in the queryset in a single UPDATE
+        reviews = Review.objects.filter(product=OuterRef('pk')).order_by().values('product')
+        return self.update(
+            updated_at=Now(),
+            rating_sum=Coalesce(Subquery(reviews.annotate(total=Sum('rating')).values('total')), 0),
+            rating_count=Coalesce(Subquery(reviews.annotate(total=Count('id')).values('total')), 0),
+            average_rating=Coalesce(Subquery(reviews.annotate(average=Avg('rating')).values('average')), 0.0,
+                                    output_field=FloatField()),
+        )
+
+
 class Product(models.Model):
     name = models.CharField(max_length=255)
     price = models.DecimalField(decimal_places=2, max_digits=10, validators=[MinValueValidator(0)])
@@ -37,22 +83,55 @@ class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     seller = models.ForeignKey(User, on_delete=models.CASCADE, related_name='products')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Also set by the UPDATEs that change the stock, sales and ratings of many products at once
+    updated_at = models.DateTimeField(auto_now=True)
     sold = models.IntegerField(default=0)
     slug = models.SlugField(default="", blank=True, db_index=True)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    average_rating = models.FloatField(default=0, editable=False)
+
+    objects = ProductQuerySet.as_manager()
 
     class Meta:
         unique_together = ['seller', 'slug']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='product_newest_idx'),
+            models.Index(fields=['-sold', '-id'], name='product_best_selling_idx'),
+            models.Index(fields=['price', 'id'], name='product_price_idx'),
+            models.Index(fields=['seller', '-created_at', '-id'], name='product_seller_newest_idx'),
+            models.Index(fields=['category', '-created_at', '-id'], name='product_category_newest_idx'),
+            models.Index(fields=['category', '-sold', '-id'], name='product_category_sold_idx'),
+            models.Index(fields=['category', 'price', 'id'], name='product_category_price_idx'),
+            models.Index(fields=['updated_at'], name='product_updated_idx'),
+        ]
 
     def calculate_average_rating(self):
-        if len(self.reviews.all()) == 0:
+        if self.rating_count == 0:
             return 'No reviews yet'
-        total = 0
-        for review in self.reviews.all():
-            total += review.rating
-        return total / len(self.reviews.all()) if len(self.reviews.all()) > 0 else 0
+        return self.average_rating
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_loaded_values()
+        return instance
+
+    def remember_loaded_values(self):
+        # Remember the loaded slug and category, so the pages under the old ones are refreshed too, the name, so
+        # the slug only changes with it, and the image, so only a new one gets its derivatives generated
+        self._loaded_slug = self.__dict__.get('slug')
+        self._loaded_category_id = self.__dict__.get('category_id')
+        self._loaded_name = self.__dict__.get('name')
+        self._loaded_image = image_name(self.__dict__.get('image'))
 
     def save(self, *args, **kwargs):
-        self.slug = slugify(self.name)
+        # New and renamed products get the slug of their name, suffixed when the seller already uses it. The others
+        # keep theirs, like imported duplicates their "-2", "-3"
+        if self.name != getattr(self, '_loaded_name', None):
+            taken = (Product.objects.filter(seller_id=self.seller_id, slug__startswith=slugify(self.name))
+                     .exclude(pk=self.pk).values_list('slug', flat=True))
+            self.slug = unique_slug(self.name, set(taken))
         super(Product, self).save(*args, **kwargs)
 
     def __str__(self):
@@ -69,12 +148,15 @@ class Order(models.Model):
                               default='Pending')
     customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
     products = models.ManyToManyField(Product, through='ProductInOrder', related_name='orders')
+    total = models.DecimalField(decimal_places=2, max_digits=12, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['customer', '-created_at', '-id'], name='order_customer_history_idx'),
+        ]
 
     def calculate_total(self):
-        total = 0
-        for product_in_order in self.products_in_order.all():
-            total += product_in_order.subtotal()
-        return total
+        return self.total
 
     def __str__(self):
         return f"Order #{self.id}: {self.status} ({self.customer})"
@@ -84,9 +166,11 @@ class ProductInOrder(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='products_in_order')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
+    # The price the product was sold at, later price changes don't affect past orders
+    unit_price = models.DecimalField(decimal_places=2, max_digits=10, default=0)
 
     def subtotal(self):
-        return self.product.price * self.quantity
+        return self.unit_price * self.quantity
 
     class Meta:
         verbose_name_plural = 'ProductInOrder'
@@ -103,10 +187,10 @@ class Cart(models.Model):
     products = models.ManyToManyField(Product, through='ProductInCart')
 
     def calculate_total(self):
-        total = 0
-        for product_in_cart in self.products_in_cart.all():
-            total += product_in_cart.subtotal()
-        return total
+        line_total = ExpressionWrapper(F('quantity') * F('product__price'),
+                                       output_field=DecimalField(max_digits=12, decimal_places=2))
+        total = self.products_in_cart.aggregate(total=Coalesce(Sum(line_total), Decimal(0)))['total']
+        return total.quantize(Decimal('0.01'))
 
     @property
     def total_products_quantity(self):
@@ -126,11 +210,38 @@ class ProductInCart(models.Model):
 
     class Meta:
         verbose_name_plural = 'ProductInCart'
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_product'),
+        ]
 
     def __str__(self):
         return f"{self.quantity} x {self.product.name}"
 
 
+class StockReservation(models.Model):
+    """
+    Stock held for a cart line until it expires. The held quantity is already taken out of Product.quantity,
+    checkout turns it into a sale and release_expired_reservations gives it back.
+    """
+    expires_at = models.DateTimeField()
+    quantity = models.PositiveIntegerField()
+
+    # Kept when the cart is deleted, so the held stock is still released once the reservation expires
+    cart = models.ForeignKey(Cart, on_delete=models.SET_NULL, null=True, related_name='reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_reservation'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='reservation_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product} until {self.expires_at:%Y-%m-%d %H:%M}"
+
+
 class Review(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -140,12 +251,87 @@ class Review(models.Model):
     customer = models.ForeignKey(User, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reviews')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'created_at', 'id'], name='review_product_created_idx'),
+            models.Index(fields=['product', 'rating', 'id'], name='review_product_rating_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_loaded_values()
+        return instance
+
+    def remember_loaded_values(self):
+        # Remember the loaded product, so a review moved to another product refreshes both of them
+        self._loaded_product_id = self.__dict__.get('product_id')
+
     def __str__(self):
         return f"Review #{self.id}: ({self.rating})"
 
 
+class SellerDailySales(models.Model):
+    """
+    Units, revenue and orders of a seller per day, kept up to date by checkout and rebuilt by
+    rebuild_sales_rollups.
+    """
+    seller = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_sales')
+    day = models.DateField()
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(decimal_places=2, max_digits=14, default=0)
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'Seller daily sales'
+        constraints = [
+            models.UniqueConstraint(fields=['seller', 'day'], name='unique_seller_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.day}: {self.units} sold for ${self.revenue}"
+
+
+class ProductDailySales(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    # Copied from the product, so the dashboard ranks a seller's products without a join
+    seller = models.ForeignKey(User, on_delete=models.CASCADE, related_name='product_daily_sales')
+    day = models.DateField()
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(decimal_places=2, max_digits=14, default=0)
+    orders = models.PositiveIntegerField(default=0)
+    # The part of `units` already added to Product.sold, see sales.apply_sold()
+    applied_units = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'Product daily sales'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'day'], name='unique_product_day'),
+        ]
+        indexes = [
+            models.Index(fields=['seller', 'day'], name='product_sales_seller_day_idx'),
+            models.Index(fields=['product'], name='product_sales_unapplied_idx',
+                         condition=models.Q(units__gt=models.F('applied_units'))),
+        ]
+
+    def __str__(self):
+        return f"{self.day}: {self.units} sold for ${self.revenue}"
+
 
 @receiver(post_save, sender=User)
 def create_user_cart(sender, instance, created, **kwargs):
     if created:
         Cart.objects.create(customer=instance)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def refresh_product_rating(sender, instance, **kwargs):
+    product_ids = {instance.product_id, getattr(instance, '_loaded_product_id', None)} - {None}
+    Product.objects.filter(pk__in=product_ids).refresh_ratings()
+
+
+def remember_saved_values(sender, instance, **kwargs):
+    # Connected last by AppConfig.ready: every other receiver still sees the values the instance was loaded with,
+    # the next save compares with the saved ones
+    instance.remember_loaded_values()
@@ -0,0 +1,183 @@
+import functools
+import hashlib
+import re
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpResponse, JsonResponse
+from django.middleware.csrf import get_token
+
+from app import carts
+from app.checkout import order_placed
+from app.databases import primary_reads
+from app.models import Category, Product, Review
+from app.reservations import stock_changed
+from app.sales import sold_changed
+
+CSRF_PLACEHOLDER = b'page-cache-csrf-token'
+CSRF_TOKEN_RE = re.compile(rb'(name="csrfmiddlewaretoken" value=")[^"]*"')
+HITS_KEY = 'page_cache:hits'
+MISSES_KEY = 'page_cache:misses'
+
+
+def cache_anonymous_page(view_name, scope_kwarg=None):
+    """
+    Caches the pages an anonymous visitor gets from the view, per `scope_kwarg` (e.g. the product slug) and
+    query string. Invalidate them with `invalidate(view_name, scope)`, which drops every query string at once.
+    The pages that get cached are rendered from the primary, never from the replica.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                # Loading the session and user touches the database, which async code can't do directly
+                if not await sync_to_async(_cacheable)(request):
+                    return await view(request, *args, **kwargs)
+
+                key = await sync_to_async(_page_key)(view_name, kwargs.get(scope_kwarg, ''), request)
+                cached = await cache.aget(key)
+                if cached is not None:
+                    await sync_to_async(_count)(HITS_KEY)
+                    return _cached_response(request, cached)
+
+                await sync_to_async(_count)(MISSES_KEY)
+                with primary_reads():
+                    response = await view(request, *args, **kwargs)
+                if _storable(response):
+                    await cache.aset(key, _cached_content(response), settings.PAGE_CACHE_TIMEOUT)
+                response['X-Page-Cache'] = 'MISS'
+                return response
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable(request):
+                return view(request, *args, **kwargs)
+
+            key = _page_key(view_name, kwargs.get(scope_kwarg, ''), request)
+            cached = cache.get(key)
+            if cached is not None:
+                _count(HITS_KEY)
+                return _cached_response(request, cached)
+
+            _count(MISSES_KEY)
+            with primary_reads():
+                response = view(request, *args, **kwargs)
+            if _storable(response):
+                cache.set(key, _cached_content(response), settings.PAGE_CACHE_TIMEOUT)
+            response['X-Page-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def invalidate(view_name, scope=''):
+    # A new version makes every cached query string of the page unreachable, the entries simply expire
+    cache.set(_version_key(view_name, scope), time.time_ns(), None)
+
+
+def stats():
+    counters = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = counters.get(HITS_KEY, 0), counters.get(MISSES_KEY, 0)
+    return {'hits': hits, 'misses': misses, 'hit_rate': hits / (hits + misses) if hits + misses else None}
+
+
+@staff_member_required
+def stats_view(request):
+    return JsonResponse(stats())
+
+
+def _cacheable(request):
+    # Pending flash messages and the session cart's size are rendered into the page, so those requests bypass
+    # the cache
+    return (request.method in ('GET', 'HEAD') and not request.user.is_authenticated
+            and 'messages' not in request.COOKIES and not carts.has_session_cart(request))
+
+
+def _storable(response):
+    return response.status_code == 200 and not response.streaming and not response.cookies
+
+
+def _cached_content(response):
+    # CSRF tokens are per visitor, the cached page only keeps a placeholder that every hit fills in again
+    return CSRF_TOKEN_RE.sub(rb'\g<1>' + CSRF_PLACEHOLDER + rb'"', response.content), response['Content-Type']
+
+
+def _cached_response(request, cached):
+    content, content_type = cached
+    if CSRF_PLACEHOLDER in content:
+        content = content.replace(CSRF_PLACEHOLDER, get_token(request).encode())
+    response = HttpResponse(content, content_type=content_type)
+    response['X-Page-Cache'] = 'HIT'
+    return response
+
+
+def _page_key(view_name, scope, request):
+    version = cache.get(_version_key(view_name, scope), 0)
+    query = hashlib.md5(request.META.get('QUERY_STRING', '').encode(), usedforsecurity=False).hexdigest()
+    return f"page:{view_name}:{scope}:{version}:{query}"
+
+
+def _version_key(view_name, scope):
+    return f"page_version:{view_name}:{scope}"
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def _invalidate_product_pages(rows):
+    # Product pages, plus every listing that shows the product cards (stock, sold count, rating)
+    invalidate('categories')
+    for slug, category_slug, seller_username in rows:
+        invalidate('product_detail', slug)
+        invalidate('reviews', slug)
+        invalidate('category_list', category_slug)
+        invalidate('seller_profile', seller_username)
+
+
+def _invalidate_products(product_ids):
+    _invalidate_product_pages(Product.objects.filter(pk__in=product_ids)
+                              .values_list('slug', 'category__slug', 'seller__username'))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product(sender, instance, **kwargs):
+    # The pages under the slug and category the product was loaded with too, when it was renamed or moved. Looked
+    # up separately, the product row is already gone on delete
+    slugs = {instance.slug, getattr(instance, '_loaded_slug', None)} - {None}
+    category_ids = {instance.category_id, getattr(instance, '_loaded_category_id', None)} - {None}
+    category_slugs = list(Category.objects.filter(pk__in=category_ids).values_list('slug', flat=True)) or [None]
+    seller_username = User.objects.filter(pk=instance.seller_id).values_list('username', flat=True).first()
+    _invalidate_product_pages([(slug, category_slug, seller_username)
+                               for slug in slugs for category_slug in category_slugs])
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_review(sender, instance, **kwargs):
+    _invalidate_products({instance.product_id, getattr(instance, '_loaded_product_id', None)} - {None})
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category(sender, instance, **kwargs):
+    invalidate('categories')
+    invalidate('category_list', instance.slug)
+
+
+@receiver(order_placed)
+@receiver(stock_changed)
+@receiver(sold_changed)
+def invalidate_sold_products(sender, product_ids, **kwargs):
+    _invalidate_products(product_ids)
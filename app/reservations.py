@@ -0,0 +1,106 @@
+"""
+Time limited stock reservations. Adding a product to a user's cart takes the quantity out of Product.quantity right
+away, so the listings keep reading the stock that can still be bought from the product row, and checkout consumes the
+reservations instead of competing for the stock of the products. Holds that were not checked out in time are given
+back by the release_expired_reservations command.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Now
+from django.dispatch import Signal
+from django.utils import timezone
+
+from app.models import Product, StockReservation
+
+# Sent after the commit, with the ids of the products that sold out or became available again. Holds that don't change
+# whether a product can be bought aren't announced, so cached pages may show an older count until they expire
+stock_changed = Signal()
+
+
+def reserve(cart, product_id, quantity):
+    """
+    Holds quantity more of the product for the cart and extends the hold, or returns False when not enough stock
+    is left. Runs in the caller's transaction, with the cart line it holds the stock for.
+    """
+    # Only taking the last units runs a second UPDATE, the one that sells the product out
+    left = Product.objects.filter(pk=product_id, quantity__gt=quantity)
+    if not left.update(quantity=F('quantity') - quantity, updated_at=Now()):
+        last = Product.objects.filter(pk=product_id, quantity=quantity)
+        if not last.update(quantity=0, updated_at=Now()):
+            return False
+        _announce([product_id])
+    expires_at = timezone.now() + timedelta(seconds=settings.STOCK_RESERVATION_SECONDS)
+    held = StockReservation.objects.filter(cart=cart, product_id=product_id)
+    if not held.update(quantity=F('quantity') + quantity, expires_at=expires_at):
+        StockReservation.objects.create(cart=cart, product_id=product_id, quantity=quantity, expires_at=expires_at)
+    return True
+
+
+def consume(reservations):
+    """
+    Deletes the reservations and returns the quantities they held per product id, which stay taken out of the
+    stock. Runs in the caller's transaction, the checkout that sells them.
+    """
+    held = _held(reservations)
+    StockReservation.objects.filter(pk__in=held).delete()
+    return _per_product((product_id, quantity) for product_id, quantity, stock in held.values())
+
+
+def release(reservations):
+    """
+    Gives the stock held by the reservations back and deletes them, returns how many were released.
+    """
+    with transaction.atomic():
+        held = _held(reservations)
+        if not held:
+            return 0
+        returned = _per_product((product_id, quantity) for product_id, quantity, stock in held.values())
+        Product.objects.filter(pk__in=returned).update(quantity=F('quantity') + by_product(returned), updated_at=Now())
+        StockReservation.objects.filter(pk__in=held).delete()
+        sold_out = {product_id for product_id, quantity, stock in held.values() if stock == 0}
+        if sold_out:
+            _announce(sold_out)
+    return len(held)
+
+
+def release_expired(batch_size=500, now=None):
+    """
+    Releases the reservations that expired by now, batch_size of them per transaction so the sweep never holds
+    the write lock for long. Returns how many were released.
+    """
+    now = now or timezone.now()
+    released = 0
+    while True:
+        expired = StockReservation.objects.filter(expires_at__lte=now).order_by('expires_at')[:batch_size]
+        count = release(expired)
+        released += count
+        if count < batch_size:
+            return released
+
+
+def by_product(quantities):
+    # The quantity of each product, for updating all of their rows in one statement
+    return Case(*[When(pk=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+                default=Value(0), output_field=IntegerField())
+
+
+def _held(reservations):
+    # Locked with their products, so a checkout and the sweeper can never both take the same reservation, and the
+    # stock read here is still the stock the release adds to
+    return {pk: (product_id, quantity, stock) for pk, product_id, quantity, stock
+            in reservations.select_for_update().values_list('pk', 'product_id', 'quantity', 'product__quantity')}
+
+
+def _per_product(held):
+    quantities = {}
+    for product_id, quantity in held:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+def _announce(product_ids):
+    product_ids = list(product_ids)
+    transaction.on_commit(lambda: stock_changed.send(sender=StockReservation, product_ids=product_ids))
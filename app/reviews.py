@@ -0,0 +1,57 @@
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from app.databases import primary_reads
+from app.models import Review
+
+REVIEWS_PER_PAGE = 20
+SORT_ORDERS = {
+    'oldest': ('created_at', 'id'),
+    'newest': ('-created_at', '-id'),
+    'highest': ('-rating', '-id'),
+    'lowest': ('rating', 'id'),
+}
+SORT_CHOICES = [
+    ('oldest', 'Oldest'),
+    ('newest', 'Newest'),
+    ('highest', 'Highest rating'),
+    ('lowest', 'Lowest rating'),
+]
+DEFAULT_SORT = 'oldest'
+RATINGS = range(10, 0, -1)
+
+
+def sorted_reviews(product, sort):
+    return (Review.objects.filter(product=product).select_related('customer')
+            .order_by(*SORT_ORDERS.get(sort, SORT_ORDERS[DEFAULT_SORT])))
+
+
+def rating_histogram(product):
+    """
+    Returns a (rating, count, percentage) row for every rating from 10 down to 1, cached until the product's
+    reviews change.
+    """
+    key = _histogram_key(product.pk)
+    histogram = cache.get(key)
+    if histogram is None:
+        with primary_reads():
+            counts = dict(Review.objects.filter(product=product).order_by()
+                          .values_list('rating').annotate(count=Count('id')))
+        total = sum(counts.values())
+        histogram = [(rating, counts.get(rating, 0), round(100 * counts.get(rating, 0) / total) if total else 0)
+                     for rating in RATINGS]
+        cache.set(key, histogram, None)
+    return histogram
+
+
+def _histogram_key(product_id):
+    return f"rating_histogram:{product_id}"
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def forget_histogram(sender, instance, **kwargs):
+    cache.delete_many([_histogram_key(product_id) for product_id in
+                       {instance.product_id, getattr(instance, '_loaded_product_id', None)} - {None}])
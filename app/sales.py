@@ -0,0 +1,178 @@
+"""
+Daily sales rollups per seller and per product. Checkout adds every order to the rollups of its day, so the seller
+dashboard reads one row per day instead of scanning ProductInOrder, and rebuild() recomputes them from the order
+history. Product.sold is not written by checkout, the apply_sold_counts command adds the units of the rollups to it.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Now, TruncDate
+from django.dispatch import Signal
+from django.utils import timezone
+
+from app import reservations
+from app.models import Product, ProductDailySales, ProductInOrder, SellerDailySales
+
+BATCH_SIZE = 2000
+DASHBOARD_DAYS = 30
+TOP_PRODUCTS = 5
+
+_money = DecimalField(max_digits=14, decimal_places=2)
+
+# Sent after the commit, with the ids of the products whose sold count changed
+sold_changed = Signal()
+
+
+def record_order(order, lines, sellers):
+    """
+    Adds the order's lines (ProductInOrder) to the rollups of the order's day, `sellers` maps their product ids to
+    the seller ids. Runs in the checkout's transaction, in a fixed number of queries.
+    """
+    day = timezone.localdate(order.created_at)
+    per_seller = {}
+    per_product = {}
+    for line in lines:
+        seller_id = sellers[line.product_id]
+        seller = per_seller.setdefault(seller_id, {'units': 0, 'revenue': Decimal(0)})
+        seller['units'] += line.quantity
+        seller['revenue'] += line.subtotal()
+        per_product[line.product_id] = {'units': line.quantity, 'revenue': line.subtotal(), 'seller_id': seller_id}
+
+    _add(SellerDailySales, 'seller_id', day, per_seller)
+    _add(ProductDailySales, 'product_id', day, per_product)
+
+
+def rebuild(since=None):
+    """
+    Recomputes the rollups of every day from `since` on, or of the whole order history, from the order lines.
+    Returns the number of seller days written.
+    """
+    lines = ProductInOrder.objects.all()
+    seller_rollups = SellerDailySales.objects.all()
+    product_rollups = ProductDailySales.objects.all()
+    if since is not None:
+        lines = lines.filter(order__created_at__gte=timezone.make_aware(datetime.combine(since, time.min)))
+        seller_rollups = seller_rollups.filter(day__gte=since)
+        product_rollups = product_rollups.filter(day__gte=since)
+
+    day = TruncDate('order__created_at', tzinfo=timezone.get_current_timezone())
+    totals = {'units': Sum('quantity'), 'revenue': Sum(F('quantity') * F('unit_price'), output_field=_money),
+              'orders': Count('order', distinct=True)}
+    per_product = lines.annotate(day=day).values('day', 'product', 'product__seller').annotate(**totals).order_by()
+    per_seller = lines.annotate(day=day).values('day', 'product__seller').annotate(**totals).order_by()
+
+    # In one transaction, the dashboards never show a half rebuilt history. The units not yet in Product.sold are
+    # added first, the rebuilt rows are all counted there already
+    with transaction.atomic():
+        apply_sold()
+        seller_rollups.delete()
+        product_rollups.delete()
+        _bulk_create(ProductDailySales, (
+            ProductDailySales(day=row['day'], product_id=row['product'], seller_id=row['product__seller'],
+                              units=row['units'], applied_units=row['units'], revenue=row['revenue'],
+                              orders=row['orders'])
+            for row in per_product.iterator(chunk_size=BATCH_SIZE)))
+        return _bulk_create(SellerDailySales, (
+            SellerDailySales(day=row['day'], seller_id=row['product__seller'], units=row['units'],
+                             revenue=row['revenue'], orders=row['orders'])
+            for row in per_seller.iterator(chunk_size=BATCH_SIZE)))
+
+
+def apply_sold(batch_size=500):
+    """
+    Adds the units the product rollups gained since the last run to Product.sold, batch_size rollups per
+    transaction. Returns the number of units added.
+    """
+    applied = 0
+    while True:
+        with transaction.atomic():
+            pending = {pk: (product_id, units - applied_units) for pk, product_id, units, applied_units in
+                       ProductDailySales.objects.filter(units__gt=F('applied_units')).select_for_update()
+                       .values_list('pk', 'product_id', 'units', 'applied_units')[:batch_size]}
+            if not pending:
+                return applied
+            per_product = {}
+            for product_id, units in pending.values():
+                per_product[product_id] = per_product.get(product_id, 0) + units
+            Product.objects.filter(pk__in=per_product).update(sold=F('sold') + reservations.by_product(per_product),
+                                                              updated_at=Now())
+            # Added to, not set to `units`, a checkout may have added to the rollup since it was read
+            ProductDailySales.objects.filter(pk__in=pending).update(applied_units=F('applied_units') + Case(
+                *[When(pk=pk, then=Value(units)) for pk, (product_id, units) in pending.items()],
+                output_field=IntegerField()))
+            _announce(per_product)
+        applied += sum(per_product.values())
+        if len(pending) < batch_size:
+            return applied
+
+
+def dashboard(seller, days=DASHBOARD_DAYS, today=None):
+    """
+    The seller's sales of the last `days` days, day by day, their totals and best selling products, read from
+    the rollups only.
+    """
+    today = today or timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    rollups = {rollup.day: rollup
+               for rollup in SellerDailySales.objects.filter(seller=seller, day__range=(start, today))}
+    series = [rollups.get(start + timedelta(days=offset)) or SellerDailySales(day=start + timedelta(days=offset))
+              for offset in range(days)]
+    highest = max((day.revenue for day in series), default=0)
+    for day in series:
+        day.revenue = Decimal(day.revenue).quantize(Decimal('0.01'))
+        day.percent = round(day.revenue / highest * 100) if highest else 0
+
+    top_products = (ProductDailySales.objects.filter(seller=seller, day__range=(start, today))
+                    .values('product', 'product__name', 'product__slug')
+                    .annotate(units=Sum('units'), revenue=Sum('revenue'))
+                    .order_by('-revenue', 'product')[:TOP_PRODUCTS])
+    return {
+        "days": series,
+        "start": start,
+        "today": today,
+        "units": sum(day.units for day in series),
+        "revenue": sum((day.revenue for day in series), Decimal(0)),
+        "orders": sum(day.orders for day in series),
+        "top_products": list(top_products),
+    }
+
+
+def _announce(product_ids):
+    product_ids = list(product_ids)
+    transaction.on_commit(lambda: sold_changed.send(sender=ProductDailySales, product_ids=product_ids))
+
+
+def _add(model, key, day, totals):
+    # One UPDATE for the rows the day already has, one INSERT for the others
+    existing = set(model.objects.filter(day=day, **{f'{key}__in': totals}).values_list(key, flat=True))
+    if existing:
+        units = Case(*[When(**{key: value}, then=Value(totals[value]['units'])) for value in existing],
+                     output_field=IntegerField())
+        revenue = Case(*[When(**{key: value}, then=Value(totals[value]['revenue'])) for value in existing],
+                       output_field=_money)
+        model.objects.filter(day=day, **{f'{key}__in': existing}).update(
+            units=F('units') + units, revenue=F('revenue') + revenue, orders=F('orders') + 1)
+
+    missing = {value: fields for value, fields in totals.items() if value not in existing}
+    if not missing:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create([model(day=day, orders=1, **{key: value}, **fields)
+                                       for value, fields in missing.items()])
+    except IntegrityError:
+        # A concurrent checkout created some of the day's first rows, they are updated instead
+        _add(model, key, day, missing)
+
+
+def _bulk_create(model, rows):
+    created = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            created += len(model.objects.bulk_create(batch))
+            batch = []
+    return created + len(model.objects.bulk_create(batch))
@@ -0,0 +1,135 @@
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from app import listing
+from app.models import Product
+
+FTS_TABLE = 'app_product_fts'
+MAX_TERMS = 8
+RELEVANCE = 'relevance'
+SEARCH_SORT_CHOICES = [(RELEVANCE, 'Relevance')] + listing.SORT_CHOICES
+
+# Matches in the product name weigh ten times more than matches in the description
+RANK = f"bm25({FTS_TABLE}, 10.0, 1.0)"
+
+CREATE_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON app_product BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON app_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF name, description ON app_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+]
+REBUILD = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+
+_TERM_RE = re.compile(r'\w+')
+_available = {}
+
+
+def ensure_search_triggers(using, **kwargs):
+    # SQLite migrations that rebuild app_product drop its triggers, put them back after every migrate
+    connection = connections[using]
+    _available.pop(using, None)
+    if not fts_available(using):
+        return
+    with connection.cursor() as cursor:
+        for statement in CREATE_TRIGGERS:
+            cursor.execute(statement)
+
+
+def rebuild_search_index(using='default'):
+    with connections[using].cursor() as cursor:
+        cursor.execute(REBUILD)
+
+
+def fts_available(using='default'):
+    if using not in _available:
+        connection = connections[using]
+        available = False
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+                available = cursor.fetchone() is not None
+        _available[using] = available
+    return _available[using]
+
+
+def match_expression(search_term):
+    # Every term must match, and each one also matches as a prefix ("gefo rtx" finds "GeForce RTX 3060")
+    terms = _TERM_RE.findall(search_term.lower())[:MAX_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def matching_products(queryset, search_term, using=None):
+    using = using or queryset.db
+    match = match_expression(search_term)
+    if not match or not fts_available(using):
+        return queryset.filter(Q(name__icontains=search_term) | Q(description__icontains=search_term))
+    return queryset.filter(id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]))
+
+
+def paginate_search(request, search_term, page_size=listing.PAGE_SIZE, using=None):
+    # The ranked search runs raw SQL, which the database router doesn't see
+    using = using or router.db_for_read(Product)
+    match = match_expression(search_term)
+    ranked = bool(match) and fts_available(using)
+    sort = request.GET.get('sort', RELEVANCE if ranked else listing.DEFAULT_SORT)
+
+    if ranked and sort == RELEVANCE:
+        page = _ranked_page(match, request.GET.get('cursor'), page_size, request.GET, using)
+    else:
+        page = listing.paginate_products(matching_products(Product.objects.all(), search_term, using),
+                                         sort=sort,
+                                         cursor=request.GET.get('cursor'),
+                                         page_size=page_size,
+                                         query=request.GET)
+    if ranked:
+        page.sort_choices = SEARCH_SORT_CHOICES
+    return page
+
+
+def _ranked_page(match, cursor, page_size, query, using):
+    sql = (f"SELECT rowid, search_rank FROM "
+           f"(SELECT rowid, {RANK} AS search_rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)")
+    params = [match]
+    position = listing.decode_cursor(cursor, RELEVANCE) if cursor else None
+    if _valid_rank_position(position):
+        sql += " WHERE search_rank > %s OR (search_rank = %s AND rowid > %s)"
+        params += [position[0], position[0], position[1]]
+    else:
+        cursor = None
+    sql += " ORDER BY search_rank, rowid LIMIT %s"
+    params.append(page_size + 1)
+
+    with connections[using].cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        ranks = db_cursor.fetchall()
+
+    next_cursor = None
+    if len(ranks) > page_size:
+        ranks = ranks[:page_size]
+        last_id, last_rank = ranks[-1]
+        next_cursor = listing.encode_cursor(RELEVANCE, [last_rank, last_id])
+
+    products_by_id = Product.objects.using(using).in_bulk([product_id for product_id, _ in ranks])
+    products = []
+    for product_id, rank in ranks:
+        if product_id in products_by_id:
+            product = products_by_id[product_id]
+            product.search_rank = rank
+            products.append(product)
+    return listing.ListingPage(products, RELEVANCE, cursor, next_cursor, query)
+
+
+def _valid_rank_position(position):
+    return (isinstance(position, list) and len(position) == 2
+            and isinstance(position[0], (int, float)) and isinstance(position[1], int))
@@ -0,0 +1,133 @@
+"""
+In-process caches of the categories and of the product slug to id lookups the catalog pages start with. Every worker
+keeps its own bounded LRU, and a version counter in CACHES['default'], bumped once a category or product change is
+committed, tells the worker when its copy is out of date. They are always filled from the primary, which commits
+before the replica syncs. The counter is only shared when that backend is, e.g. Memcached or Redis: with the default
+LocMemCache every process has its own, so a deployment running more than one worker process needs a shared backend,
+or the other workers keep serving the old categories and slugs (see app/checks.py).
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import Http404
+
+from app.databases import primary_reads
+from app.models import Category, Product
+
+
+class LRUCache:
+    """
+    A thread safe, bounded mapping that drops its least recently used entries, and all of them once the shared
+    version it was filled under changes.
+    """
+    def __init__(self, name, maxsize):
+        self.version_key = f"slug_cache_version:{name}"
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+                return None
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, version):
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def current_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            # Evicted or never bumped, every worker adopts whichever version gets added first
+            cache.add(self.version_key, time.time_ns(), None)
+            version = cache.get(self.version_key)
+        return version
+
+    def bump(self):
+        cache.set(self.version_key, time.time_ns(), None)
+
+
+_categories = LRUCache('category', settings.SLUG_CACHE_SIZE)
+_product_ids = LRUCache('product', settings.SLUG_CACHE_SIZE)
+
+
+def category(slug):
+    """
+    The category with the slug, or None. Returns a copy, the cached instance is shared by the worker's threads.
+    """
+    version = _categories.current_version()
+    found = _categories.get(slug, version)
+    if found is None:
+        with primary_reads():
+            found = Category.objects.filter(slug=slug).first()
+        if found is None:
+            return None
+        _categories.set(slug, found, version)
+    return copy.copy(found)
+
+
+def product_id(slug):
+    """
+    The id of the product with the slug, or None. Slugs are only unique per seller, the oldest product wins.
+    """
+    version = _product_ids.current_version()
+    found = _product_ids.get(slug, version)
+    if found is None:
+        with primary_reads():
+            found = Product.objects.filter(slug=slug).order_by('pk').values_list('pk', flat=True).first()
+        if found is None:
+            return None
+        _product_ids.set(slug, found, version)
+    return found
+
+
+def get_category_or_404(slug):
+    found = category(slug)
+    if found is None:
+        raise Http404("No category matches the given query.")
+    return found
+
+
+def get_product_or_404(queryset, slug):
+    found_id = product_id(slug)
+    found = queryset.filter(pk=found_id).first() if found_id is not None else None
+    if found is None:
+        raise Http404("No product matches the given query.")
+    return found
+
+
+aget_category_or_404 = sync_to_async(get_category_or_404)
+aget_product_or_404 = sync_to_async(get_product_or_404)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def forget_categories(sender, **kwargs):
+    # After the commit, so no worker caches the old row again under the new version
+    transaction.on_commit(_categories.bump)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def forget_product_ids(sender, **kwargs):
+    transaction.on_commit(_product_ids.bump)
@@ -0,0 +1,42 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from app import card_cache, images
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, sizes, **attrs):
+    """
+    Renders a <picture> with WebP and JPEG srcsets of the image derivatives, e.g.
+    {% responsive_image product.image sizes="13rem" alt=product.name class="card-img-top" %}
+
+    Falls back to the original upload while its derivatives are still being generated.
+    """
+    if not image:
+        return ''
+    if not images.has_derivatives(image.name):
+        return format_html('<img src="{}"{}>', image.url, flatatt(attrs))
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}"><img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        _srcset(image.name, 'webp'), sizes,
+        default_storage.url(images.derivative_name(image.name, images.WIDTHS[-1], 'jpg')),
+        _srcset(image.name, 'jpg'), sizes, flatatt(attrs),
+    )
+
+
+@register.simple_tag(takes_context=True)
+def product_cards(context, products):
+    """
+    Renders includes/product.html for every product, e.g. {% product_cards products %}, reusing the cached cards of
+    the products that didn't change since.
+    """
+    return card_cache.render_cards(context, products)
+
+
+def _srcset(name, extension):
+    return ', '.join(f"{default_storage.url(images.derivative_name(name, width, extension))} {width}w"
+                     for width in images.WIDTHS)
@@ -0,0 +1,25 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+
+from app.models import Category, Product, Review
+
+PASSWORD = 'password'
+
+
+def make_user(username):
+    # The post_save receiver gives every user a cart
+    return User.objects.create_user(username, password=PASSWORD)
+
+
+def make_category(name='Graphics cards', slug=None):
+    return Category.objects.create(name=name, slug=slug or name.lower().replace(' ', '-'))
+
+
+def make_product(seller, category, name='Graphics card', price='100.00', quantity=5):
+    return Product.objects.create(name=name, price=Decimal(price), quantity=quantity, description=name,
+                                  image='default.png', category=category, seller=seller)
+
+
+def make_review(customer, product, rating=5):
+    return Review.objects.create(customer=customer, product=product, rating=rating)
@@ -0,0 +1,31 @@
+"""
+The project's test runner. The tests write their media to a temporary copy of MEDIA_ROOT, and resize the images in
+their own thread: the worker pool would write the derivatives to the checkout's media directory, and to the test
+database from threads outside of the test's transaction. The SQL instrumentation, which would log every request of
+the tests with DEBUG on, is off.
+"""
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from app.images import DERIVATIVES_DIR
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._media = tempfile.TemporaryDirectory()
+        media_root = Path(self._media.name) / 'media'
+        shutil.copytree(settings.MEDIA_ROOT, media_root, ignore=shutil.ignore_patterns(DERIVATIVES_DIR))
+        self._settings = override_settings(MEDIA_ROOT=media_root, IMAGE_WORKERS=0,
+                                           SQL_INSTRUMENTATION_SAMPLE_RATE=0)
+        self._settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._settings.disable()
+        self._media.cleanup()
+        super().teardown_test_environment(**kwargs)
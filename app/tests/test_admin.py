@@ -0,0 +1,55 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from app.admin import estimated_count
+from app.models import Cart, Product, ProductInCart, StockReservation
+from app.tests.factories import make_category, make_product, make_user
+
+
+class CartChangelistTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', password='password')
+        cls.seller = make_user('seller')
+        cls.product = make_product(cls.seller, make_category())
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_buyer(self, username):
+        cart = Cart.objects.get(customer=make_user(username))
+        ProductInCart.objects.create(cart=cart, product=self.product, quantity=1)
+        StockReservation.objects.create(cart=cart, product=self.product, quantity=1,
+                                        expires_at=timezone.now() + timedelta(minutes=5))
+
+    def queries(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertContains(self.client.get(path), 'buyer-0')
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_the_rows(self):
+        paths = ['/admin/app/productincart/', '/admin/app/stockreservation/']
+        self.add_buyer('buyer-0')
+        one_row = [self.queries(path) for path in paths]
+        self.add_buyer('buyer-1')
+        self.add_buyer('buyer-2')
+        self.assertEqual([self.queries(path) for path in paths], one_row)
+
+
+class EstimatedCountTests(TestCase):
+    def test_sqlite_prefers_the_analyzed_row_count(self):
+        seller = make_user('seller')
+        category = make_category()
+        products = [make_product(seller, category, f"Card {i}") for i in range(5)]
+        Product.objects.filter(pk__in=[product.pk for product in products[:3]]).delete()
+        # The highest rowid still counts the deleted rows
+        self.assertEqual(estimated_count(Product.objects.all()), products[-1].pk)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE app_product")
+        self.assertEqual(estimated_count(Product.objects.all()), 2)
+        self.assertIsNone(estimated_count(Product.objects.filter(quantity=1)))
@@ -0,0 +1,99 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from app import listing
+from app.models import Product
+from app.tests.factories import make_category, make_product, make_review, make_user
+
+
+class ConditionalApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = make_user('seller')
+        cls.buyer = make_user('buyer')
+        cls.category = make_category()
+        cls.products = [make_product(cls.seller, cls.category, f"Card {i}") for i in range(3)]
+        # Older than any change a test makes, even in the same millisecond
+        Product.objects.update(updated_at=timezone.now() - timedelta(minutes=1))
+
+    def setUp(self):
+        cache.clear()
+
+    def revalidate(self, path, response):
+        return self.client.get(path, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_resources_answer_304(self):
+        for path in ['/api/products/', f'/api/products/{self.products[0].pk}/',
+                     f'/api/products/{self.products[0].pk}/reviews/', '/api/categories/']:
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(self.revalidate(path, response).status_code, 304)
+                since = self.client.get(path, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(since.status_code, 304)
+
+    def test_revalidating_a_list_runs_one_query(self):
+        response = self.client.get('/api/products/', {'category': self.category.slug})
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/products/', {'category': self.category.slug},
+                                             HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_query_string_is_part_of_the_etag(self):
+        response = self.client.get('/api/products/', {'fields': 'id,name'})
+        self.assertEqual(self.client.get('/api/products/', {'fields': 'id,price'},
+                                         HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_edit_changes_the_version(self):
+        path = f'/api/products/{self.products[0].pk}/'
+        response = self.client.get(path)
+        product = Product.objects.get(pk=self.products[0].pk)
+        product.price = 90
+        product.save()
+        self.assertEqual(self.revalidate(path, response).status_code, 200)
+        self.assertEqual(self.revalidate('/api/products/', self.client.get('/api/products/')).status_code, 304)
+
+    def test_stock_update_changes_the_list_version(self):
+        response = self.client.get('/api/products/')
+        # Like the bulk UPDATEs of checkout and the reservations
+        Product.objects.filter(pk=self.products[1].pk).update(quantity=1, updated_at=timezone.now())
+        changed = self.revalidate('/api/products/', response)
+        self.assertEqual(changed.status_code, 200)
+        self.assertIn({'id': self.products[1].pk, 'quantity': 1},
+                      [{'id': row['id'], 'quantity': row['quantity']} for row in changed.json()['results']])
+
+    def test_deletion_changes_the_list_version(self):
+        response = self.client.get('/api/products/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.get(pk=self.products[0].pk).delete()
+        changed = self.revalidate('/api/products/', response)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(len(changed.json()['results']), 2)
+
+    def test_review_changes_the_reviews_version(self):
+        path = f'/api/products/{self.products[0].pk}/reviews/'
+        response = self.client.get(path)
+        make_review(self.buyer, self.products[0], rating=7)
+        changed = self.revalidate(path, response)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual([review['rating'] for review in changed.json()['results']], [7])
+
+    def test_malformed_review_cursor_restarts(self):
+        path = f'/api/products/{self.products[0].pk}/reviews/'
+        make_review(self.buyer, self.products[0], rating=7)
+        for values in [['yesterday', 1], [{}, 1], [None, 1]]:
+            with self.subTest(values=values):
+                response = self.client.get(path, {'cursor': listing.encode_cursor('reviews', values)})
+                self.assertEqual([review['rating'] for review in response.json()['results']], [7])
+
+    def test_unknown_products_are_not_found(self):
+        for path in ['/api/products/0/', '/api/products/0/reviews/']:
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(path).status_code, 404)
+
+    def test_bad_parameters_are_rejected(self):
+        for query in [{'fields': 'id,secret'}, {'limit': 'ten'}, {'limit': 0}]:
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get('/api/products/', query).status_code, 400)
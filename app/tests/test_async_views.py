@@ -0,0 +1,42 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from app.page_cache import CSRF_TOKEN_RE
+from app.tests.factories import make_category, make_product, make_review, make_user
+
+CATALOG_PATHS = ['/', '/products/', '/products/?search_term=card', '/products/card-1', '/categories/',
+                 '/categories/graphics-cards', '/reviews/card-1', '/reviews/card-1?sort=highest']
+
+
+class AsyncCatalogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = make_user('seller')
+        cls.buyer = make_user('buyer')
+        category = make_category()
+        for i in range(3):
+            make_product(cls.seller, category, f"Card {i}")
+        make_review(cls.buyer, category.product_set.get(slug='card-1'), rating=7)
+
+    def setUp(self):
+        cache.clear()
+        # Logged in, so every request reaches the views instead of the anonymous page cache
+        self.client.force_login(self.buyer)
+        self.async_client.force_login(self.buyer)
+
+    def content(self, response):
+        self.assertEqual(response.status_code, 200)
+        return CSRF_TOKEN_RE.sub(b'', response.content)
+
+    async def test_async_views_render_the_same_pages(self):
+        for path in CATALOG_PATHS:
+            with self.subTest(path=path):
+                expected = self.content(await self.async_client.get(path))
+                with override_settings(ROOT_URLCONF='dnick_eshop.async_urls'):
+                    self.assertEqual(self.content(await self.async_client.get(path)), expected)
+
+    async def test_unknown_slugs_are_not_found(self):
+        with override_settings(ROOT_URLCONF='dnick_eshop.async_urls'):
+            for path in ['/products/missing', '/categories/missing', '/reviews/missing']:
+                with self.subTest(path=path):
+                    self.assertEqual((await self.async_client.get(path)).status_code, 404)
@@ -0,0 +1,22 @@
+from django.test import SimpleTestCase
+
+from app.benchmark import check_thresholds
+
+RESULTS = [{'name': 'products', 'role': 'buyer', 'queries': 4, 'rows': 51, 'p50_ms': 90.0, 'p95_ms': 180.0}]
+
+
+class ThresholdTests(SimpleTestCase):
+    def test_within_the_limits(self):
+        self.assertEqual(check_thresholds(RESULTS, {'products:buyer': {'max_queries': 4, 'max_p95_ms': 200}}), [])
+        self.assertEqual(check_thresholds(RESULTS, {'products:anonymous': {'max_queries': 1}}), [])
+
+    def test_exceeded_limits(self):
+        failures = check_thresholds(RESULTS, {'products:buyer': {'max_queries': 3, 'max_p95_ms': 150}})
+        self.assertEqual(failures, ["products (buyer): queries 4.0 > 3", "products (buyer): p95_ms 180.0 > 150"])
+
+    def test_latency_tolerance_scales_only_the_latencies(self):
+        thresholds = {'products:buyer': {'max_queries': 3, 'max_p95_ms': 150}}
+        self.assertEqual(check_thresholds(RESULTS, thresholds, latency_tolerance=1.5),
+                         ["products (buyer): queries 4.0 > 3"])
+        self.assertEqual(check_thresholds(RESULTS, thresholds, latency_tolerance=0),
+                         ["products (buyer): queries 4.0 > 3"])
@@ -0,0 +1,44 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from app import bestsellers
+from app.models import Product
+from app.tests.factories import make_category, make_product, make_review, make_user
+
+
+class BestSellersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = make_user('seller')
+        cls.buyer = make_user('buyer')
+        cls.gpus = make_category('Graphics cards')
+        cls.cpus = make_category('Processors')
+        cls.products = [make_product(cls.seller, cls.gpus, f"Card {i}") for i in range(3)]
+        for sold, product in zip([5, 20, 10], cls.products):
+            Product.objects.filter(pk=product.pk).update(sold=sold)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_ranked_by_units_sold(self):
+        self.assertEqual([product.name for product in bestsellers.best_sellers(self.gpus)],
+                         ['Card 1', 'Card 2', 'Card 0'])
+        self.assertEqual(bestsellers.best_sellers(self.cpus), [])
+
+    def test_cached_ranking_shows_current_rows(self):
+        bestsellers.best_sellers()
+        # Neither a review nor a reservation saves the product
+        make_review(self.buyer, self.products[1], rating=9)
+        Product.objects.filter(pk=self.products[1].pk).update(quantity=0)
+        with self.assertNumQueries(1):
+            top = bestsellers.best_sellers()[0]
+        self.assertEqual((top.pk, top.rating_count, top.quantity), (self.products[1].pk, 1, 0))
+
+    def test_moved_product_leaves_the_old_category(self):
+        bestsellers.best_sellers(self.gpus)
+        bestsellers.best_sellers(self.cpus)
+        product = Product.objects.get(pk=self.products[1].pk)
+        product.category = self.cpus
+        product.save()
+        self.assertEqual([product.name for product in bestsellers.best_sellers(self.gpus)], ['Card 2', 'Card 0'])
+        self.assertEqual([product.name for product in bestsellers.best_sellers(self.cpus)], ['Card 1'])
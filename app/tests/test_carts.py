@@ -0,0 +1,87 @@
+from django.contrib.sessions.backends.db import SessionStore
+from django.test import RequestFactory, TestCase
+
+from app import carts
+from app.models import Cart, Product, ProductInCart, StockReservation
+from app.tests.factories import PASSWORD, make_category, make_product, make_user
+
+
+class SessionCartTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = make_user('seller')
+        cls.buyer = make_user('buyer')
+        category = make_category()
+        cls.card = make_product(cls.seller, category, 'Card', price='100.00')
+        cls.cpu = make_product(cls.seller, category, 'CPU', price='50.00')
+        cls.ram = make_product(cls.seller, category, 'RAM', price='20.00')
+
+    def add(self, product, quantity=1):
+        self.client.post('/add_to_cart', {'product_id': product.pk, 'quantity': quantity}, HTTP_REFERER='/')
+
+    def lines(self, user):
+        return dict(ProductInCart.objects.filter(cart__customer=user).values_list('product__name', 'quantity'))
+
+    def merge(self, user, session_cart):
+        request = RequestFactory().get('/')
+        request.session = SessionStore()
+        request.session[carts.SESSION_KEY] = session_cart
+        carts.merge_session_cart(sender=None, request=request, user=user)
+        return request.session
+
+    def test_anonymous_cart_lives_in_the_session(self):
+        self.add(self.card)
+        self.add(self.card, 2)
+        self.add(self.cpu)
+        self.assertEqual(self.client.session[carts.SESSION_KEY], {str(self.card.pk): 3, str(self.cpu.pk): 1})
+        response = self.client.get('/cart/')
+        self.assertEqual(response.context['total'], 350)
+        self.assertFalse(ProductInCart.objects.exists() or StockReservation.objects.exists())
+        self.assertEqual(Product.objects.get(pk=self.card.pk).quantity, 5)
+
+    def test_removing_from_the_session_cart(self):
+        self.add(self.card)
+        self.add(self.cpu)
+        self.client.get(f'/remove_from_cart/{self.card.pk}/')
+        self.assertEqual(self.client.session[carts.SESSION_KEY], {str(self.cpu.pk): 1})
+
+    def test_login_merges_the_session_cart(self):
+        ProductInCart.objects.create(cart=Cart.objects.get(customer=self.buyer), product=self.card, quantity=1)
+        self.add(self.card, 2)
+        self.add(self.cpu)
+        self.assertTrue(self.client.login(username='buyer', password=PASSWORD))
+        self.assertEqual(self.lines(self.buyer), {'Card': 3, 'CPU': 1})
+        self.assertNotIn(carts.SESSION_KEY, self.client.session)
+
+    def test_own_and_deleted_products_are_dropped(self):
+        category = make_category('Cables')
+        gone = make_product(self.seller, category, 'Cable')
+        own = make_product(self.buyer, category, 'Adapter')
+        session_cart = {str(self.ram.pk): 2, str(gone.pk): 1, str(own.pk): 1}
+        gone.delete()
+        session = self.merge(self.buyer, session_cart)
+        self.assertEqual(self.lines(self.buyer), {'RAM': 2})
+        self.assertNotIn(carts.SESSION_KEY, session)
+
+    def test_merge_query_count_does_not_grow_with_the_lines(self):
+        other = make_user('other-buyer')
+        cart = Cart.objects.get(customer=self.buyer)
+        ProductInCart.objects.create(cart=cart, product=self.card, quantity=1)
+        ProductInCart.objects.create(cart=Cart.objects.get(customer=other), product=self.card, quantity=1)
+        ProductInCart.objects.create(cart=Cart.objects.get(customer=other), product=self.cpu, quantity=1)
+        with self.assertNumQueries(7):
+            self.merge(self.buyer, {str(self.card.pk): 1, str(self.ram.pk): 1})
+        with self.assertNumQueries(7):
+            self.merge(other, {str(self.card.pk): 1, str(self.cpu.pk): 2, str(self.ram.pk): 3})
+        self.assertEqual(self.lines(other), {'Card': 2, 'CPU': 3, 'RAM': 3})
+
+    def test_user_cart_loads_in_one_query(self):
+        cart = Cart.objects.get(customer=self.buyer)
+        ProductInCart.objects.create(cart=cart, product=self.card, quantity=2)
+        ProductInCart.objects.create(cart=cart, product=self.ram, quantity=1)
+        request = RequestFactory().get('/')
+        request.user = self.buyer
+        with self.assertNumQueries(1):
+            lines, total = carts.load_cart(request)
+        self.assertEqual([(line.product.name, line.line_total) for line in lines], [('Card', 200), ('RAM', 20)])
+        self.assertEqual(str(total), '220.00')
@@ -0,0 +1,62 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from app import catalog, listing
+from app.models import Product
+from app.tests.factories import make_category, make_product, make_user
+
+CATEGORY_INDEXES = {
+    'newest': 'product_category_newest_idx',
+    'best_selling': 'product_category_sold_idx',
+    'price_low': 'product_category_price_idx',
+    'price_high': 'product_category_price_idx',
+}
+
+
+class CategoryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = make_user('seller')
+        cls.cards = make_category('Graphics cards')
+        cls.cpus = make_category('Processors')
+        cls.empty = make_category('Monitors')
+        make_product(cls.seller, cls.cards, 'Radeon 7900')
+        make_product(cls.seller, cls.cards, 'GeForce 4090', quantity=0)
+        make_product(cls.seller, cls.cpus, 'Ryzen 7600')
+
+    def counts(self):
+        return {category.name: (category.product_count, category.in_stock_count)
+                for category in catalog.categories_queryset()}
+
+    def page_queries(self):
+        # Logged in, so the view runs instead of the anonymous page cache
+        self.client.force_login(self.seller)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/categories/').status_code, 200)
+        return len(queries)
+
+    def test_products_and_stock_are_counted_per_category(self):
+        self.assertEqual(self.counts(), {'Graphics cards': (2, 1), 'Processors': (1, 1), 'Monitors': (0, 0)})
+
+    def test_page_shows_the_counts(self):
+        self.assertContains(self.client.get('/categories/'), '2 products, 1 in stock')
+
+    def test_selling_out_updates_the_counts(self):
+        Product.objects.filter(category=self.cpus).update(quantity=0)
+        self.assertEqual(self.counts()['Processors'], (1, 0))
+
+    def test_query_count_does_not_grow_with_the_categories(self):
+        self.page_queries()
+        few = self.page_queries()
+        for i in range(3):
+            make_product(self.seller, make_category(f"Category {i}"), f"Product {i}")
+        self.assertEqual(self.page_queries(), few)
+
+    def test_category_pages_read_an_index_in_sort_order(self):
+        for sort, index in CATEGORY_INDEXES.items():
+            with self.subTest(sort=sort):
+                queryset = catalog.category_products(self.cards).order_by(*listing.SORT_ORDERS[sort])
+                plan = queryset[:listing.PAGE_SIZE + 1].explain()
+                self.assertIn(index, plan)
+                self.assertNotIn('TEMP B-TREE', plan)
@@ -0,0 +1,114 @@
+from unittest import mock
+
+from django.contrib.messages import get_messages
+from django.db import OperationalError, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from app import bestsellers, sales
+from app.checkout import OutOfStock, place_order
+from app.models import Cart, Order, Product, ProductInCart, ProductInOrder, StockReservation
+from app.tests.factories import make_category, make_product, make_user
+
+
+class CheckoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = make_user('seller')
+        cls.buyer = make_user('buyer')
+        cls.other_buyer = make_user('other-buyer')
+        category = make_category()
+        cls.card = make_product(cls.seller, category, 'Card', price='100.00', quantity=1)
+        cls.cpu = make_product(cls.seller, category, 'CPU', price='50.00', quantity=5)
+
+    def put_in_cart(self, user, product, quantity=1):
+        # Straight into the cart, without a reservation, like a session cart merged on login
+        ProductInCart.objects.create(cart=Cart.objects.get(customer=user), product=product, quantity=quantity)
+
+    def stock(self, product):
+        return Product.objects.values_list('quantity', 'sold').get(pk=product.pk)
+
+    def test_order_is_placed(self):
+        self.put_in_cart(self.buyer, self.cpu, 2)
+        order = place_order(self.buyer)
+        self.assertEqual(order.total, 100)
+        self.assertEqual(list(order.products_in_order.values_list('product', 'quantity')), [(self.cpu.pk, 2)])
+        self.assertEqual(self.stock(self.cpu), (3, 0))
+        self.assertFalse(ProductInCart.objects.filter(cart__customer=self.buyer).exists())
+
+    def test_empty_cart_places_no_order(self):
+        self.assertIsNone(place_order(self.buyer))
+        self.assertFalse(Order.objects.exists())
+
+    def test_reserved_stock_is_sold(self):
+        self.client.force_login(self.buyer)
+        self.client.post('/add_to_cart', {'product_id': self.card.pk}, HTTP_REFERER='/')
+        self.assertEqual(self.stock(self.card), (0, 0))
+        place_order(self.buyer)
+        self.assertEqual(self.stock(self.card), (0, 0))
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_last_item_is_sold_once(self):
+        self.put_in_cart(self.buyer, self.card)
+        self.put_in_cart(self.other_buyer, self.card)
+        place_order(self.buyer)
+        with self.assertRaises(OutOfStock) as raised:
+            place_order(self.other_buyer)
+        self.assertEqual(raised.exception.products, [self.card])
+        self.assertEqual(self.stock(self.card), (0, 0))
+        self.assertEqual(Order.objects.filter(customer=self.other_buyer).count(), 0)
+
+    def test_fully_reserved_checkout_writes_no_product(self):
+        self.client.force_login(self.buyer)
+        self.client.post('/add_to_cart', {'product_id': self.cpu.pk}, HTTP_REFERER='/')
+        self.client.post('/add_to_cart', {'product_id': self.card.pk}, HTTP_REFERER='/')
+        with CaptureQueriesContext(connection) as queries:
+            place_order(self.buyer)
+        self.assertEqual([query['sql'] for query in queries if query['sql'].startswith('UPDATE "app_product"')], [])
+        self.assertEqual((self.stock(self.cpu), self.stock(self.card)), ((4, 0), (0, 0)))
+
+    def test_sold_counts_are_added_by_the_sweep(self):
+        self.put_in_cart(self.buyer, self.cpu, 2)
+        place_order(self.buyer)
+        self.put_in_cart(self.other_buyer, self.cpu)
+        self.put_in_cart(self.other_buyer, self.card)
+        place_order(self.other_buyer)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(sales.apply_sold(batch_size=1), 4)
+        self.assertEqual((self.stock(self.cpu), self.stock(self.card)), ((2, 3), (0, 1)))
+        self.assertEqual(sales.apply_sold(), 0)
+        self.assertEqual([product.pk for product in bestsellers.best_sellers()], [self.cpu.pk, self.card.pk])
+
+    def test_short_product_sells_nothing(self):
+        self.put_in_cart(self.buyer, self.cpu, 2)
+        self.put_in_cart(self.buyer, self.card, 2)
+        with self.assertRaises(OutOfStock):
+            place_order(self.buyer)
+        self.assertEqual(self.stock(self.cpu), (5, 0))
+        self.assertEqual(self.stock(self.card), (1, 0))
+        self.assertFalse(ProductInOrder.objects.exists())
+        self.assertEqual(ProductInCart.objects.filter(cart__customer=self.buyer).count(), 2)
+
+    def test_out_of_stock_is_shown_in_the_cart(self):
+        self.put_in_cart(self.buyer, self.card, 2)
+        self.client.force_login(self.buyer)
+        response = self.client.get('/checkout/', HTTP_REFERER='/')
+        self.assertRedirects(response, '/cart/', fetch_redirect_response=False)
+        messages = [str(message) for message in get_messages(response.wsgi_request)]
+        self.assertEqual(messages, ["Not enough stock left for: Card"])
+
+    def test_write_lock_is_taken_before_any_read(self):
+        self.put_in_cart(self.buyer, self.cpu)
+        with CaptureQueriesContext(connection) as queries:
+            place_order(self.buyer)
+        statements = [query['sql'] for query in queries if 'SAVEPOINT' not in query['sql']]
+        self.assertTrue(statements[0].startswith('UPDATE "app_cart"'), statements[0])
+
+    def test_locked_database_asks_to_try_again(self):
+        self.put_in_cart(self.buyer, self.cpu)
+        self.client.force_login(self.buyer)
+        with mock.patch('app.views.place_order', side_effect=OperationalError("database is locked")):
+            response = self.client.get('/checkout/', HTTP_REFERER='/')
+        self.assertRedirects(response, '/cart/', fetch_redirect_response=False)
+        self.assertIn("try to check out again", str(list(get_messages(response.wsgi_request))[0]))
+        self.assertFalse(Order.objects.exists())
@@ -0,0 +1,26 @@
+from django.test import SimpleTestCase, override_settings
+
+from app import checks
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+MEMCACHED = {'default': {'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+                         'LOCATION': '127.0.0.1:11211'}}
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    def ids(self, check):
+        return [message.id for message in check(None)]
+
+    @override_settings(CACHES=LOCMEM, WEB_WORKERS=4)
+    def test_several_workers_need_a_shared_cache(self):
+        self.assertEqual(self.ids(checks.check_workers_share_the_cache), ['app.E001'])
+
+    @override_settings(CACHES=LOCMEM, WEB_WORKERS=1)
+    def test_one_worker_may_use_a_local_cache(self):
+        self.assertEqual(self.ids(checks.check_workers_share_the_cache), [])
+        self.assertEqual(self.ids(checks.check_shared_cache), ['app.W001'])
+
+    @override_settings(CACHES=MEMCACHED, WEB_WORKERS=4)
+    def test_shared_cache_passes(self):
+        self.assertEqual(self.ids(checks.check_workers_share_the_cache), [])
+        self.assertEqual(self.ids(checks.check_shared_cache), [])
@@ -0,0 +1,103 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import router
+from django.test import RequestFactory, TestCase
+
+from app import bestsellers, databases, slug_cache
+from app.models import Product
+from app.reviews import rating_histogram
+from app.tests.factories import make_category, make_product, make_review, make_user
+
+
+class ReplicaCacheTests(TestCase):
+    # No replica is configured in the tests, so any read routed to it fails
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = make_user('seller')
+        cls.category = make_category()
+        cls.product = make_product(cls.seller, cls.category, 'Radeon 7900')
+        make_review(make_user('buyer'), cls.product, rating=8)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_caches_are_filled_from_the_primary(self):
+        token = databases._replica_reads.set(True)
+        self.addCleanup(databases._replica_reads.reset, token)
+        self.assertEqual(slug_cache.category(self.category.slug).pk, self.category.pk)
+        self.assertEqual(slug_cache.product_id('radeon-7900'), self.product.pk)
+        self.assertEqual(bestsellers.refresh(), [self.product.pk])
+        self.assertEqual(rating_histogram(self.product)[2], (8, 1, 100))
+
+    def test_cached_pages_are_rendered_from_the_primary(self):
+        with mock.patch('app.databases._may_use_replica', return_value=True):
+            for path in ['/products/radeon-7900', '/reviews/radeon-7900', '/categories/',
+                         f'/categories/{self.category.slug}']:
+                with self.subTest(path=path):
+                    self.assertEqual(self.client.get(path)['X-Page-Cache'], 'MISS')
+                    self.assertEqual(self.client.get(path)['X-Page-Cache'], 'HIT')
+
+
+class ReplicaRoutingTests(TestCase):
+    # Only configured, no test reads from it
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = make_user('seller')
+        cls.buyer = make_user('buyer')
+        cls.product = make_product(cls.seller, make_category(), 'Radeon 7900')
+
+    def setUp(self):
+        patcher = mock.patch.dict(settings.DATABASES, {databases.REPLICA: settings.DATABASES['default']})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read_database(self, cookies=None):
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies or {})
+        view = databases.read_from_replica(lambda request: router.db_for_read(Product))
+        return view(request)
+
+    def test_decorated_views_read_from_the_replica(self):
+        self.assertEqual(self.read_database(), databases.REPLICA)
+        self.assertEqual(router.db_for_read(Product), databases.PRIMARY)
+
+    def test_sessions_and_writes_stay_on_the_primary(self):
+        token = databases._replica_reads.set(True)
+        self.addCleanup(databases._replica_reads.reset, token)
+        self.assertEqual(router.db_for_read(Session), databases.PRIMARY)
+        self.assertEqual(router.db_for_write(Product), databases.PRIMARY)
+
+    def test_pinned_visitors_read_from_the_primary(self):
+        for value, database in [(str(int(time.time()) + 5), databases.PRIMARY),
+                                (str(int(time.time()) - 5), databases.REPLICA),
+                                ('garbage', databases.REPLICA)]:
+            with self.subTest(value=value):
+                self.assertEqual(self.read_database({databases.PIN_COOKIE: value}), database)
+
+    def test_writes_pin_the_visitor(self):
+        self.client.force_login(self.buyer)
+        response = self.client.post('/add_to_cart', {'product_id': self.product.pk}, HTTP_REFERER='/')
+        pin = response.cookies[databases.PIN_COOKIE]
+        self.assertEqual(pin['max-age'], settings.REPLICA_PIN_SECONDS)
+        self.assertGreater(int(pin.value), time.time())
+
+    def test_reads_and_session_writes_do_not_pin(self):
+        self.client.force_login(self.buyer)
+        # The pages read from the primary, which holds the test transaction
+        patcher = mock.patch('app.databases._may_use_replica', return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for path in ['/products/', '/orders/']:
+            with self.subTest(path=path):
+                self.assertNotIn(databases.PIN_COOKIE, self.client.get(path).cookies)
+
+    def test_nothing_is_pinned_without_a_replica(self):
+        del settings.DATABASES[databases.REPLICA]
+        self.client.force_login(self.buyer)
+        response = self.client.post('/add_to_cart', {'product_id': self.product.pk}, HTTP_REFERER='/')
+        self.assertNotIn(databases.PIN_COOKIE, response.cookies)
+        self.assertEqual(self.read_database(), databases.PRIMARY)
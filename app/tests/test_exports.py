@@ -0,0 +1,94 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.http import StreamingHttpResponse
+from django.test import TestCase
+from django.utils import timezone
+
+from app import exports
+from app.checkout import place_order
+from app.models import Cart, Order, ProductInCart
+from app.tests.factories import make_category, make_product, make_user
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', password='password', is_staff=True)
+        cls.seller = make_user('seller')
+        cls.other_seller = make_user('other-seller')
+        cls.buyer = make_user('buyer')
+        category = make_category()
+        cls.card = make_product(cls.seller, category, 'Card', price='100.00')
+        cls.cpu = make_product(cls.other_seller, category, 'CPU', price='50.00')
+        cls.march = cls.order(datetime(2024, 3, 10, 12), (cls.card, 1), (cls.cpu, 2))
+        cls.april = cls.order(datetime(2024, 4, 1, 0, 30), (cls.cpu, 1))
+        Order.objects.filter(pk=cls.april.pk).update(status='Delivered')
+
+    @classmethod
+    def order(cls, created_at, *lines):
+        cart = Cart.objects.get(customer=cls.buyer)
+        for product, quantity in lines:
+            ProductInCart.objects.create(cart=cart, product=product, quantity=quantity)
+        order = place_order(cls.buyer)
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.make_aware(created_at))
+        return order
+
+    def export(self, user, name, file_format='csv', **params):
+        self.client.force_login(user)
+        response = self.client.get(f'/export/{name}.{file_format}', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        content = b''.join(response.streaming_content).decode()
+        if file_format == 'json':
+            return json.loads(content)
+        return list(csv.DictReader(io.StringIO(content)))
+
+    def column(self, rows, name):
+        return [row[name] for row in rows]
+
+    def test_orders_csv(self):
+        rows = self.export(self.staff, 'orders')
+        self.assertEqual(list(rows[0]), exports.ORDER_COLUMNS)
+        self.assertEqual([(row['order_id'], row['customer'], row['total']) for row in rows],
+                         [(str(self.march.pk), 'buyer', '200.00'), (str(self.april.pk), 'buyer', '50.00')])
+
+    def test_orders_json(self):
+        rows = self.export(self.staff, 'orders', 'json', status='Delivered')
+        self.assertEqual(rows, [{'order_id': self.april.pk, 'created_at': '2024-04-01T00:30:00Z',
+                                 'status': 'Delivered', 'customer': 'buyer', 'total': '50.00'}])
+        self.assertEqual(self.export(self.staff, 'orders', 'json', status='Processing'), [])
+
+    def test_dates_are_inclusive(self):
+        for params, orders in [({'from': '2024-03-10', 'to': '2024-03-10'}, [self.march]),
+                               ({'from': '2024-03-11'}, [self.april]),
+                               ({'to': '2024-03-31'}, [self.march]),
+                               ({'from': '2024-04-02'}, [])]:
+            with self.subTest(params=params):
+                rows = self.export(self.staff, 'orders', **params)
+                self.assertEqual(self.column(rows, 'order_id'), [str(order.pk) for order in orders])
+
+    def test_sellers_only_get_their_own_sales_and_products(self):
+        self.assertEqual(self.column(self.export(self.seller, 'sales'), 'product'), ['Card'])
+        self.assertEqual(self.column(self.export(self.other_seller, 'sales', status='Delivered'), 'subtotal'),
+                         ['50.00'])
+        self.assertEqual(self.column(self.export(self.staff, 'sales'), 'product'), ['Card', 'CPU', 'CPU'])
+        self.assertEqual(self.column(self.export(self.seller, 'products'), 'name'), ['Card'])
+        self.assertEqual(self.column(self.export(self.staff, 'products'), 'name'), ['Card', 'CPU'])
+
+    def test_order_export_is_staff_only(self):
+        self.assertEqual(self.client.get('/export/orders.csv').status_code, 302)
+        self.client.force_login(self.seller)
+        self.assertEqual(self.client.get('/export/orders.csv').status_code, 403)
+
+    def test_bad_requests(self):
+        self.client.force_login(self.staff)
+        for path, params in [('/export/orders.csv', {'from': '2024-3-1'}), ('/export/orders.csv', {'to': 'today'}),
+                             ('/export/sales.json', {'status': 'Lost'})]:
+            with self.subTest(path=path, params=params):
+                self.assertEqual(self.client.get(path, params).status_code, 400)
+        self.assertEqual(self.client.get('/export/orders.xml').status_code, 404)
+        self.assertEqual(self.client.post('/export/orders.csv').status_code, 405)
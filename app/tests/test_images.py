@@ -0,0 +1,55 @@
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase
+from PIL import Image
+
+from app import images
+from app.models import CustomUser, Product
+from app.tests.factories import make_category, make_product, make_user
+
+
+class DerivativeSchedulingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = make_user('seller')
+        cls.category = make_category()
+
+    def scheduled(self, save):
+        with mock.patch('app.images.schedule_derivatives') as schedule:
+            save()
+        return [call.args[0] for call in schedule.call_args_list]
+
+    def test_only_new_product_images_are_scheduled(self):
+        self.assertEqual(self.scheduled(lambda: make_product(self.seller, self.category)), ['default.png'])
+        product = Product.objects.get()
+        product.quantity = 2
+        self.assertEqual(self.scheduled(product.save), [])
+        product.image = 'uploaded/card.png'
+        self.assertEqual(self.scheduled(product.save), ['uploaded/card.png'])
+        self.assertEqual(self.scheduled(product.save), [])
+
+    def test_only_new_profile_images_are_scheduled(self):
+        self.assertEqual(self.scheduled(lambda: CustomUser.objects.create(user=self.seller, display_name='Seller')),
+                         ['default.png'])
+        profile = CustomUser.objects.get()
+        profile.phone = '070 123 456'
+        self.assertEqual(self.scheduled(profile.save), [])
+        profile.image = 'uploaded/avatar.png'
+        self.assertEqual(self.scheduled(profile.save), ['uploaded/avatar.png'])
+
+    def test_derivatives_are_generated_after_the_commit(self):
+        self.assertNotEqual(settings.MEDIA_ROOT, settings.BASE_DIR / 'media')
+        buffer = BytesIO()
+        Image.new('RGB', (800, 600), 'red').save(buffer, 'PNG')
+        name = default_storage.save('uploaded/card.png', ContentFile(buffer.getvalue()))
+        self.addCleanup(default_storage.delete, name)
+        product = make_product(self.seller, self.category)
+        product.image = name
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+            self.assertFalse(images.has_derivatives(name))
+        self.assertTrue(all(default_storage.exists(derivative) for derivative in images.derivative_names(name)))
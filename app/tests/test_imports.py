@@ -0,0 +1,63 @@
+import io
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import TestCase
+from PIL import Image
+
+from app import imports
+from app.models import Product
+from app.tests.factories import make_category, make_product, make_user
+
+
+class ImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = make_user('seller')
+        cls.category = make_category()
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.image_root = directory.name
+        Image.new('RGB', (400, 300), 'blue').save(Path(self.image_root) / 'card.png')
+        # Off the import's threads, whose derivatives_created receivers would write to the test database
+        patcher = mock.patch('app.images.generate_derivatives')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def row(self, name):
+        return json.dumps({'name': name, 'price': '10.00', 'quantity': 1, 'description': name,
+                           'category': self.category.slug, 'image': 'card.png'})
+
+    def run_import(self, lines, **kwargs):
+        errors = []
+        rows = imports.read_rows(io.StringIO(''.join(line + '\n' for line in lines)), 'jsonl')
+        report = imports.import_products(rows, self.seller, image_root=self.image_root, workers=1,
+                                         on_error=lambda row_number, message: errors.append((row_number, message)),
+                                         **kwargs)
+        return report, errors
+
+    def slugs(self):
+        return sorted(self.seller.products.values_list('slug', flat=True))
+
+    def test_malformed_lines_are_row_errors(self):
+        report, errors = self.run_import([self.row('Card'), '{"name": ', '[1, 2]', '', self.row('Card')])
+        self.assertEqual((report.rows, report.created, report.errors), (4, 2, 2))
+        self.assertEqual([row_number for row_number, message in errors], [2, 3])
+        self.assertTrue(errors[0][1].startswith("Invalid JSON"), errors[0][1])
+        self.assertEqual(errors[1][1], "Not a JSON object")
+        self.assertEqual(self.slugs(), ['card', 'card-2'])
+
+    def test_slugs_continue_the_sellers_suffixes(self):
+        make_product(self.seller, self.category, 'Card')
+        make_product(self.seller, self.category, 'Card')
+        make_product(self.seller, self.category, 'Graphics card')
+        make_product(make_user('other-seller'), self.category, 'Other')
+        self.assertEqual(imports._taken_slugs(self.seller, ['Card', 'Other']), {'card', 'card-2'})
+        report, errors = self.run_import([self.row('Card'), self.row('Other'), self.row('Card')], batch_size=2)
+        self.assertEqual((report.created, errors), (3, []))
+        self.assertEqual(self.slugs(), ['card', 'card-2', 'card-3', 'card-4', 'graphics-card', 'other'])
+        self.assertEqual(Product.objects.filter(slug='other').count(), 2)
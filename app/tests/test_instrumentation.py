@@ -0,0 +1,74 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from app import instrumentation
+from app.instrumentation import QueryRecorder, view_stats
+from app.models import Product
+from app.tests.factories import PASSWORD, make_category, make_product, make_user
+
+
+@override_settings(SQL_INSTRUMENTATION_SAMPLE_RATE=1)
+class InstrumentationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', password=PASSWORD, is_staff=True)
+        seller = make_user('seller')
+        category = make_category()
+        cls.products = [make_product(seller, category, f"Card {i}") for i in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        instrumentation._view_totals.clear()
+
+    def get(self, path):
+        with self.assertLogs('app.instrumentation', 'INFO') as logs:
+            response = self.client.get(path)
+        return response, [json.loads(record.getMessage()) for record in logs.records]
+
+    def test_sampled_requests_are_logged_and_totalled(self):
+        response, records = self.get('/categories/')
+        self.get('/categories/')
+        self.assertEqual([(record['view'], record['status']) for record in records], [('categories', 200)])
+        self.assertGreater(records[0]['queries'], 0)
+        stats = view_stats()['categories']
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['max_queries'], records[0]['queries'])
+
+    def test_server_timing_is_only_sent_to_the_staff(self):
+        self.assertNotIn('Server-Timing', self.get('/categories/')[0])
+        with override_settings(DEBUG=True):
+            self.assertIn('Server-Timing', self.get('/categories/')[0])
+        self.client.force_login(self.staff)
+        self.assertIn('queries', self.get('/categories/')[0]['Server-Timing'])
+
+    async def test_async_requests_are_instrumented_too(self):
+        with override_settings(ROOT_URLCONF='dnick_eshop.async_urls'):
+            with self.assertLogs('app.instrumentation', 'INFO'):
+                self.assertNotIn('Server-Timing', await self.async_client.get('/categories/'))
+            await sync_to_async(self.async_client.force_login)(self.staff)
+            with self.assertLogs('app.instrumentation', 'INFO'):
+                self.assertIn('Server-Timing', await self.async_client.get('/categories/'))
+
+    def test_in_lists_of_any_length_are_one_statement(self):
+        with QueryRecorder() as recorder:
+            list(Product.objects.filter(pk__in=[product.pk for product in self.products[:2]]))
+            list(Product.objects.filter(pk__in=[product.pk for product in self.products]))
+        self.assertEqual(list(recorder.duplicates.values()), [2])
+
+    def test_repeated_statements_are_capped(self):
+        recorder = QueryRecorder()
+        for batch in range(10):
+            instrumentation._aggregate('products', recorder, 0.01, {f"SELECT {batch}, {i}": 2 for i in range(50)})
+        self.assertLessEqual(len(instrumentation._view_totals['products']['repeated']),
+                             2 * instrumentation.REPEATED_STATEMENTS_KEPT)
+        self.assertEqual(len(view_stats()['products']['repeated']), 5)
+
+    def test_stats_are_only_shown_to_the_staff(self):
+        self.assertEqual(self.get('/sql-stats/')[0].status_code, 302)
+        self.client.force_login(self.staff)
+        self.get('/categories/')
+        self.assertEqual(self.get('/sql-stats/')[0].json()['categories']['requests'], 1)
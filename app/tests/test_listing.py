@@ -0,0 +1,66 @@
+from django.test import TestCase
+
+from app import listing
+from app.models import Product
+from app.tests.factories import make_category, make_product, make_user
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = make_user('seller')
+        category = make_category()
+        # Ties on price and sold, so the pages have to fall back on the id
+        for i in range(7):
+            product = make_product(seller, category, f"Card {i}", price=str(100 + i % 3))
+            Product.objects.filter(pk=product.pk).update(sold=i % 2)
+
+    def walk(self, sort, page_size=3):
+        pages, cursor = [], None
+        while True:
+            page = listing.paginate_products(Product.objects.all(), sort=sort, cursor=cursor, page_size=page_size)
+            pages.append([product.name for product in page.products])
+            if not page.has_next:
+                return pages
+            cursor = page.next_cursor
+
+    def test_pages_follow_every_sort_order(self):
+        for sort, ordering in listing.SORT_ORDERS.items():
+            with self.subTest(sort=sort):
+                expected = list(Product.objects.order_by(*ordering).values_list('name', flat=True))
+                pages = self.walk(sort)
+                self.assertEqual([len(page) for page in pages], [3, 3, 1])
+                self.assertEqual([name for page in pages for name in page], expected)
+
+    def test_last_full_page_has_no_next_cursor(self):
+        self.assertEqual([len(page) for page in self.walk('newest', page_size=7)], [7])
+
+    def test_cursor_of_another_sort_restarts(self):
+        page = listing.paginate_products(Product.objects.all(), sort='price_low', page_size=3)
+        restarted = listing.paginate_products(Product.objects.all(), sort='newest', cursor=page.next_cursor,
+                                              page_size=3)
+        self.assertIsNone(restarted.cursor)
+        self.assertEqual(restarted.products, list(Product.objects.order_by('-created_at', '-id')[:3]))
+
+    def test_malformed_cursor_restarts(self):
+        for cursor in ['not base64!', listing.encode_cursor('newest', ['yesterday', 1]),
+                       listing.encode_cursor('newest', [None, 1]), listing.encode_cursor('newest', [{}, 1]),
+                       listing.encode_cursor('price_low', [[], 1])]:
+            with self.subTest(cursor=cursor):
+                page = listing.paginate_products(Product.objects.all(), cursor=cursor, page_size=3)
+                self.assertIsNone(page.cursor)
+                self.assertEqual(len(page.products), 3)
+
+    def test_rows_added_before_the_cursor_are_not_repeated(self):
+        page = listing.paginate_products(Product.objects.all(), sort='newest', page_size=3)
+        make_product(Product.objects.first().seller, Product.objects.first().category, 'Card new')
+        following = listing.paginate_products(Product.objects.all(), sort='newest', cursor=page.next_cursor,
+                                              page_size=3)
+        self.assertFalse({product.pk for product in following.products} & {product.pk for product in page.products})
+        self.assertNotIn('Card new', [product.name for product in following.products])
+
+    def test_listing_view_uses_the_requested_sort(self):
+        response = self.client.get('/products/', {'sort': 'price_high'})
+        self.assertEqual([product.name for product in response.context['products']],
+                         list(Product.objects.order_by('-price', '-id').values_list('name', flat=True)))
+        self.assertFalse(response.context['page'].has_next)
@@ -0,0 +1,96 @@
+import os
+import shutil
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+
+from app import media
+
+CONTENT = bytes(range(256)) * 4
+
+
+class MediaServeTests(TestCase):
+    def setUp(self):
+        self.directory = os.path.join(settings.MEDIA_ROOT, 'media-tests')
+        os.makedirs(self.directory)
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.write(CONTENT)
+        self.path = '/media/media-tests/file.bin'
+
+    def write(self, content):
+        with open(os.path.join(self.directory, 'file.bin'), 'wb') as file:
+            file.write(content)
+
+    def get(self, **headers):
+        return self.client.get(self.path, **headers)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_whole_file_with_its_validators(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), CONTENT)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Cache-Control'], media.REVALIDATE_CACHE_CONTROL)
+        self.assertTrue(response['ETag'] and response['Last-Modified'])
+
+    def test_versioned_url_is_immutable(self):
+        url = default_storage.url('media-tests/file.bin')
+        self.assertEqual(self.client.get(url)['Cache-Control'], media.IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(self.client.get(self.path, {'v': 'stale'})['Cache-Control'],
+                         media.REVALIDATE_CACHE_CONTROL)
+
+    def test_new_content_gets_a_new_version(self):
+        url = default_storage.url('media-tests/file.bin')
+        self.write(CONTENT[:10])
+        self.assertNotEqual(default_storage.url('media-tests/file.bin'), url)
+
+    def test_unchanged_file_answers_304(self):
+        response = self.get()
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_single_ranges(self):
+        size = len(CONTENT)
+        for header, start, end in [('bytes=10-19', 10, 19), ('bytes=1000-', 1000, size - 1),
+                                   ('bytes=-24', size - 24, size - 1), ('bytes=1020-5000', 1020, size - 1)]:
+            with self.subTest(header=header):
+                response = self.get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(self.body(response), CONTENT[start:end + 1])
+                self.assertEqual(response['Content-Range'], f"bytes {start}-{end}/{size}")
+                self.assertEqual(response['Content-Length'], str(end - start + 1))
+
+    def test_unsatisfiable_range(self):
+        response = self.get(HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f"bytes */{len(CONTENT)}")
+
+    def test_whole_file_for_other_ranges(self):
+        etag = self.get()['ETag']
+        for headers in [{'HTTP_RANGE': 'bytes=0-1,5-6'}, {'HTTP_RANGE': 'items=0-1'},
+                        {'HTTP_RANGE': 'bytes=0-1', 'HTTP_IF_RANGE': '"stale"'}]:
+            with self.subTest(headers=headers):
+                response = self.get(**headers)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(self.body(response), CONTENT)
+        self.assertEqual(self.get(HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE=etag).status_code, 206)
+
+    def test_only_regular_files_are_served(self):
+        for path in ['/media/media-tests/', '/media/media-tests/missing.bin', '/media/../manage.py']:
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(path).status_code, 404)
+        self.assertEqual(self.client.post(self.path).status_code, 405)
+
+    def test_offloading_to_the_proxy(self):
+        with override_settings(MEDIA_OFFLOAD='x-accel-redirect'):
+            response = self.get()
+            self.assertEqual(response['X-Accel-Redirect'], '/protected-media/media-tests/file.bin')
+        with override_settings(MEDIA_OFFLOAD='x-sendfile'):
+            response = self.get()
+            self.assertEqual(response['X-Sendfile'], os.path.join(self.directory, 'file.bin'))
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['Cache-Control'], media.REVALIDATE_CACHE_CONTROL)
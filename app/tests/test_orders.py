@@ -0,0 +1,67 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from app.checkout import place_order
+from app.models import Cart, Product, ProductInCart
+from app.tests.factories import make_category, make_product, make_user
+from app.views import ORDERS_PER_PAGE
+
+
+class OrderHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = make_user('seller')
+        cls.buyer = make_user('buyer')
+        category = make_category()
+        cls.card = make_product(cls.seller, category, 'Card', price='100.00', quantity=100)
+        cls.cpu = make_product(cls.seller, category, 'CPU', price='50.00', quantity=100)
+
+    def setUp(self):
+        self.client.force_login(self.buyer)
+
+    def order(self, *lines, customer=None):
+        customer = customer or self.buyer
+        cart = Cart.objects.get(customer=customer)
+        for product, quantity in lines:
+            ProductInCart.objects.create(cart=cart, product=product, quantity=quantity)
+        return place_order(customer)
+
+    def history(self, page=1):
+        return self.client.get('/orders/', {'page': page}).context['orders']
+
+    def queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/orders/').status_code, 200)
+        return len(queries)
+
+    def test_order_keeps_the_prices_it_was_placed_at(self):
+        order = self.order((self.card, 1), (self.cpu, 2))
+        self.assertEqual(order.total, 200)
+        Product.objects.filter(pk=self.cpu.pk).update(price=75)
+        response = self.client.get('/orders/')
+        self.assertContains(response, 'Order Total: $200.00')
+        self.assertContains(response, 'CPU - $50.00 - x2')
+
+    def test_newest_orders_come_first_a_page_at_a_time(self):
+        orders = [self.order((self.cpu, 1)) for _ in range(ORDERS_PER_PAGE + 2)]
+        self.assertEqual(list(self.history()), orders[::-1][:ORDERS_PER_PAGE])
+        self.assertEqual(list(self.history(page=2)), orders[1::-1])
+        # Out of range pages show the last one
+        self.assertEqual(list(self.history(page=99)), orders[1::-1])
+
+    def test_only_the_buyers_orders_are_shown(self):
+        self.order((self.card, 1), customer=make_user('other-buyer'))
+        mine = self.order((self.cpu, 1))
+        self.assertEqual(list(self.history()), [mine])
+        self.client.logout()
+        self.assertEqual(list(self.history()), [])
+
+    def test_query_count_does_not_grow_with_the_history(self):
+        self.order((self.card, 1))
+        # The first request also saves the session and fills the navbar's cache
+        self.queries()
+        one_order = self.queries()
+        for _ in range(3):
+            self.order((self.card, 1), (self.cpu, 3))
+        self.assertEqual(self.queries(), one_order)
@@ -0,0 +1,68 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from app.models import Product
+from app.tests.factories import make_category, make_product, make_review, make_user
+
+
+class PageCacheInvalidationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = make_user('seller')
+        cls.buyer = make_user('buyer')
+        cls.category = make_category('Graphics cards')
+        cls.other_category = make_category('Processors')
+        cls.product = make_product(cls.seller, cls.category, 'Radeon 7900')
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, path):
+        return self.client.get(path)
+
+    def save(self, product):
+        # The slug lookups are forgotten once the change is committed
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+
+    def test_anonymous_pages_are_cached(self):
+        self.assertEqual(self.get('/products/radeon-7900')['X-Page-Cache'], 'MISS')
+        response = self.get('/products/radeon-7900')
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertContains(response, 'Radeon 7900')
+
+    def test_logged_in_visitors_bypass_the_cache(self):
+        self.get('/products/radeon-7900')
+        self.client.force_login(self.buyer)
+        self.assertNotIn('X-Page-Cache', self.get('/products/radeon-7900'))
+
+    def test_edit_invalidates_the_product_pages(self):
+        self.get('/products/radeon-7900')
+        self.get('/categories/graphics-cards')
+        product = Product.objects.get(pk=self.product.pk)
+        product.price = 90
+        self.save(product)
+        self.assertEqual(self.get('/products/radeon-7900')['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.get('/categories/graphics-cards')['X-Page-Cache'], 'MISS')
+
+    def test_rename_invalidates_the_old_slug(self):
+        self.assertEqual(self.get('/products/radeon-7900').status_code, 200)
+        product = Product.objects.get(pk=self.product.pk)
+        product.name = 'Radeon 7900 XT'
+        self.save(product)
+        self.assertEqual(self.get('/products/radeon-7900').status_code, 404)
+        self.assertContains(self.get('/products/radeon-7900-xt'), 'Radeon 7900 XT')
+
+    def test_move_invalidates_the_old_category(self):
+        self.assertContains(self.get('/categories/graphics-cards'), 'Radeon 7900')
+        self.get('/categories/processors')
+        product = Product.objects.get(pk=self.product.pk)
+        product.category = self.other_category
+        self.save(product)
+        self.assertEqual(self.get('/categories/graphics-cards')['X-Page-Cache'], 'MISS')
+        self.assertContains(self.get('/categories/processors'), 'Radeon 7900')
+
+    def test_review_invalidates_the_reviews_page(self):
+        self.get('/reviews/radeon-7900')
+        make_review(self.buyer, self.product, rating=7)
+        self.assertEqual(self.get('/reviews/radeon-7900')['X-Page-Cache'], 'MISS')
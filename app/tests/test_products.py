@@ -0,0 +1,56 @@
+from django.test import TestCase
+
+from app.models import Product
+from app.tests.factories import make_category, make_product, make_user
+
+
+class ProductSlugTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = make_user('seller')
+        cls.other_seller = make_user('other-seller')
+        cls.category = make_category()
+
+    def rename(self, product, name):
+        product = Product.objects.get(pk=product.pk)
+        product.name = name
+        product.save()
+        return Product.objects.get(pk=product.pk).slug
+
+    def test_new_product_gets_the_slug_of_its_name(self):
+        self.assertEqual(make_product(self.seller, self.category, 'Windows 10').slug, 'windows-10')
+
+    def test_duplicate_name_of_the_same_seller_is_suffixed(self):
+        make_product(self.seller, self.category, 'Windows 10')
+        self.assertEqual(make_product(self.seller, self.category, 'Windows 10').slug, 'windows-10-2')
+        self.assertEqual(make_product(self.seller, self.category, 'Windows 10').slug, 'windows-10-3')
+        self.assertEqual(make_product(self.other_seller, self.category, 'Windows 10').slug, 'windows-10')
+
+    def test_unchanged_name_keeps_the_suffix(self):
+        make_product(self.seller, self.category, 'Windows 10')
+        duplicate = make_product(self.seller, self.category, 'Windows 10')
+        duplicate = Product.objects.get(pk=duplicate.pk)
+        duplicate.price = 50
+        duplicate.save()
+        self.assertEqual(Product.objects.get(pk=duplicate.pk).slug, 'windows-10-2')
+
+    def test_rename_to_a_suffix_like_name(self):
+        product = make_product(self.seller, self.category, 'Windows 10')
+        self.assertEqual(self.rename(product, 'Windows'), 'windows')
+
+    def test_rename_to_a_name_the_seller_already_uses(self):
+        make_product(self.seller, self.category, 'Windows')
+        product = make_product(self.seller, self.category, 'Windows 11')
+        self.assertEqual(self.rename(product, 'Windows'), 'windows-2')
+
+    def test_renamed_duplicate_drops_its_suffix(self):
+        make_product(self.seller, self.category, 'Windows 10')
+        duplicate = make_product(self.seller, self.category, 'Windows 10')
+        self.assertEqual(self.rename(duplicate, 'Windows 10 Pro'), 'windows-10-pro')
+
+    def test_saving_twice_after_a_rename(self):
+        product = make_product(self.seller, self.category, 'Windows 10')
+        product.name = 'Windows 11'
+        product.save()
+        product.save()
+        self.assertEqual(Product.objects.get(pk=product.pk).slug, 'windows-11')
@@ -0,0 +1,61 @@
+from django.test import TestCase
+
+from app.models import Product, Review
+from app.tests.factories import make_category, make_product, make_review, make_user
+
+
+class RatingAggregateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = make_user('seller')
+        cls.buyer = make_user('buyer')
+        category = make_category()
+        cls.product = make_product(cls.seller, category, 'Card A')
+        cls.other = make_product(cls.seller, category, 'Card B')
+
+    def assertRating(self, product, count, total, average):
+        product = Product.objects.get(pk=product.pk)
+        self.assertEqual((product.rating_count, product.rating_sum, product.average_rating), (count, total, average))
+
+    def test_new_reviews_are_counted(self):
+        make_review(self.buyer, self.product, rating=4)
+        make_review(self.seller, self.product, rating=9)
+        self.assertRating(self.product, 2, 13, 6.5)
+        self.assertRating(self.other, 0, 0, 0)
+
+    def test_edited_rating_is_recomputed(self):
+        review = make_review(self.buyer, self.product, rating=4)
+        review.rating = 10
+        review.save()
+        self.assertRating(self.product, 1, 10, 10)
+
+    def test_deleted_review_is_removed(self):
+        make_review(self.buyer, self.product, rating=4)
+        review = make_review(self.seller, self.product, rating=8)
+        review.delete()
+        self.assertRating(self.product, 1, 4, 4)
+
+    def test_deleting_the_last_review_resets_the_rating(self):
+        make_review(self.buyer, self.product, rating=4).delete()
+        self.assertRating(self.product, 0, 0, 0)
+        self.assertEqual(Product.objects.get(pk=self.product.pk).calculate_average_rating(), 'No reviews yet')
+
+    def test_loaded_review_moved_to_another_product(self):
+        review = make_review(self.buyer, self.product, rating=6)
+        review = Review.objects.get(pk=review.pk)
+        review.product = self.other
+        review.save()
+        self.assertRating(self.product, 0, 0, 0)
+        self.assertRating(self.other, 1, 6, 6)
+
+    def test_review_moved_twice(self):
+        third = make_product(self.seller, self.product.category, 'Card C')
+        review = make_review(self.buyer, self.product, rating=8)
+        review = Review.objects.get(pk=review.pk)
+        review.product = self.other
+        review.save()
+        review.product = third
+        review.save()
+        self.assertRating(self.product, 0, 0, 0)
+        self.assertRating(self.other, 0, 0, 0)
+        self.assertRating(third, 1, 8, 8)
@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from app import reservations
+from app.models import Cart, Product, StockReservation
+from app.tests.factories import make_category, make_product, make_user
+
+
+class ReservationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = make_user('seller')
+        cls.buyer = make_user('buyer')
+        cls.cart = Cart.objects.get(customer=cls.buyer)
+        cls.other_cart = Cart.objects.get(customer=make_user('other-buyer'))
+        category = make_category()
+        cls.card = make_product(seller, category, 'Card', quantity=3)
+        cls.cpu = make_product(seller, category, 'CPU', quantity=5)
+
+    def setUp(self):
+        self.announced = []
+        reservations.stock_changed.connect(self.record)
+        self.addCleanup(reservations.stock_changed.disconnect, self.record)
+
+    def record(self, sender, product_ids, **kwargs):
+        self.announced.append(sorted(product_ids))
+
+    def reserve(self, product, quantity):
+        with self.captureOnCommitCallbacks(execute=True):
+            return reservations.reserve(self.cart, product.pk, quantity)
+
+    def release(self, queryset):
+        with self.captureOnCommitCallbacks(execute=True):
+            return reservations.release(queryset)
+
+    def stock(self, product):
+        return Product.objects.get(pk=product.pk).quantity
+
+    def hold(self, cart, product, quantity, expires_in):
+        return StockReservation.objects.create(cart=cart, product=product, quantity=quantity,
+                                               expires_at=timezone.now() + timedelta(seconds=expires_in))
+
+    def test_reserve_takes_the_stock_and_extends_the_hold(self):
+        self.assertTrue(self.reserve(self.cpu, 2))
+        self.assertTrue(self.reserve(self.cpu, 1))
+        self.assertEqual(self.stock(self.cpu), 2)
+        self.assertEqual(list(StockReservation.objects.values_list('product', 'quantity')), [(self.cpu.pk, 3)])
+
+    def test_reserve_fails_without_enough_stock(self):
+        self.assertFalse(self.reserve(self.card, 4))
+        self.assertEqual(self.stock(self.card), 3)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_only_selling_out_is_announced(self):
+        self.reserve(self.card, 2)
+        self.assertEqual(self.announced, [])
+        self.reserve(self.card, 1)
+        self.assertEqual(self.stock(self.card), 0)
+        self.assertEqual(self.announced, [[self.card.pk]])
+
+    def test_only_coming_back_in_stock_is_announced(self):
+        self.reserve(self.card, 3)
+        self.reserve(self.cpu, 1)
+        self.announced.clear()
+        self.assertEqual(self.release(StockReservation.objects.all()), 2)
+        self.assertEqual((self.stock(self.card), self.stock(self.cpu)), (3, 5))
+        self.assertEqual(self.announced, [[self.card.pk]])
+
+    def test_sweep_releases_only_expired_holds(self):
+        Product.objects.filter(pk=self.card.pk).update(quantity=0)
+        expired = [self.hold(self.cart, self.card, 1, -60), self.hold(self.cart, self.cpu, 2, -30),
+                   self.hold(self.other_cart, self.card, 2, -1)]
+        kept = self.hold(self.other_cart, self.cpu, 1, 60)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(reservations.release_expired(batch_size=2), len(expired))
+        self.assertEqual(list(StockReservation.objects.all()), [kept])
+        self.assertEqual((self.stock(self.card), self.stock(self.cpu)), (3, 7))
+        # The second batch finds the card back in stock
+        self.assertEqual(self.announced, [[self.card.pk]])
+
+    def test_sweep_with_nothing_expired(self):
+        self.hold(self.cart, self.cpu, 1, 60)
+        self.assertEqual(reservations.release_expired(), 0)
+        self.assertEqual(self.stock(self.cpu), 5)
@@ -0,0 +1,90 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from app import reviews
+from app.models import Review
+from app.tests.factories import make_category, make_product, make_review, make_user
+
+
+class ReviewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = make_user('seller')
+        category = make_category()
+        cls.product = make_product(cls.seller, category, 'Radeon 7900')
+        cls.other = make_product(cls.seller, category, 'GeForce 4090')
+        cls.ratings = [7, 10, 3, 7]
+        cls.reviews = [make_review(make_user(f"buyer-{i}"), cls.product, rating=rating)
+                       for i, rating in enumerate(cls.ratings)]
+
+    def setUp(self):
+        cache.clear()
+
+    def counts(self, product):
+        return {rating: (count, percentage) for rating, count, percentage in reviews.rating_histogram(product)
+                if count}
+
+    def test_every_sort_order(self):
+        by_id = [review.pk for review in self.reviews]
+        expected = {
+            'oldest': by_id,
+            'newest': by_id[::-1],
+            'highest': [by_id[1], by_id[3], by_id[0], by_id[2]],
+            'lowest': [by_id[2], by_id[0], by_id[3], by_id[1]],
+            'unknown': by_id,
+        }
+        for sort, ids in expected.items():
+            with self.subTest(sort=sort):
+                self.assertEqual([review.pk for review in reviews.sorted_reviews(self.product, sort)], ids)
+
+    def test_histogram_counts_every_rating(self):
+        histogram = reviews.rating_histogram(self.product)
+        self.assertEqual([rating for rating, count, percentage in histogram], list(range(10, 0, -1)))
+        self.assertEqual(self.counts(self.product), {10: (1, 25), 7: (2, 50), 3: (1, 25)})
+        self.assertEqual(self.counts(self.other), {})
+
+    def test_histogram_is_cached(self):
+        reviews.rating_histogram(self.product)
+        with self.assertNumQueries(0):
+            reviews.rating_histogram(self.product)
+
+    def test_new_edited_and_deleted_reviews_update_the_histogram(self):
+        reviews.rating_histogram(self.product)
+        make_review(self.seller, self.product, rating=10)
+        self.assertEqual(self.counts(self.product)[10], (2, 40))
+        review = Review.objects.get(pk=self.reviews[2].pk)
+        review.rating = 10
+        review.save()
+        self.assertEqual(self.counts(self.product), {10: (3, 60), 7: (2, 40)})
+        review.delete()
+        self.assertEqual(self.counts(self.product), {10: (2, 50), 7: (2, 50)})
+
+    def test_moved_review_updates_both_histograms(self):
+        reviews.rating_histogram(self.product)
+        reviews.rating_histogram(self.other)
+        review = Review.objects.get(pk=self.reviews[1].pk)
+        review.product = self.other
+        review.save()
+        self.assertNotIn(10, self.counts(self.product))
+        self.assertEqual(self.counts(self.other), {10: (1, 100)})
+
+    def test_page_query_count_does_not_grow_with_the_reviews(self):
+        self.client.force_login(self.seller)
+
+        def queries():
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(self.client.get('/reviews/radeon-7900', {'sort': 'highest'}).status_code, 200)
+            return len(captured)
+
+        queries()
+        few = queries()
+        for i in range(4, 30):
+            # Without a password, hashing one would only slow the test down
+            customer = User.objects.create(username=f"buyer-{i}")
+            Review.objects.create(customer=customer, product=self.product, rating=i % 10 + 1)
+        cache.clear()
+        queries()
+        self.assertEqual(queries(), few)
@@ -0,0 +1,135 @@
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from app import sales
+from app.checkout import place_order
+from app.models import Cart, Order, Product, ProductDailySales, ProductInCart, SellerDailySales
+from app.tests.factories import make_category, make_product, make_user
+
+
+def midnight(days_ago):
+    return timezone.make_aware(datetime.combine(timezone.localdate() - timedelta(days=days_ago), time.min))
+
+
+class SalesRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = make_user('seller')
+        cls.other_seller = make_user('other-seller')
+        cls.buyer = make_user('buyer')
+        category = make_category()
+        cls.card = make_product(cls.seller, category, 'Card', price='100.00', quantity=50)
+        cls.cpu = make_product(cls.seller, category, 'CPU', price='50.00', quantity=50)
+        cls.ram = make_product(cls.other_seller, category, 'RAM', price='20.00', quantity=50)
+
+    def order(self, *lines, days_ago=0):
+        cart = Cart.objects.get(customer=self.buyer)
+        for product, quantity in lines:
+            ProductInCart.objects.create(cart=cart, product=product, quantity=quantity)
+        order = place_order(self.buyer)
+        if days_ago:
+            # Moved back together with its rollups
+            Order.objects.filter(pk=order.pk).update(created_at=midnight(days_ago))
+            sales.rebuild()
+        return order
+
+    def seller_rows(self):
+        return {(row.seller.username, row.day): (row.units, row.revenue, row.orders)
+                for row in SellerDailySales.objects.select_related('seller')}
+
+    def product_rows(self):
+        return {(row.product.name, row.day): (row.units, row.revenue, row.orders)
+                for row in ProductDailySales.objects.select_related('product')}
+
+    def test_checkout_adds_to_the_days_rollups(self):
+        today = timezone.localdate()
+        self.order((self.card, 1), (self.ram, 2))
+        self.order((self.card, 2), (self.cpu, 1))
+        self.assertEqual(self.seller_rows(), {('seller', today): (4, 350, 2), ('other-seller', today): (2, 40, 1)})
+        self.assertEqual(self.product_rows(), {('Card', today): (3, 300, 2), ('CPU', today): (1, 50, 1),
+                                               ('RAM', today): (2, 40, 1)})
+
+    def test_rebuild_matches_the_checkout_rollups(self):
+        self.order((self.card, 1), (self.ram, 2))
+        self.order((self.card, 2), (self.cpu, 1))
+        seller_rows, product_rows = self.seller_rows(), self.product_rows()
+        SellerDailySales.objects.all().delete()
+        self.assertEqual(sales.rebuild(), 2)
+        self.assertEqual((self.seller_rows(), self.product_rows()), (seller_rows, product_rows))
+
+    def test_rebuild_since_keeps_the_older_days(self):
+        self.order((self.card, 1), days_ago=3)
+        self.order((self.cpu, 1))
+        ProductDailySales.objects.filter(day=timezone.localdate()).delete()
+        sales.rebuild(since=timezone.localdate())
+        self.assertEqual(sorted(name for name, day in self.product_rows()), ['CPU', 'Card'])
+
+    def test_rebuild_counts_the_sold_units_once(self):
+        self.order((self.card, 2))
+        sales.rebuild()
+        self.assertEqual(Product.objects.get(pk=self.card.pk).sold, 2)
+        self.assertEqual(sales.apply_sold(), 0)
+        self.order((self.card, 1))
+        self.assertEqual(sales.apply_sold(), 1)
+        self.assertEqual(Product.objects.get(pk=self.card.pk).sold, 3)
+
+    def test_dashboard_reads_the_last_days(self):
+        today = timezone.localdate()
+        self.order((self.card, 1), days_ago=sales.DASHBOARD_DAYS)
+        self.order((self.cpu, 3), days_ago=2)
+        self.order((self.card, 1), (self.ram, 1))
+        board = sales.dashboard(self.seller)
+        self.assertEqual([day.day for day in board['days']],
+                         [today - timedelta(days=offset) for offset in range(sales.DASHBOARD_DAYS - 1, -1, -1)])
+        self.assertEqual((board['units'], board['revenue'], board['orders']), (4, 250, 2))
+        self.assertEqual([(day.revenue, day.percent) for day in board['days'][-3:]], [(150, 100), (0, 0), (100, 67)])
+        self.assertEqual([(row['product__name'], row['units']) for row in board['top_products']],
+                         [('CPU', 3), ('Card', 1)])
+
+    def test_empty_dashboard(self):
+        board = sales.dashboard(self.seller, today=date(2024, 1, 31))
+        self.assertEqual((board['units'], board['revenue'], board['orders'], board['top_products']), (0, 0, 0, []))
+        self.assertEqual(board['start'], date(2024, 1, 2))
+
+
+class SellerDashboardViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = make_user('seller')
+        cls.buyer = make_user('buyer')
+        cls.staff = User.objects.create_user('staff', password='password', is_staff=True)
+        cls.product = make_product(cls.seller, make_category(), 'Card', quantity=50)
+        cls.path = '/seller/seller/dashboard'
+
+    def sell(self, days):
+        # One order on each of the days
+        for days_ago in days:
+            ProductInCart.objects.create(cart=Cart.objects.get(customer=self.buyer), product=self.product, quantity=1)
+            Order.objects.filter(pk=place_order(self.buyer).pk).update(created_at=midnight(days_ago))
+        sales.rebuild()
+
+    def queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(self.path).status_code, 200)
+        return len(queries)
+
+    def test_only_the_seller_and_the_staff_see_it(self):
+        self.assertEqual(self.client.get(self.path).status_code, 302)
+        for user, status in [(self.seller, 200), (self.staff, 200), (self.buyer, 403)]:
+            with self.subTest(user=user.username):
+                self.client.force_login(user)
+                self.assertEqual(self.client.get(self.path).status_code, status)
+
+    def test_query_count_does_not_grow_with_the_history(self):
+        self.client.force_login(self.seller)
+        self.sell([0])
+        self.queries()
+        one_day = self.queries()
+        self.sell(range(1, 6))
+        self.assertEqual(SellerDailySales.objects.count(), 6)
+        self.assertEqual(self.queries(), one_day)
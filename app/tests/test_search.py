@@ -0,0 +1,79 @@
+from unittest import mock
+
+from django.test import RequestFactory, TestCase
+
+from app import listing, search
+from app.models import Product
+from app.tests.factories import make_category, make_product, make_user
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seller = make_user('seller')
+        category = make_category()
+        cls.geforce = make_product(seller, category, 'GeForce RTX 3060')
+        cls.radeon = make_product(seller, category, 'Radeon RX 7900')
+        # Only mentions the card in its description
+        cls.cable = make_product(seller, category, 'Power cable')
+        Product.objects.filter(pk=cls.cable.pk).update(description='Fits a GeForce RTX card')
+
+    def names(self, search_term):
+        return sorted(search.matching_products(Product.objects.all(), search_term).values_list('name', flat=True))
+
+    def ranked(self, search_term, **query):
+        request = RequestFactory().get('/products/', {'search_term': search_term, **query})
+        return search.paginate_search(request, search_term, page_size=1)
+
+    def test_index_is_available(self):
+        self.assertTrue(search.fts_available())
+
+    def test_match_expression_quotes_every_term_as_a_prefix(self):
+        self.assertEqual(search.match_expression('Gefo "RTX" OR-3060'), '"gefo"* "rtx"* "or"* "3060"*')
+        self.assertEqual(search.match_expression('a b c d e f g h i j').count('*'), search.MAX_TERMS)
+        self.assertEqual(search.match_expression('"*()'), '')
+
+    def test_every_term_must_match_a_prefix(self):
+        self.assertEqual(self.names('gefo rtx'), ['GeForce RTX 3060', 'Power cable'])
+        self.assertEqual(self.names('rtx 7900'), [])
+        self.assertEqual(self.names('radeon'), ['Radeon RX 7900'])
+
+    def test_index_follows_edits_and_deletes(self):
+        product = Product.objects.get(pk=self.radeon.pk)
+        product.name = product.description = 'Arc A770'
+        product.save()
+        self.assertEqual(self.names('radeon'), [])
+        self.assertEqual(self.names('arc'), ['Arc A770'])
+        product.delete()
+        self.assertEqual(self.names('arc'), [])
+
+    def test_name_matches_rank_first(self):
+        first = self.ranked('geforce')
+        self.assertEqual([product.name for product in first.products], ['GeForce RTX 3060'])
+        self.assertEqual(first.sort, search.RELEVANCE)
+        second = self.ranked('geforce', cursor=first.next_cursor)
+        self.assertEqual([product.name for product in second.products], ['Power cable'])
+        self.assertFalse(second.has_next)
+
+    def test_malformed_relevance_cursor_restarts(self):
+        for values in [['best', 1], [{}, 1], [1.5]]:
+            with self.subTest(values=values):
+                page = self.ranked('geforce', cursor=listing.encode_cursor(search.RELEVANCE, values))
+                self.assertEqual([product.name for product in page.products], ['GeForce RTX 3060'])
+
+    def test_other_sorts_filter_by_the_index(self):
+        page = self.ranked('geforce', sort='price_low')
+        self.assertEqual(page.sort, 'price_low')
+        self.assertEqual(page.sort_choices, search.SEARCH_SORT_CHOICES)
+
+    def test_without_the_index_falls_back_to_like(self):
+        with mock.patch.dict(search._available, {'default': False}):
+            # Substrings match too, not only prefixes
+            self.assertEqual(self.names('orce'), ['GeForce RTX 3060', 'Power cable'])
+            page = self.ranked('orce')
+        self.assertEqual(page.sort, listing.DEFAULT_SORT)
+        self.assertEqual(page.sort_choices, listing.SORT_CHOICES)
+
+    def test_terms_without_words_fall_back_to_like(self):
+        self.assertEqual(self.names('7900'), ['Radeon RX 7900'])
+        self.assertEqual(self.names('-'), [])
@@ -1,16 +1,28 @@
+from django.contrib import messages
 from django.contrib.auth import logout
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import LoginView
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db import OperationalError
+from django.db.models import Prefetch
 from django.shortcuts import render, redirect, get_object_or_404
+from app import bestsellers, carts, catalog, listing, sales, search, slug_cache
+from app import reviews as product_reviews
+from app.databases import read_from_replica
+from app.page_cache import cache_anonymous_page
+from app.checkout import OutOfStock, place_order
+from app.context_processors import forget_navbar
 from app.forms import ProductForm, ReviewForm
-from app.models import Category, Product, Cart, Order, ProductInOrder, ProductInCart
-from django.contrib.auth import get_user_model
-from django.db.models import Q
+from app.models import Product, Order, ProductInOrder
 from django.contrib.auth.models import User
 
+ORDERS_PER_PAGE = 10
 
+
+@read_from_replica
 def index(request):
-    items = list(Product.objects.order_by('-sold')[:5])
-    context = {"products": items}
+    context = {"products": bestsellers.best_sellers()}
     return render(request, 'index.html', context)
 
 
@@ -27,72 +39,88 @@ def logout_view(request):
     return redirect('/')
 
 
+@read_from_replica
 def products(request):
     search_term = request.GET.get('search_term')
     if search_term:
-        items = Product.objects.filter(Q(name__icontains=search_term) | Q(description__icontains=search_term))
+        page = search.paginate_search(request, search_term)
     else:
-        items = Product.objects.all()
+        page = listing.paginate_request(request, Product.objects.all())
 
-    context = {"products": items}
-    return render(request, 'products.html', context)
+    return render(request, 'products.html', catalog.products_context(page, search_term))
 
 
+@read_from_replica
+@cache_anonymous_page('product_detail', 'slug')
 def product_detail(request, slug):
-    context = {"product": Product.objects.get(slug=slug)}
+    context = {"product": slug_cache.get_product_or_404(catalog.detail_queryset(), slug)}
     return render(request, 'product_detail.html', context)
 
 
+@read_from_replica
+@cache_anonymous_page('categories')
 def categories(request):
-    context = {"categories": Category.objects.all()}
+    context = {"categories": catalog.categories_queryset()}
     return render(request, 'categories.html', context)
 
 
+@read_from_replica
+@cache_anonymous_page('category_list', 'slug')
 def category_list(request, slug):
-    category = Category.objects.get(slug=slug)
-    items = list(Product.objects.filter(category=category))
-    context = {"products": items, "category": category}
-    return render(request, 'category_list.html', context)
+    category = slug_cache.get_category_or_404(slug)
+    page = listing.paginate_request(request, catalog.category_products(category))
+    best_sellers = bestsellers.best_sellers(category) if page.cursor is None else None
+    return render(request, 'category_list.html', catalog.category_list_context(category, page, best_sellers))
 
 
+@read_from_replica
+@cache_anonymous_page('reviews', 'slug')
 def reviews(request, slug):
-    product = Product.objects.get(slug=slug)
-    reviews_list = list(product.reviews.all())
-    reviews_list.sort(key=lambda x: x.created_at)
-    context = {"product": product, "reviews": product.reviews.all()}
+    product = slug_cache.get_product_or_404(Product.objects.all(), slug)
+    sort = catalog.review_sort(request)
+    page = catalog.reviews_paginator(product, sort).get_page(request.GET.get('page'))
+    context = catalog.reviews_context(product, sort, page, product_reviews.rating_histogram(product))
     return render(request, 'product_reviews.html', context)
 
 
+@read_from_replica
+@cache_anonymous_page('seller_profile', 'seller_username')
 def seller_profile(request, seller_username):
-    seller = User.objects.get(username=seller_username)
-    seller_products = list(seller.products.all())
-    context = {"seller": seller, "products": seller_products, }
+    seller = get_object_or_404(User, username=seller_username)
+    page = listing.paginate_request(request, seller.products.all())
+    context = {"seller": seller, "products": page.products, "page": page, }
     return render(request, 'seller_profile.html', context)
 
 
+@read_from_replica
+@login_required(login_url='login')
+def seller_dashboard(request, seller_username):
+    seller = get_object_or_404(User, username=seller_username)
+    # Sales figures are private to the seller and the staff
+    if request.user != seller and not request.user.is_staff:
+        raise PermissionDenied
+    context = {"seller": seller, **sales.dashboard(seller)}
+    return render(request, 'seller_dashboard.html', context)
+
+
 def cart(request):
-    if request.user.is_authenticated:
-        custom_user = User.objects.get(username=request.user)
-        user_cart = Cart.objects.get(customer=custom_user)
-        items = user_cart.products_in_cart.all()
-        context = {"items": items, "total": user_cart.calculate_total(), }
-        return render(request, 'cart.html', context)
+    items, total = carts.load_cart(request)
+    context = {"items": items, "total": total, }
+    return render(request, 'cart.html', context)
 
 
 def orders(request):
-    User = get_user_model()
-
     if request.user.is_authenticated:
-        user_instance = User.objects.get(username=request.user)
-        try:
-            user_profile = User.objects.get(username=user_instance)
-            orders = Order.objects.filter(customer=user_profile)
-        except User.DoesNotExist:
-            orders = []
+        lines = ProductInOrder.objects.select_related('product').only(
+            'order', 'product', 'quantity', 'unit_price', 'product__name')
+        orders = (Order.objects.filter(customer=request.user)
+                  .order_by('-created_at', '-id')
+                  .prefetch_related(Prefetch('products_in_order', queryset=lines)))
     else:
-        orders = []
+        orders = Order.objects.none()
 
-    context = {"orders": orders}
+    page = Paginator(orders, ORDERS_PER_PAGE).get_page(request.GET.get('page'))
+    context = {"orders": page, "page": page}
     return render(request, 'orders.html', context)
 
 
@@ -111,29 +139,29 @@ def add_product_to_shop(request):
 
 
 def checkout(request):
-    user_cart = Cart.objects.get(customer=request.user)
-    items = user_cart.products_in_cart.all()
-
-    # Don't create the order, if the user has no items in his cart
-    if len(items) == 0:
-        return redirect(request.META['HTTP_REFERER'])
+    # Anonymous carts are merged into the user's cart on login
+    if not request.user.is_authenticated:
+        return redirect('login')
 
-    Order(customer=request.user).save()
-    for item in items:
-        ProductInOrder(product=item.product, order=request.user.orders.last(), quantity=item.quantity).save()
-        item.product.quantity -= item.quantity
-        item.product.sold += item.quantity
-        item.product.save()
-        item.delete()
+    # No order is created when the cart is empty, and nothing is sold when any item ran out of stock
+    try:
+        place_order(request.user)
+        forget_navbar(request)
+    except OutOfStock as error:
+        messages.error(request, str(error))
+        return redirect('cart')
+    except OperationalError:
+        # Other checkouts kept the database locked for longer than busy_timeout, nothing was sold
+        messages.error(request, "The shop is busy right now, please try to check out again.")
+        return redirect('cart')
     return redirect(request.META['HTTP_REFERER'])
 
 
 def add_to_cart(request):
-    user_cart, created = Cart.objects.get_or_create(customer=request.user)
-    product = Product.objects.get(id=request.POST.get('product_id'))
+    product = get_object_or_404(Product, id=request.POST.get('product_id'))
 
     # Prevent the users from buying their own products
-    if request.user == product.seller:
+    if request.user.id == product.seller_id:
         return redirect(request.META['HTTP_REFERER'])
 
     if request.POST.get('quantity'):
@@ -145,12 +173,9 @@ def add_to_cart(request):
     if quantity > product.quantity:
         return redirect(request.META['HTTP_REFERER'])
 
-    if ProductInCart.objects.filter(product=product, cart=user_cart.id).exists():
-        products_in_cart = ProductInCart.objects.get(product=product, cart=user_cart)
-        products_in_cart.quantity += quantity
-        products_in_cart.save()
-    else:
-        ProductInCart(product=product, cart=user_cart, quantity=quantity).save()
+    if not carts.add(request, product, quantity):
+        messages.error(request, f"Not enough stock left for: {product}")
+    forget_navbar(request)
     return redirect(request.META['HTTP_REFERER'])
 
 
@@ -179,13 +204,6 @@ def save_review(request):
 
 
 def remove_from_cart(request, product_id):
-    user_cart, created = Cart.objects.get_or_create(customer=request.user)
-    product = get_object_or_404(Product, id=product_id)
-
-    try:
-        product_in_cart = ProductInCart.objects.get(product=product, cart=user_cart)
-        product_in_cart.delete()
-    except ProductInCart.DoesNotExist:
-        pass
-
+    carts.remove(request, product_id)
+    forget_navbar(request)
     return redirect('cart')
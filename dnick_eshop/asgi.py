@@ -5,6 +5,23 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+
+Served this way, the catalog pages (index, products, product_detail, categories, category_list and reviews)
+use the async views of app.async_views, so a worker keeps serving requests while others wait on the database.
+On SQLite there is no network round trip to overlap, and this path serves fewer requests per second than WSGI
+(see `python manage.py benchmark_concurrency`): Django runs the sync parts of every request, its middleware and
+the ORM, in a thread of its own, so each request opens a new database connection and hands over between threads
+about 16 times. Persistent connections can't be reused across those threads, so they are turned off here. Prefer
+WSGI with SQLite, ASGI pays off with a database server. Run it with uvicorn, one process per core:
+
+    uvicorn dnick_eshop.asgi:application --host 0.0.0.0 --port 8000 --workers 4
+
+or under gunicorn's process manager:
+
+    gunicorn dnick_eshop.asgi:application -k uvicorn.workers.UvicornWorker --workers 4
+
+Static and media files are best left to the front proxy (see MEDIA_OFFLOAD in the settings).
+Compare the throughput against the WSGI path with `python manage.py benchmark_concurrency`.
 """
 
 import os
@@ -12,5 +29,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dnick_eshop.settings')
+os.environ.setdefault('DJANGO_ASYNC_CATALOG', '1')
+os.environ.setdefault('DJANGO_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -0,0 +1,8 @@
+"""
+The URLs of dnick_eshop.urls, with the catalog pages served by their async versions in app.async_views. The root
+URL configuration when the project runs under ASGI, see dnick_eshop/asgi.py.
+"""
+from app import async_views
+from dnick_eshop.urls import project_urlpatterns
+
+urlpatterns = project_urlpatterns(async_views)
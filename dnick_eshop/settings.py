@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.contrib.messages import constants as messages
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -41,7 +44,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.instrumentation.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'app.databases.pin_primary_after_writes',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -50,7 +55,10 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'dnick_eshop.urls'
+# Route the catalog pages to their async views (app.async_views), set by dnick_eshop/asgi.py
+ASYNC_CATALOG = os.environ.get('DJANGO_ASYNC_CATALOG') == '1'
+
+ROOT_URLCONF = 'dnick_eshop.async_urls' if ASYNC_CATALOG else 'dnick_eshop.urls'
 
 TEMPLATES = [
     {
@@ -64,6 +72,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'app.context_processors.navbar',
             ],
         },
     },
@@ -79,10 +88,82 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': int(os.environ.get('DJANGO_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# A copy of the database the catalog pages read from, kept up to date with `manage.py sync_replica`.
+# Try it locally with DJANGO_REPLICA_DB=replica.sqlite3
+if os.environ.get('DJANGO_REPLICA_DB'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / os.environ['DJANGO_REPLICA_DB'],
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {
+            'MIRROR': 'default',
+        },
     }
+
+DATABASE_ROUTERS = ['app.databases.PrimaryReplicaRouter']
+
+# Reads stay on the primary this long after a visitor's write, so they see their own changes
+REPLICA_PIN_SECONDS = 10
+
+# Applied to every new SQLite connection. The WAL journal mode, which lets the catalog read while a checkout writes,
+# is stored in the database file and set once by migration 0016
+SQLITE_PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'cache_size': -64 * 1024,
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# LocMemCache keeps 300 entries by default and culls a third of them when full, which the catalog pages and the
+# product cards would overrun between two requests
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pc-shop',
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+    # Rendered product cards, up to three per product. Their keys carry the product version, so each process may
+    # keep its own
+    'cards': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pc-shop-cards',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
+# Worker processes serving the site, the same WEB_CONCURRENCY gunicorn reads. More than one needs a shared
+# CACHES['default'], see app/checks.py
+WEB_WORKERS = int(os.environ.get('WEB_CONCURRENCY', 1))
+
+# Catalog pages served to anonymous visitors from the cache, until a product, category or review changes
+PAGE_CACHE_TIMEOUT = 10 * 60
+
+# Rendered product cards in CACHES['cards'], keyed by the product's updated_at, so edits never serve a stale card
+PRODUCT_CARD_TIMEOUT = 60 * 60
+
+# Categories and product slug lookups each worker keeps in memory, see app/slug_cache.py. They are invalidated through
+# CACHES['default'], which has to be a shared backend when more than one worker process serves the site
+SLUG_CACHE_SIZE = 5000
+
+# Best sellers shown on the homepage and on every category page
+BEST_SELLERS_COUNT = 5
+BEST_SELLERS_TIMEOUT = 60 * 60
+
+# Stock added to a cart stays reserved for this long, then release_expired_reservations gives it back
+STOCK_RESERVATION_SECONDS = 15 * 60
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -125,6 +206,57 @@ STATICFILES_DIRS = [
 
 MEDIA_ROOT = BASE_DIR / 'media'
 MEDIA_URL = '/media/'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'app.media.VersionedMediaStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Let the front proxy send media files: None, 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache, lighttpd).
+# For nginx, MEDIA_OFFLOAD_PREFIX must be an internal location aliased to MEDIA_ROOT.
+MEDIA_OFFLOAD = None
+MEDIA_OFFLOAD_PREFIX = '/protected-media/'
+
+# Threads resizing uploaded images into their derivatives. With 0 they are resized in the thread that saved the image,
+# after its commit, like in the tests
+IMAGE_WORKERS = 2
+
+# Runs the tests with a temporary copy of MEDIA_ROOT, no IMAGE_WORKERS and no SQL instrumentation
+TEST_RUNNER = 'app.tests.runner.TestRunner'
+
+# Share of the requests whose SQL queries are recorded and logged, none in the tests
+SQL_INSTRUMENTATION_SAMPLE_RATE = 1.0 if DEBUG else 0.05
+# Send the numbers of the sampled requests in a Server-Timing header, to the staff or with DEBUG on
+SQL_SERVER_TIMING = True
+# Statements run this many times in one request are logged as a warning, usually an N+1 pattern
+SQL_DUPLICATE_THRESHOLD = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'app.instrumentation': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Bootstrap names the error alert "danger"
+MESSAGE_TAGS = {
+    messages.ERROR: 'danger',
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
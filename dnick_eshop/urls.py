@@ -14,29 +14,50 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
-from django.urls import path
+from django.urls import path, re_path
 from django.conf import settings
-from django.conf.urls.static import static
-from app import views
+from app import api, exports, instrumentation, media, page_cache, views
+
+
+def project_urlpatterns(catalog):
+    """
+    The project's URLs, with the read-only catalog pages served by the views of the `catalog` module: app.views, or
+    their async versions in app.async_views (see dnick_eshop/async_urls.py).
+    """
+    return [
+        path('admin/', admin.site.urls),
+        path('', catalog.index, name='index'),
+        path('products/', catalog.products, name='products'),
+        path('products/<slug:slug>', catalog.product_detail, name='product_detail'),
+        path('categories/', catalog.categories, name='categories'),
+        path('categories/<slug:slug>', catalog.category_list, name='category_list'),
+        path('seller/<str:seller_username>', views.seller_profile, name='seller_profile'),
+        path('seller/<str:seller_username>/dashboard', views.seller_dashboard, name='seller_dashboard'),
+        path('reviews/<slug:slug>', catalog.reviews, name='reviews'),
+        path('cart/', views.cart, name='cart'),
+        path('login/', views.CustomLoginView.as_view(), name='login'),
+        path('logout/', views.logout_view, name='logout'),
+        path('orders/', views.orders, name='orders'),
+        path('add_product/', views.add_product_to_shop, name='add_product_to_shop'),
+        path('checkout/', views.checkout, name='checkout'),
+        path('add_to_cart', views.add_to_cart, name='add_to_cart'),
+        path('add_review_to_product', views.add_review_to_product, name='add_review_to_product'),
+        path('save_review', views.save_review, name='save_review'),
+        path('remove_from_cart/<int:product_id>/', views.remove_from_cart, name='remove_from_cart'),
+        path('export/orders.<str:file_format>', exports.export_orders, name='export_orders'),
+        path('export/sales.<str:file_format>', exports.export_sales, name='export_sales'),
+        path('export/products.<str:file_format>', exports.export_products, name='export_products'),
+        path('api/products/', api.products, name='api_products'),
+        path('api/products/<int:pk>/', api.product, name='api_product'),
+        path('api/products/<int:pk>/reviews/', api.product_reviews, name='api_product_reviews'),
+        path('api/categories/', api.categories, name='api_categories'),
+        path('page-cache/stats/', page_cache.stats_view, name='page_cache_stats'),
+        path('sql-stats/', instrumentation.stats_view, name='sql_stats'),
+        re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), media.serve, name='media'),
+    ]
+
 
-urlpatterns = [
-    path('admin/', admin.site.urls),
-    path('', views.index, name='index'),
-    path('products/', views.products, name='products'),
-    path('products/<slug:slug>', views.product_detail, name='product_detail'),
-    path('categories/', views.categories, name='categories'),
-    path('categories/<slug:slug>', views.category_list, name='category_list'),
-    path('seller/<str:seller_username>', views.seller_profile, name='seller_profile'),
-    path('reviews/<slug:slug>', views.reviews, name='reviews'),
-    path('cart/', views.cart, name='cart'),
-    path('login/', views.CustomLoginView.as_view(), name='login'),
-    path('logout/', views.logout_view, name='logout'),
-    path('orders/', views.orders, name='orders'),
-    path('add_product/', views.add_product_to_shop, name='add_product_to_shop'),
-    path('checkout/', views.checkout, name='checkout'),
-    path('add_to_cart', views.add_to_cart, name='add_to_cart'),
-    path('add_review_to_product', views.add_review_to_product, name='add_review_to_product'),
-    path('save_review', views.save_review, name='save_review'),
-    path('remove_from_cart/<int:product_id>/', views.remove_from_cart, name='remove_from_cart'),
-]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+urlpatterns = project_urlpatterns(views)